@@ -3,9 +3,19 @@ import ctypes as ct
 import ctypes.util
 import sys
 import os
+import json
+import time
+from dataclasses import dataclass
 from .common import BUILDING_DOCS
 
 
+LIBRARY_ENVVAR = 'CTCSOUND_LIBRARY'
+"""Environment variable to set the exact path of the csound library"""
+
+CSND_LIBRARY_ENVVAR = 'CTCSOUND_CSND_LIBRARY'
+"""Environment variable to set the exact path of the csnd6 library (csound 6 only)"""
+
+
 def csoundLibraryName() -> str:
     platform = sys.platform
     if platform.startswith('linux'):
@@ -18,32 +28,161 @@ def csoundLibraryName() -> str:
         raise RuntimeError(f"Platform '{platform}' not supported")
 
 
-_libcsound = None
-_libcsoundpath = ''
+@dataclass
+class DiscoveryInfo:
+    """
+    How a library was found and how long it took, for diagnostics
+    """
+    name: str
+    """The name of the library (csound64, csnd6)"""
 
+    path: str = ''
+    """The path the library was loaded from"""
 
-def csoundDLL() -> tuple[ct.CDLL, str]:
-    global _libcsound
-    global _libcsoundpath
+    method: str = ''
+    """How the library was found: 'env' (environment variable), 'cache' or 'search'"""
 
-    if _libcsound is not None:
-        return _libcsound, _libcsoundpath
+    elapsed: float = 0.
+    """Total time spent finding and loading the library, in seconds"""
 
-    if BUILDING_DOCS:
-        raise RuntimeError("Cannot access the dll while building docs")
+    searchTime: float = 0.
+    """Time spent searching for the library (0 if it was not searched), in seconds"""
+
+
+_discovery: dict[str, DiscoveryInfo] = {}
+
+
+def discoveryInfo() -> dict[str, DiscoveryInfo]:
+    """
+    Information about how each library was discovered, keyed by library name
+    """
+    return dict(_discovery)
+
+
+def _cachePath() -> str:
+    from ._util import userCacheDir
+    return os.path.join(userCacheDir(), 'libraries.json')
+
+
+def _cacheKey(name: str) -> str:
+    # The same cache folder can be shared by interpreters of different bitness
+    return f'{name}-{sys.platform}-{ct.sizeof(ct.c_void_p) * 8}'
 
+
+def _readCache() -> dict:
+    try:
+        with open(_cachePath(), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _writeCacheEntry(name: str, path: str) -> None:
+    try:
+        mtime = os.stat(path).st_mtime_ns
+        cachepath = _cachePath()
+        data = _readCache()
+        data[_cacheKey(name)] = {'path': path, 'mtime': mtime}
+        tmppath = f'{cachepath}.{os.getpid()}.tmp'
+        with open(tmppath, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmppath, cachepath)
+    except OSError:
+        # The cache is an optimization, failing to write it is not an error
+        pass
+
+
+def clearDiscoveryCache() -> None:
+    """
+    Remove the persisted library locations, the next import searches again
+    """
+    try:
+        os.unlink(_cachePath())
+    except OSError:
+        pass
+
+
+def _loadedPath(dll: ct.CDLL, path: str) -> str:
+    """
+    The absolute path of a loaded library, or an empty string if unknown
+    """
+    if os.path.isabs(path):
+        return os.path.realpath(path)
+    if sys.platform.startswith('linux'):
+        # The library was loaded by its soname, find which file was mapped
+        basename = os.path.basename(path)
+        try:
+            with open('/proc/self/maps', 'r') as f:
+                for line in f:
+                    parts = line.split(maxsplit=5)
+                    if len(parts) == 6 and os.path.basename(parts[5].strip()).startswith(basename):
+                        return os.path.realpath(parts[5].strip())
+        except OSError:
+            pass
+    elif sys.platform.startswith('win'):
+        buf = ct.create_unicode_buffer(1024)
+        if ct.windll.kernel32.GetModuleFileNameW(ct.c_void_p(dll._handle), buf, 1024):
+            return buf.value
+    return ''
+
+
+def _loadLibrary(name: str, envvar: str, search) -> tuple[ct.CDLL, str]:
+    """
+    Load a library, trying the env. variable, then the cache, then *search*
+
+    Args:
+        name: the name of the library, used as key for the cache
+        envvar: the environment variable which can hold the exact path
+        search: a function returning (dll, path), raising ImportError if not found
+
+    Returns:
+        a tuple (dll, path)
+    """
+    t0 = time.perf_counter()
+    info = DiscoveryInfo(name=name)
+    path = os.environ.get(envvar)
+    if path:
+        if not os.path.exists(path):
+            raise ImportError(f"The library set via {envvar} does not exist: '{path}'")
+        dll = ct.CDLL(path)
+        info.method = 'env'
+    else:
+        dll = None
+        entry = _readCache().get(_cacheKey(name))
+        if entry:
+            path = entry.get('path', '')
+            try:
+                if os.stat(path).st_mtime_ns == entry.get('mtime'):
+                    dll = ct.CDLL(path)
+                    info.method = 'cache'
+            except OSError:
+                dll = None
+        if dll is None:
+            t1 = time.perf_counter()
+            dll, path = search()
+            info.searchTime = time.perf_counter() - t1
+            info.method = 'search'
+            realpath = _loadedPath(dll, path)
+            if realpath:
+                path = realpath
+                _writeCacheEntry(name, realpath)
+    info.path = path
+    info.elapsed = time.perf_counter() - t0
+    _discovery[name] = info
+    return dll, path
+
+
+def _searchCsound() -> tuple[ct.CDLL, str]:
     if sys.platform == 'linux':
         try:
-            dll = ct.CDLL("libcsound64.so")
-            _libcsound = dll
-            _libcsoundpath = "libcsound64.so"
-            return dll, "libcsound64.so"
+            return ct.CDLL("libcsound64.so"), "libcsound64.so"
         except OSError:
-            libname = ctypes.util.find_library("csound64")
-            if libname is None:
+            path = ctypes.util.find_library("csound64")
+            if path is None:
                 raise ImportError("Did not find csound library in linux")
-    else:
-        libname = csoundLibraryName()
+            return ct.CDLL(path), path
+    libname = csoundLibraryName()
     path = ctypes.util.find_library(libname)
     if path is None:
         if sys.platform.startswith('win'):
@@ -52,7 +191,149 @@ def csoundDLL() -> tuple[ct.CDLL, str]:
                               f"Make sure that csound is installed and the directory containing "
                               f"csound64.dll is in the path. PATH='{PATH}'")
         raise ImportError(f"Csound library not found (searched for '{libname}') - Make sure that csound is installed")
-    _libcsound = ct.CDLL(path)
-    _libcsoundpath = path
+    return ct.CDLL(path), path
+
+
+def _searchCsnd() -> tuple[ct.CDLL, str]:
+    if sys.platform.startswith('linux'):
+        return ct.CDLL("libcsnd6.so"), "libcsnd6.so"
+    elif sys.platform.startswith('win'):
+        path = ctypes.util.find_library("csnd6")
+    elif sys.platform.startswith('darwin'):
+        path = ctypes.util.find_library('csnd6.6.0')
+    else:
+        raise ImportError(f"Platform '{sys.platform}' unknown")
+    return ct.CDLL(path), path
+
+
+_libcsound = None
+_libcsoundpath = ''
+_libcsnd = None
+
+
+def csoundDLL() -> tuple[ct.CDLL, str]:
+    """
+    Load the csound library
+
+    Returns:
+        a tuple (dll, path)
+
+    The library is found, in this order, via the environment variable
+    ``CTCSOUND_LIBRARY``, via the location persisted by a previous import
+    (if the file still exists and has not been modified) or by searching for it.
+    The method used and the time it took is available via :func:`discoveryInfo`
+    """
+    global _libcsound
+    global _libcsoundpath
+
+    if _libcsound is not None:
+        return _libcsound, _libcsoundpath
 
+    if BUILDING_DOCS:
+        raise RuntimeError("Cannot access the dll while building docs")
+
+    _libcsound, _libcsoundpath = _loadLibrary('csound64', LIBRARY_ENVVAR, _searchCsound)
     return _libcsound, _libcsoundpath
+
+
+def csndDLL() -> ct.CDLL:
+    """
+    Load the csnd6 library, which holds the performance thread in csound 6
+
+    Like :func:`csoundDLL`, its path can be set via ``CTCSOUND_CSND_LIBRARY``
+    """
+    global _libcsnd
+    if _libcsnd is None:
+        _libcsnd, _ = _loadLibrary('csnd6', CSND_LIBRARY_ENVVAR, _searchCsnd)
+    return _libcsnd
+
+
+class _Prototype:
+    # Holds the attributes (argtypes, restype, ...) assigned to a function
+    # until the function is resolved
+    pass
+
+
+class _PrototypeTable:
+    """
+    Stands in for a library while declaring its API, recording the prototypes
+
+    Accessing an attribute returns a placeholder where argtypes/restype can be
+    assigned, exactly as with a function of a ctypes library
+    """
+    def __init__(self):
+        self.prototypes: dict[str, _Prototype] = {}
+
+    def __getattr__(self, name: str) -> _Prototype:
+        if name.startswith('__'):
+            raise AttributeError(name)
+        proto = self.prototypes.get(name)
+        if proto is None:
+            proto = self.prototypes[name] = _Prototype()
+        return proto
+
+
+class LazyLibrary:
+    """
+    Wraps a ctypes library, declaring the prototype of each function on first use
+
+    Args:
+        dll: the ctypes library
+        prototypes: a dict mapping function name to the attributes to set
+            (argtypes, restype, ...) when the function is first accessed
+
+    Resolving a symbol and setting its prototype is deferred until the function
+    is accessed; after that the function is cached as an attribute of this
+    object, so any later access is a plain attribute lookup
+    """
+    def __init__(self, dll: ct.CDLL, prototypes: dict[str, dict]):
+        self._dll = dll
+        self._prototypes = prototypes
+
+    def __repr__(self) -> str:
+        return f"LazyLibrary({self._dll!r})"
+
+    def __getattr__(self, name: str):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        func = getattr(self._dll, name)
+        attrs = self._prototypes.get(name)
+        if attrs:
+            for attr, value in attrs.items():
+                setattr(func, attr, value)
+        setattr(self, name, func)
+        return func
+
+    def declared(self) -> list[str]:
+        """The names of the functions with a declared prototype"""
+        return list(self._prototypes)
+
+
+def lazyDeclare(declare, *dlls: ct.CDLL) -> tuple[LazyLibrary, ...]:
+    """
+    Run an API declaration function lazily
+
+    Args:
+        declare: a function taking one argument per library and assigning
+            argtypes/restype to its functions
+        dlls: the libraries passed to *declare*. The same library can be given
+            more than once
+
+    Returns:
+        a :class:`LazyLibrary` for each library given, in the same order. The
+        same library given twice returns the same LazyLibrary
+
+    *declare* is called with recording stand-ins instead of the libraries, so
+    no symbol is looked up at this point. The recorded table is then applied
+    function by function, as each one is first accessed
+    """
+    tables: dict[int, _PrototypeTable] = {}
+    for dll in dlls:
+        tables.setdefault(id(dll), _PrototypeTable())
+    declare(*(tables[id(dll)] for dll in dlls))
+    libs: dict[int, LazyLibrary] = {}
+    for dll in dlls:
+        if id(dll) not in libs:
+            prototypes = {name: vars(proto) for name, proto in tables[id(dll)].prototypes.items()}
+            libs[id(dll)] = LazyLibrary(dll, prototypes)
+    return tuple(libs[id(dll)] for dll in dlls)
@@ -4,6 +4,7 @@ import signal
 import ctypes
 import numpy as np
 import sys
+import typing as _t
 
 from .common import (MYFLT,
                      CSOUND_CONTROL_CHANNEL,
@@ -172,6 +173,303 @@ def castarray(ptr: ctypes._Pointer | ctypes.c_void_p, shape: tuple[int, ...]) ->
     return ctypes.cast(ptr, arrtype).contents
 
 
+def eventRows(pfields: np.ndarray) -> tuple[ctypes.Array, list[int], np.ndarray]:
+    """
+    Prepare a 2D array of pfields to be sent as events, without copying
+
+    Args:
+        pfields: a 2D array of shape (numevents, numfields). Rows with less
+            pfields than *numfields* are padded at the end with NaN. To avoid
+            a copy, the array should be C-contiguous and of dtype MYFLT
+
+    Returns:
+        a tuple (rows, counts, array), where *rows* is a ctypes array of rows
+        sharing memory with *array*, each row can be passed as a MYFLT pointer.
+        *counts* holds the number of pfields of each row (0 for an empty row).
+        The returned array must be kept alive while *rows* is in use
+    """
+    arr = np.ascontiguousarray(pfields, dtype=MYFLT)
+    if arr.ndim == 1:
+        arr = arr.reshape(1, -1)
+    elif arr.ndim != 2:
+        raise ValueError(f"Expected a 2D array of shape (numevents, numfields), got shape {arr.shape}")
+    numevents, numfields = arr.shape
+    nans = np.isnan(arr)
+    if nans.any():
+        valid = ~nans
+        counts = numfields - np.argmax(valid[:, ::-1], axis=1)
+        counts[~valid.any(axis=1)] = 0
+        countlist = counts.tolist()
+    else:
+        countlist = [numfields] * numevents
+    rows = ((MYFLT * numfields) * numevents).from_address(arr.ctypes.data)
+    return rows, countlist, arr
+
+
+class ChannelIndex:
+    """
+    A compiled index over a group of control channels
+
+    Args:
+        handles: the channel handles (see :class:`~ctcsound7.handles.ChannelHandle`)
+            of the control channels, in the order in which values are
+            set / retrieved
+
+    The channels are resolved once: the index keeps the view of each channel,
+    as given by its handle, so setting or getting the values involves no name
+    lookup and no call into csound. If the memory of the channels is contiguous
+    (each channel directly follows another, in any order) a single view spans
+    all channels and values are scattered / gathered in one vectorized operation.
+    Otherwise the index loops over the cached view of each channel. In both
+    cases only memory owned by the channels is accessed. The index is invalidated
+    when any of its handles is invalidated (which happens when the csound
+    instance is reset)
+    """
+    __slots__ = ('handles', 'valid', '_arrays', '_view', '_indices', '__weakref__')
+
+    def __init__(self, handles: _t.Sequence):
+        self.handles = list(handles)
+        self.valid = True
+        self._arrays = [handle.array() for handle in self.handles]
+        self._view: np.ndarray | None = None
+        self._indices: np.ndarray | None = None
+        if not self._arrays:
+            return
+        addrs = np.array([arr.ctypes.data for arr in self._arrays], dtype=np.int64)
+        base = int(addrs.min())
+        itemsize = ctypes.sizeof(MYFLT)
+        offsets = addrs - base
+        # The span is only used if it covers exactly the channels, no gaps
+        if np.any(offsets % itemsize):
+            return
+        indices = offsets // itemsize
+        if not np.array_equal(np.sort(indices), np.arange(len(indices))):
+            return
+        self._indices = indices
+        self._view = castarray(ctypes.c_void_p(base), shape=(len(indices),))
+
+    @property
+    def vectorized(self) -> bool:
+        """True if values are scattered / gathered in one vectorized operation"""
+        return self._view is not None
+
+    def __len__(self) -> int:
+        return len(self._arrays)
+
+    def invalidate(self) -> None:
+        self.valid = False
+        self._arrays = []
+        self._view = None
+        self._indices = None
+
+    def lock(self) -> None:
+        for handle in self.handles:
+            handle._lock()
+
+    def unlock(self) -> None:
+        for handle in reversed(self.handles):
+            handle._unlock()
+
+    def _checkValid(self) -> None:
+        if self.valid and not all(handle.valid for handle in self.handles):
+            self.invalidate()
+        if not self.valid:
+            raise RuntimeError("This channel index is not valid anymore")
+
+    def views(self) -> list[np.ndarray]:
+        """
+        The view of each channel (an array of size 1), in the order of this index
+        """
+        self._checkValid()
+        return self._arrays
+
+    def scatter(self, values: np.ndarray | _t.Sequence[float]) -> None:
+        """
+        Set the value of each channel from *values*
+        """
+        self._checkValid()
+        if len(values) != len(self._arrays):
+            raise ValueError(f"Expected {len(self._arrays)} values, got {len(values)}")
+        if self._view is not None:
+            self._view[self._indices] = values
+            return
+        if isinstance(values, np.ndarray):
+            values = values.tolist()
+        for arr, value in zip(self._arrays, values):
+            arr[0] = value
+
+    def gather(self, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Get the value of each channel, placing them in *out* if given
+        """
+        self._checkValid()
+        if out is None:
+            out = np.empty((len(self._arrays),), dtype=MYFLT)
+        elif len(out) != len(self._arrays):
+            raise ValueError(f"The output array should have a size of {len(self._arrays)}, "
+                             f"got {len(out)}")
+        if self._view is not None:
+            np.take(self._view, self._indices, out=out)
+            return out
+        for i, arr in enumerate(self._arrays):
+            out[i] = arr[0]
+        return out
+
+
+def renderLoop(perform: _t.Callable[[], int],
+               source: int,
+               blockframes: int,
+               nchnls: int,
+               numframes: int,
+               out: np.ndarray | None = None,
+               growframes: int = 0
+               ) -> np.ndarray:
+    """
+    Drive a performance loop, copying each block of audio into an array
+
+    Args:
+        perform: a function performing one block of audio. It returns non-zero
+            when the performance is finished
+        source: the address of the buffer holding one block of interleaved
+            audio after each call to *perform*
+        blockframes: the number of frames in each block
+        nchnls: the number of channels
+        numframes: the number of frames to render, or 0 to render until the
+            performance is finished (or until *out* is full)
+        out: if given, a C-contiguous MYFLT array of shape (frames, nchnls)
+        growframes: if *out* is not given and *numframes* is 0, the initial
+            size of the allocated array. It is doubled whenever it fills up
+
+    Returns:
+        a view of the output array containing only the frames rendered
+    """
+    if out is None:
+        capacity = numframes or max(growframes, blockframes)
+        capacity = (capacity // blockframes + int(capacity % blockframes > 0)) * blockframes
+        out = np.empty((capacity, nchnls), dtype=MYFLT)
+        growable = numframes == 0
+        limit = numframes or capacity
+    else:
+        if out.ndim != 2 or out.shape[1] != nchnls:
+            raise ValueError(f"Expected an array of shape (frames, {nchnls}), got {out.shape}")
+        if out.dtype != np.dtype(MYFLT) or not out.flags.c_contiguous:
+            raise ValueError(f"The output array must be a C-contiguous array of {np.dtype(MYFLT)}")
+        if numframes > len(out):
+            raise ValueError(f"The output array is too small, needs at least {numframes} "
+                             f"frames, has {len(out)}")
+        growable = False
+        limit = numframes or len(out)
+
+    framebytes = nchnls * ctypes.sizeof(MYFLT)
+    blockbytes = blockframes * framebytes
+    memmove = ctypes.memmove
+    dest = out.ctypes.data
+    pos = 0
+    while True:
+        if pos + blockframes > limit:
+            if not growable:
+                break
+            newout = np.empty((len(out) * 2, nchnls), dtype=MYFLT)
+            newout[:pos] = out[:pos]
+            out = newout
+            dest = out.ctypes.data
+            limit = len(out)
+        if perform():
+            return out[:pos]
+        memmove(dest + pos * framebytes, source, blockbytes)
+        pos += blockframes
+
+    if pos < limit and not perform():
+        # A last, partial block
+        n = limit - pos
+        memmove(dest + pos * framebytes, source, n * framebytes)
+        pos += n
+    return out[:pos]
+
+
+def streamLoop(perform: _t.Callable[[], int],
+               source: int,
+               blockframes: int,
+               nchnls: int,
+               chunkframes: int,
+               numbuffers: int = 2,
+               inputs: _t.Iterator[np.ndarray] | None = None,
+               sink: int = 0,
+               inchnls: int = 0
+               ) -> _t.Iterator[np.ndarray]:
+    """
+    Drive a performance loop, yielding fixed-size chunks of audio
+
+    Args:
+        perform: a function performing one block of audio. It returns non-zero
+            when the performance is finished
+        source: the address of the buffer holding one block of interleaved
+            audio after each call to *perform*
+        blockframes: the number of frames in each block
+        nchnls: the number of output channels
+        chunkframes: the number of frames of each yielded chunk. Must be a
+            multiple of *blockframes*
+        numbuffers: the number of preallocated chunks, reused in a circular fashion
+        inputs: if given, an iterator of arrays of shape (chunkframes, inchnls)
+            which are fed to the input buffer, block by block. The last array
+            can have fewer frames: it is padded with zeros to a whole number
+            of blocks
+        sink: the address of the input buffer. Only needed if *inputs* is given
+        inchnls: the number of input channels. Only needed if *inputs* is given
+
+    Returns:
+        an iterator of arrays of shape (chunkframes, nchnls). The last chunk
+        might be shorter if the performance ends or if the last input chunk
+        is shorter, in which case it has as many frames as that input chunk
+    """
+    if chunkframes % blockframes != 0:
+        raise ValueError(f"The chunk size ({chunkframes}) must be a multiple of the "
+                         f"block size ({blockframes})")
+    if numbuffers < 1:
+        raise ValueError(f"At least one buffer is needed, got {numbuffers}")
+    ring = np.zeros((numbuffers, chunkframes, nchnls), dtype=MYFLT)
+    chunks = [(chunk, chunk.ctypes.data) for chunk in ring]
+    itemsize = ctypes.sizeof(MYFLT)
+    blockbytes = blockframes * nchnls * itemsize
+    inblockbytes = blockframes * inchnls * itemsize
+    memmove = ctypes.memmove
+    src = 0
+    padded: np.ndarray | None = None
+    while True:
+        for chunk, dest in chunks:
+            numframes = chunkframes
+            if inputs is not None:
+                inchunk = next(inputs, None)
+                if inchunk is None:
+                    return
+                inchunk = np.ascontiguousarray(inchunk, dtype=MYFLT)
+                if inchnls and inchunk.size < chunkframes * inchnls:
+                    # The last input chunk, padded with zeros to whole blocks
+                    if inchunk.size % inchnls:
+                        raise ValueError(f"Expected an input chunk of shape (frames, {inchnls}), "
+                                         f"got {inchunk.shape}")
+                    numframes = inchunk.size // inchnls
+                    if numframes == 0:
+                        return
+                    if padded is None:
+                        padded = np.zeros((chunkframes * inchnls,), dtype=MYFLT)
+                    padded[:inchunk.size] = inchunk.ravel()
+                    padded[inchunk.size:] = 0
+                    inchunk = padded
+                src = inchunk.ctypes.data
+            for i in range(-(-numframes // blockframes)):
+                if src:
+                    memmove(sink, src + i * inblockbytes, inblockbytes)
+                if perform():
+                    if i > 0:
+                        yield chunk[:min(i * blockframes, numframes)]
+                    return
+                memmove(dest + i * blockbytes, source, blockbytes)
+            if numframes < chunkframes:
+                yield chunk[:numframes]
+                return
+            yield chunk
+
 
 def deprecated(func):
     """
@@ -194,3 +492,63 @@ def deprecated(func):
 def splitCommandLine(args: str) -> list[str]:
     import re
     return re.findall(r"(?:\".*?\"|\S)+", args)
+
+
+def userCacheDir(*subfolders: str) -> str:
+    """
+    The folder where ctcsound7 caches data for the current user
+
+    Args:
+        subfolders: if given, subfolders within the cache folder
+
+    Returns:
+        the path to the folder. It is created if it does not exist
+    """
+    import os
+    if sys.platform.startswith('win'):
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~/AppData/Local')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    path = os.path.join(base, 'ctcsound7', *subfolders)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+TABLENUMS_CHANNEL = '__ctcsound7_tablenums'
+"""String channel used to pass back the numbers of tables created in a batch"""
+
+
+def tableData(arr: np.ndarray | _t.Sequence[float]) -> np.ndarray:
+    """
+    An array as the flat, contiguous array of MYFLT to be copied into a table
+
+    A 2D array (numframes, numchannels) is interleaved. No copy is made if
+    the array already has the right layout
+    """
+    data = np.ascontiguousarray(arr, dtype=MYFLT).ravel()
+    if len(data) == 0:
+        raise ValueError("Cannot create a table from an empty array")
+    return data
+
+
+def emptyTablesCode(sizes: _t.Sequence[int], tabnums: _t.Sequence[int]) -> str:
+    """
+    Orchestra code creating empty tables of the given sizes
+
+    Args:
+        sizes: the size of each table
+        tabnums: the number of each table, 0 to let csound assign one
+
+    Returns:
+        code to be evaluated via evalCode. The table numbers are written,
+        separated by spaces, to the string channel :data:`TABLENUMS_CHANNEL`
+    """
+    lines = ['S__tabnums = ""']
+    for size, tabnum in zip(sizes, tabnums):
+        lines.append(f'i__tabnum ftgen {int(tabnum)}, 0, -{int(size)}, -2, 0')
+        lines.append('S__tabnums strcat S__tabnums, sprintf("%d ", i__tabnum)')
+    lines.append(f'chnset S__tabnums, "{TABLENUMS_CHANNEL}"')
+    lines.append('return 0')
+    return '\n'.join(lines)
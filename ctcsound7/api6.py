@@ -1,21 +1,31 @@
 from __future__ import annotations
 
-import sys
 import os
 import numpy as np
 import ctypes as ct
-import ctypes.util
 from .common import *
 from . import _util
+from . import opcodecache
+from . import messages as _messages
+from .handles import ChannelHandle, HandleCache, TableHandle
+from .ringbuffer import CommandRing
+from .scheduler import TaskScheduler, SchedulerStats
 import queue as _queue
 import threading as _threading
+import dataclasses as _dataclasses
+import concurrent.futures as _futures
 import warnings
+import weakref as _weakref
 import typing as _t
 
 
 if not BUILDING_DOCS:
     pass
 
+
+_eventOrdToChar = {ord(kind): cchar(kind) for kind in 'aiqfe'}
+
+
 def _deprecated(s: str, level=2):
     warnings.warn(s, DeprecationWarning, stacklevel=level)
 
@@ -84,6 +94,7 @@ MIDIERRORFUNC = ct.CFUNCTYPE(ct.c_char_p, ct.c_int)
 MIDIDEVLISTFUNC = ct.CFUNCTYPE(ct.c_int, ct.c_void_p, ct.POINTER(CsoundMidiDevice), ct.c_int)
 CSCOREFUNC = ct.CFUNCTYPE(None, ct.c_void_p)
 DEFMSGFUNC = ct.CFUNCTYPE(None, ct.c_void_p, ct.c_int, ct.c_char_p, ct.c_void_p)
+MSGSTRFUNC = ct.CFUNCTYPE(None, ct.c_void_p, ct.c_int, ct.c_char_p)
 CHANNELFUNC = ct.CFUNCTYPE(None, ct.c_void_p, ct.c_char_p, ct.c_void_p, ct.c_void_p)
 SENSEFUNC = ct.CFUNCTYPE(None, ct.c_void_p, ct.py_object)
 KEYBOARDFUNC = ct.CFUNCTYPE(ct.c_int, ct.py_object, ct.c_void_p, ct.c_uint)
@@ -236,6 +247,7 @@ def _declareAPI(libcsound, libcspt):
     libcsound.csoundMessage.argtypes = [ct.c_void_p, ct.c_char_p, ct.c_char_p]
     libcsound.csoundMessageS.argtypes = [ct.c_void_p, ct.c_int, ct.c_char_p, ct.c_char_p]
     libcsound.csoundSetDefaultMessageCallback.argtypes = [DEFMSGFUNC]
+    libcsound.csoundSetMessageStringCallback.argtypes = [ct.c_void_p, MSGSTRFUNC]
     libcsound.csoundGetMessageLevel.argtypes = [ct.c_void_p]
     libcsound.csoundSetMessageLevel.argtypes = [ct.c_void_p, ct.c_int]
     libcsound.csoundCreateMessageBuffer.argtypes = [ct.c_void_p, ct.c_int]
@@ -444,17 +456,10 @@ CSOUND_VAR_CHANNEL = 5
 
 if not BUILDING_DOCS:
     from . import _dll
-    libcsound, libcsoundpath = _dll.csoundDLL()
-    if sys.platform.startswith('linux'):
-        libcspt = ct.CDLL("libcsnd6.so")
-    elif sys.platform.startswith('win'):
-        libcspt = ct.CDLL(ctypes.util.find_library("csnd6"))
-    elif sys.platform.startswith('darwin'):
-        libcspt = ct.CDLL(ctypes.util.find_library('csnd6.6.0'))
-    else:
-        raise ImportError(f"Platform '{sys.platform}' unknown")
-
-    _declareAPI(libcsound, libcspt)
+    _libcsound, libcsoundpath = _dll.csoundDLL()
+    _libcspt = _dll.csndDLL()
+    # Prototypes are declared on first use, see _dll.lazyDeclare
+    libcsound, libcspt = _dll.lazyDeclare(_declareAPI, _libcsound, _libcspt)
 
 
 class Csound:
@@ -483,10 +488,15 @@ class Csound:
                 libcsound.csoundSetOpcodedir(cstring(opcodeDir))
             self.cs = libcsound.csoundCreate(ct.py_object(hostData))
             self.fromPointer = False
+        self._opcodeDir = opcodeDir
         self._channelLocks: dict[str, ct.c_int32] = {}
         self._perfthread: CsoundPerformanceThread | None = None
         self._callbacks: dict[str, ct._FuncPointer] = {}
         self._started = False
+        self._options: list[str] = []
+        self._channelHandles = HandleCache(maxsize=1024)
+        self._channelIndexes = HandleCache(maxsize=64)
+        self._tableHandles = HandleCache(maxsize=256)
 
     def performanceThread(self, withProcessQueue=False) -> CsoundPerformanceThread:
         """
@@ -878,6 +888,11 @@ class Csound:
         called.
         """
         libcsound.csoundReset(self.cs)
+        self._started = False
+        self._options.clear()
+        self._channelHandles.clear()
+        self._channelIndexes.clear()
+        self._tableHandles.clear()
 
     #UDP server
     def UDPServerStart(self, port: int) -> int:
@@ -1002,6 +1017,7 @@ class Csound:
         out = 0
         for part in options:
             out |= libcsound.csoundSetOption(self.cs, cstring(part))
+        self._options.extend(options)
         return out
 
     def setParams(self, params: CsoundParams) -> None:
@@ -1326,6 +1342,111 @@ class Csound:
         size = libcsound.csoundGetOutputBufferSize(self.cs)
         return _util.castarray(buf, shape=(size,))
 
+    def render(self, dur: float = 0., out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Renders audio offline into a numpy array, without writing any soundfile
+
+        Args:
+            dur: the duration to render, in seconds. If not given, renders until
+                the end of the score (or until *out* is full, if given)
+            out: if given, a C-contiguous array of MYFLT with shape ``(frames, nchnls)``
+                where the rendered audio is placed. Otherwise an array is allocated
+
+        Returns:
+            a view of the output array containing only the rendered frames
+
+        If the performance has not been started yet, host audio I/O is enabled
+        (see :meth:`Csound.setHostImplementedAudioIO`) and csound is started.
+        Then :meth:`Csound.performBuffer` is called in a loop and each
+        buffer (see :meth:`Csound.outputBuffer`) is copied into the output
+        array. Rendering stops when *dur* is reached, *out* is full or the
+        score ends, whichever happens first.
+
+        The output buffer is normalized to 0dbfs=1, so the rendered samples
+        are scaled back to 0dbfs to match :meth:`Csound.spout` and csound 7
+
+        .. code-block:: python
+
+            cs = Csound()
+            cs.compileOrc(...)
+            cs.scoreEvent('i', [1, 0, 4])
+            samples = cs.render(4)  # shape: (4 * sr, nchnls)
+
+        """
+        if not self._started:
+            self.setHostImplementedAudioIO(True, 0)
+            self.start()
+        sr = self.sr()
+        cs = self.cs
+        nchnls = self.nchnls()
+        perform = libcsound.csoundPerformBuffer
+        bufsize = libcsound.csoundGetOutputBufferSize(cs)
+        out = _util.renderLoop(perform=lambda: perform(cs),
+                               source=ct.addressof(libcsound.csoundGetOutputBuffer(cs).contents),
+                               blockframes=bufsize // nchnls,
+                               nchnls=nchnls,
+                               numframes=round(dur * sr),
+                               out=out,
+                               growframes=int(sr * 10))
+        dbfs = self.get0dBFS()
+        if dbfs != 1:
+            out *= dbfs
+        return out
+
+    def stream(self,
+               chunkFrames: int = 4096,
+               input: _t.Iterator[np.ndarray] | None = None,
+               numBuffers: int = 2
+               ) -> _t.Iterator[np.ndarray]:
+        """
+        Performs csound, yielding the generated audio in fixed-size chunks
+
+        Args:
+            chunkFrames: the number of frames of each chunk. Must be a multiple
+                of ksmps
+            input: if given, an iterator of arrays of shape ``(chunkFrames, nchnlsInput)``.
+                Each array is fed to :meth:`Csound.spin`, one ksmps block at a
+                time, while the corresponding output chunk is generated. The
+                stream stops when the input is exhausted. The last array can
+                have fewer frames, it is then padded with zeros
+            numBuffers: the number of preallocated chunks, reused in a round-robin
+                fashion
+
+        Returns:
+            a generator of arrays of shape ``(chunkFrames, nchnls)``. The last
+            chunk might be shorter if the score ends, or if the last input array
+            is shorter (in which case it has as many frames as that array)
+
+        The yielded arrays are views into a ring of *numBuffers* preallocated
+        arrays: a chunk is overwritten *numBuffers* chunks later, so a consumer
+        which needs to keep a chunk for longer must copy it. Since this is a
+        generator, the performance only advances as fast as chunks are consumed.
+        If the performance has not been started yet, host audio I/O is enabled
+        and csound is started.
+
+        .. code-block:: python
+
+            cs = Csound()
+            cs.compileOrc(...)
+            for chunk in cs.stream(chunkFrames=1024):
+                sock.send(chunk.astype('float32').tobytes())
+
+        """
+        if not self._started:
+            self.setHostImplementedAudioIO(True, 0)
+            self.start()
+        cs = self.cs
+        perform = libcsound.csoundPerformKsmps
+        return _util.streamLoop(perform=lambda: perform(cs),
+                                source=ct.addressof(libcsound.csoundGetSpout(cs).contents),
+                                blockframes=self.ksmps(),
+                                nchnls=self.nchnls(),
+                                chunkframes=chunkFrames,
+                                numbuffers=numBuffers,
+                                inputs=iter(input) if input is not None else None,
+                                sink=ct.addressof(libcsound.csoundGetSpin(cs).contents),
+                                inchnls=self.nchnlsInput())
+
     def spin(self) -> np.ndarray:
         """Returns the Csound audio input working buffer (spin) as an ndarray.
 
@@ -1721,7 +1842,55 @@ class Csound:
 
     #def setMessageCallback():
 
-    #def setMessageStringCallback()
+    def setMessageStringCallback(self, function) -> None:
+        """Sets an alternative message print function.
+
+        This function is to be called by Csound to print an
+        informational message, using a less granular signature.
+        This callback can be set for --realtime mode.
+        This callback is cleared after reset.
+
+        Args:
+            function: a function ``(csound: ct.c_void_p, attr: int, message: bytes) -> None``
+
+        The function is called from the thread where csound prints the message,
+        which can be the performance thread. To keep the cost within that thread
+        low use a :class:`~ctcsound7.messages.MessageDispatcher` (see
+        :meth:`Csound.messageDispatcher`)
+        """
+        self._messageStringCallback = MSGSTRFUNC(function)
+        libcsound.csoundSetMessageStringCallback(self.cs, self._messageStringCallback)
+
+    def messageDispatcher(self, capacity=8192, interval=0.02, start=True) -> _messages.MessageDispatcher:
+        """
+        Routes csound's messages to python handlers called from a separate thread
+
+        Args:
+            capacity: the max. number of messages waiting to be dispatched. If
+                the dispatch thread falls behind, further messages are dropped
+                (and counted)
+            interval: the max. time the dispatch thread waits before dispatching
+                pending messages, in seconds
+            start: if True, start the dispatch thread
+
+        Returns:
+            the :class:`~ctcsound7.messages.MessageDispatcher`. Add handlers
+            via :meth:`~ctcsound7.messages.MessageDispatcher.addHandler`
+
+        This installs a message string callback (see :meth:`Csound.setMessageStringCallback`)
+        which only stores the raw message, its attribute and a timestamp.
+        Decoding and calling the handlers happens in the dispatch thread.
+
+        .. code-block:: python
+
+            dispatcher = cs.messageDispatcher()
+            dispatcher.addHandler(lambda batch: logfile.writelines(msg for msg, attr in batch))
+        """
+        dispatcher = _messages.MessageDispatcher(capacity=capacity, interval=interval)
+        self.setMessageStringCallback(dispatcher.callback)
+        if start:
+            dispatcher.start()
+        return dispatcher
 
     def messageLevel(self) -> int:
         """Returns the Csound message level (from 0 to 231)."""
@@ -1802,6 +1971,42 @@ class Csound:
             yield msg, attr
             self.popFirstMessage()
 
+    def drainMessages(self, max: int | None = None) -> list[tuple[str, int]]:
+        """
+        Reads all pending messages from the message buffer in one batch
+
+        Args:
+            max: if given, the max. number of messages to read. Any remaining
+                messages are left in the buffer
+
+        Returns:
+            a list of tuples (message: str, attribute: int), in the order
+            they were produced
+
+        Compared to :meth:`~Csound.iterMessages` the count is queried only once
+        and the library functions are called directly, without going through
+        the wrapper methods. Messages are decoded after the buffer has been
+        drained. A message buffer must have been created via
+        :meth:`~Csound.createMessageBuffer`
+
+        .. seealso:: :class:`~ctcsound7.messages.MessagePump`
+        """
+        cs = self.cs
+        count = libcsound.csoundGetMessageCnt(cs)
+        if max is not None and count > max:
+            count = max
+        if count <= 0:
+            return []
+        getFirst = libcsound.csoundGetFirstMessage
+        getAttr = libcsound.csoundGetFirstMessageAttr
+        pop = libcsound.csoundPopFirstMessage
+        raw = []
+        for _ in range(count):
+            raw.append((getFirst(cs), getAttr(cs)))
+            pop(cs)
+        return [(msg.decode('utf-8', errors='replace') if msg else '', attr)
+                for msg, attr in raw]
+
     def popFirstMessage(self) -> None:
         """Removes the first message from the buffer."""
         libcsound.csoundPopFirstMessage(self.cs)
@@ -2096,6 +2301,53 @@ class Csound:
         """
         return libcsound.csoundGetChannelLock(self.cs, cstring(name))
 
+    def channel(self, name: str, kind='control', locking=False) -> ChannelHandle:
+        """
+        Returns a handle to a control or audio channel
+
+        Args:
+            name: the name of the channel
+            kind: one of 'control', 'audio'
+            locking: if True, access via the handle is protected by the channel lock
+
+        Returns:
+            a :class:`~ctcsound7.handles.ChannelHandle`
+
+        The channel is created (as a bidirectional channel) if it does not exist yet.
+        The pointer to the channel is resolved once, so setting or getting the
+        value through the handle avoids encoding the name and looking up the
+        channel at each call. Handles are cached per instance (the least recently
+        used are evicted when the cache is full) and are invalidated when this
+        instance is reset.
+
+        .. code-block:: python
+
+            freq = cs.channel('freq')
+            freq.value = 440
+            # or
+            freq.set(440)
+        """
+        key = (name, kind)
+        handle = self._channelHandles.get(key)
+        if handle is not None and handle.locking == locking:
+            return handle
+        if kind not in ('control', 'audio'):
+            raise ValueError(f"kind should be one of 'control', 'audio', got {kind}")
+        arr, err = self.channelPtr(name, kind=kind, output=True, input=True)
+        if err:
+            raise RuntimeError(f"Could not get a pointer to channel '{name}': {err}")
+        lockptr = libcsound.csoundGetChannelLock(self.cs, cstring(name))
+        if lockptr:
+            lockfunc, unlockfunc = libcsound.csoundSpinLock, libcsound.csoundSpinUnLock
+            lock = lambda: lockfunc(lockptr)
+            unlock = lambda: unlockfunc(lockptr)
+        else:
+            lock = unlock = None
+        handle = ChannelHandle(name=name, kind=kind, array=arr, lock=lock, unlock=unlock,
+                               locking=locking)
+        self._channelHandles.put(key, handle)
+        return handle
+
     def controlChannel(self, name: str) -> tuple[float, int]:
         """Retrieves the value of control channel identified by *name*.
 
@@ -2114,6 +2366,84 @@ class Csound:
         """Sets the value of control channel identified by *name*."""
         libcsound.csoundSetControlChannel(self.cs, cstring(name), MYFLT(val))
 
+    def _channelIndex(self, names: _t.Sequence[str]) -> _util.ChannelIndex:
+        key = tuple(names)
+        index = self._channelIndexes.get(key)
+        if index is None:
+            index = _util.ChannelIndex([self.channel(name) for name in key])
+            self._channelIndexes.put(key, index)
+        return index
+
+    def setControlChannels(self,
+                           names: _t.Sequence[str],
+                           values: np.ndarray | _t.Sequence[float],
+                           lock=False
+                           ) -> None:
+        """
+        Sets the value of multiple control channels in one operation
+
+        Args:
+            names: the names of the channels
+            values: the values, one for each channel
+            lock: if True, all channels are locked during the operation
+
+        The channels are resolved the first time a given sequence of names is
+        used and the resulting index is cached, so that subsequent calls with
+        the same names set the values through the cached channel views, without
+        any name lookup. If the memory of the channels is contiguous all values
+        are set in one vectorized operation, otherwise the views are set one by
+        one. Channels are created if they do not exist. The cache is invalidated
+        on reset.
+
+        .. code-block:: python
+
+            names = [f'gain{i}' for i in range(100)]
+            gains = np.zeros(100)
+            while True:
+                ...
+                cs.setControlChannels(names, gains)
+                cs.performKsmps()
+
+        .. seealso:: :meth:`Csound.controlChannels`, :meth:`Csound.channel`
+        """
+        index = self._channelIndex(names)
+        if lock:
+            index.lock()
+            try:
+                index.scatter(values)
+            finally:
+                index.unlock()
+        else:
+            index.scatter(values)
+
+    def controlChannels(self,
+                        names: _t.Sequence[str],
+                        out: np.ndarray | None = None,
+                        lock=False
+                        ) -> np.ndarray:
+        """
+        Retrieves the value of multiple control channels in one operation
+
+        Args:
+            names: the names of the channels
+            out: if given, the values are placed in this array, which must
+                be of the same size as *names*
+            lock: if True, all channels are locked during the operation
+
+        Returns:
+            an array with the value of each channel (*out*, if given)
+
+        .. seealso:: :meth:`Csound.setControlChannels`
+        """
+        index = self._channelIndex(names)
+        if lock:
+            index.lock()
+            try:
+                return index.gather(out)
+            finally:
+                index.unlock()
+        return index.gather(out)
+
     def audioChannel(self, name: str, samples: np.ndarray) -> None:
         """Copies the audio channel identified by *name* into ndarray samples.
 
@@ -2206,6 +2536,47 @@ class Csound:
         """
         return libcsound.csoundGetPvsChannel(self.cs, ct.byref(fout), cstring(name))
 
+    def openPvsChannel(self,
+                       name: str,
+                       fftsize=1024,
+                       overlap=256,
+                       winsize=0,
+                       wintype: int | str = 'hann',
+                       format=PVS_AMP_FREQ
+                       ) -> PvsChannel:
+        """
+        Opens a pvs (fsig) channel, exchanging frames as numpy arrays
+
+        Args:
+            name: the name of the channel
+            fftsize: FFT analysis size. Must match the fsig within csound
+            overlap: analysis overlap size in samples
+            winsize: analysis window size in samples. If not given, the fftsize is used
+            wintype: analysis window type. One of 'hamming', 'hann', 'kaiser',
+                'blackman', 'blackman-exact', 'nuttallc3', 'bharris3',
+                'bharrismin', 'rect' or one of the PVS_WIN_* constants
+            format: analysis data format
+
+        Returns:
+            a :class:`PvsChannel`
+
+        The channel is cached and invalidated when this instance is reset
+        """
+        key = (name, 'pvs')
+        chan = self._channelHandles.get(key)
+        if chan is not None:
+            return chan
+        if isinstance(wintype, str):
+            wintypenum = PVS_WINDOWS.get(wintype)
+            if wintypenum is None:
+                raise ValueError(f"Window {wintype} not known. Possible windows: {PVS_WINDOWS.keys()}")
+        else:
+            wintypenum = wintype
+        chan = PvsChannel(self, name, fftsize=fftsize, overlap=overlap, winsize=winsize or fftsize,
+                          wintype=wintypenum, format=format)
+        self._channelHandles.put(key, chan)
+        return chan
+
     def scoreEvent(self, kind: str, pfields) -> int:
         """Sends a new score event (blocking)
 
@@ -2227,6 +2598,43 @@ class Csound:
         numfields = ct.c_long(p.size)
         libcsound.csoundScoreEventAsync(self.cs, cchar(kind), ptr, numfields)
 
+    def events(self, kind: str, pfields: np.ndarray, block=True) -> None:
+        """
+        Send multiple events in one call
+
+        Args:
+            kind: the kind of event, one of 'i', 'f', 'e'
+            pfields: a 2D array of shape (numevents, numfields), each row holds
+                the pfields of one event, starting with p1. Events with less pfields
+                than *numfields* are padded at the end with NaN. Rows consisting only
+                of NaN are skipped
+            block: if True, the operation is blocking. Otherwise it is
+                performed asynchronously
+
+        The rows are passed directly to csound, without any intermediate copy,
+        if *pfields* is a C-contiguous array of dtype MYFLT (float64). Otherwise
+        it is converted once for the whole batch.
+
+        .. code-block:: python
+
+            import numpy as np
+            pfields = np.full((1000, 5), np.nan)
+            pfields[:, 0] = 1
+            pfields[:, 1] = np.linspace(0, 10, 1000)
+            pfields[:, 2] = 0.1
+            pfields[:, 3] = np.random.uniform(60, 72, 1000)
+            cs.events('i', pfields)
+
+        .. seealso:: :meth:`Csound.scoreEvent`
+        """
+        rows, counts, arr = _util.eventRows(pfields)
+        cs = self.cs
+        scoreEvent = libcsound.csoundScoreEvent if block else libcsound.csoundScoreEventAsync
+        kindchar = cchar(kind)
+        for row, numfields in zip(rows, counts):
+            if numfields:
+                scoreEvent(cs, kindchar, row, numfields)
+
     def scoreEventAbsolute(self, type_: str, pFields, timeOffset: float) -> int:
         """Like :py:meth:`scoreEvent()`, this function inserts a score event.
 
@@ -2457,6 +2865,130 @@ class Csound:
             return None
         return _util.castarray(ptr, shape=(size,))
 
+    def tableHandle(self, tableNum: int) -> TableHandle:
+        """
+        Returns a handle to a function table
+
+        Args:
+            tableNum: the table number
+
+        Returns:
+            a :class:`~ctcsound7.handles.TableHandle`
+
+        The handle keeps the numpy view of the table, its size and its GEN
+        arguments, so repeated access does not rebuild them. Handles are cached
+        per table number: calling this method again with the same number returns
+        the same handle, after checking (with a single call into csound) whether
+        the table has been redefined. Handles are invalidated when this instance
+        is reset. Raises RuntimeError if the table does not exist
+
+        .. code-block:: python
+
+            wave = cs.tableHandle(1)
+            wave.copyIn(samples)
+            wave[0:10] = 0
+            print(wave.gen, wave.args)
+        """
+        handle = self._tableHandles.get(tableNum)
+        if handle is not None:
+            try:
+                handle.refresh()
+                return handle
+            except RuntimeError:
+                self._tableHandles.pop(tableNum)
+                raise
+        cs = self.cs
+        getTable, getTableArgs = libcsound.csoundGetTable, libcsound.csoundGetTableArgs
+
+        def resolve(cs=cs, tableNum=tableNum):
+            ptr = ct.POINTER(MYFLT)()
+            size = getTable(cs, ct.byref(ptr), tableNum)
+            return ptr, size
+
+        def resolveArgs(cs=cs, tableNum=tableNum):
+            ptr = ct.POINTER(MYFLT)()
+            size = getTableArgs(cs, ct.byref(ptr), tableNum)
+            return _util.castarray(ptr, shape=(size,)).copy() if size > 0 else None
+
+        selfref = _weakref.ref(self)
+
+        def defer(func) -> bool:
+            csound = selfref()
+            thread = csound._perfthread if csound is not None else None
+            if thread is None or thread._processQueue is None:
+                return False
+            thread.task(lambda csound, thread: func())
+            return True
+
+        handle = TableHandle(tableNum, resolve=resolve, resolveArgs=resolveArgs, defer=defer)
+        self._tableHandles.put(tableNum, handle)
+        return handle
+
+    def tableFromArray(self, arr: np.ndarray | _t.Sequence[float], tabnum=0) -> int:
+        """
+        Create a function table with the data in *arr*
+
+        Args:
+            arr: the data. A 2D array (numframes, numchannels) is stored interleaved
+            tabnum: the table number. 0 lets csound assign a number. If a table
+                with this number exists it is replaced
+
+        Returns:
+            the number of the created table
+
+        The table is allocated empty (with the exact size of the data, via
+        ``ftgen`` and GEN -2) within a single :meth:`Csound.evalCode`, then
+        the data is copied into it with one memmove. The data is never converted
+        to text, so this is suitable for large arrays, such as sample data.
+
+        .. seealso:: :meth:`Csound.tablesFromArrays`, :meth:`Csound.tableHandle`
+        """
+        data = _util.tableData(arr)
+        code = f'i__tabnum ftgen {int(tabnum)}, 0, -{len(data)}, -2, 0\nreturn i__tabnum'
+        tabnum = int(self.evalCode(code))
+        if tabnum <= 0:
+            raise RuntimeError(f"Could not create a table of size {len(data)}")
+        view = self.tableHandle(tabnum).array(refresh=False)
+        ct.memmove(view.ctypes.data, data.ctypes.data, data.nbytes)
+        return tabnum
+
+    def tablesFromArrays(self,
+                         arrays: _t.Sequence[np.ndarray],
+                         tabnums: _t.Sequence[int] | None = None
+                         ) -> list[int]:
+        """
+        Create many function tables from arrays, in one compile pass
+
+        Args:
+            arrays: the data for each table. 2D arrays are stored interleaved
+            tabnums: if given, the table number for each array (0 lets csound
+                assign a number)
+
+        Returns:
+            the numbers of the created tables, in the order of *arrays*
+
+        All tables are allocated within a single :meth:`Csound.evalCode`, then
+        each is filled with one memmove.
+
+        .. seealso:: :meth:`Csound.tableFromArray`
+        """
+        datas = [_util.tableData(arr) for arr in arrays]
+        if not datas:
+            return []
+        if tabnums is None:
+            tabnums = [0] * len(datas)
+        elif len(tabnums) != len(datas):
+            raise ValueError(f"Expected {len(datas)} table numbers, got {len(tabnums)}")
+        self.evalCode(_util.emptyTablesCode([len(data) for data in datas], tabnums))
+        created = [int(num) for num in self.stringChannel(_util.TABLENUMS_CHANNEL).split()]
+        if len(created) != len(datas):
+            raise RuntimeError(f"Could not create the tables, expected {len(datas)} tables, "
+                               f"created {len(created)}")
+        for tabnum, data in zip(created, datas):
+            view = self.tableHandle(tabnum).array(refresh=False)
+            ct.memmove(view.ctypes.data, data.ctypes.data, data.nbytes)
+        return created
+
     def isNamedGEN(self, num: int ) -> int:
         """Checks if a given GEN number *num* is a named GEN.
 
@@ -2519,17 +3051,42 @@ class Csound:
             ptr = ng.next
         return lst
 
-    def getOpcodes(self) -> list[OpcodeDef]:
+    def getOpcodes(self, cached=False) -> list[OpcodeDef]:
         """
         Get a list of all defined opcodes
 
         This can be used instead of :meth:`Csound.newOpcodeList` and
         :meth:`Csound.disposeOpcodeList`
 
+        Args:
+            cached: if False, the opcodes of this instance are returned, including
+                user defined opcodes compiled in it. Plugins are only loaded once
+                csound has been started (or :meth:`Csound.compileCommandLine`
+                has been called). If True, the opcodes of a fresh instance
+                (started, so with all plugins loaded, and using the same plugins
+                folder as this instance) are returned, without any user defined
+                opcodes. This list is cached on disk, keyed by the csound library,
+                its version and the plugins folder, and memoized within the
+                process (see :mod:`ctcsound7.opcodecache`)
+
         Returns:
             a list of OpcodeDef, a dataclass with attributes ``name``: ``str``,
             ``outtypes``: ``str``, ``intypes``: ``str``, ``flags``: ``int``
         """
+        if not cached:
+            return self._getOpcodes()
+        return opcodecache.cachedOpcodes(lambda: _getOpcodes(self._opcodeDir), libcsoundpath,
+                                         libcsound.csoundGetVersion(), opcodeDir=self._opcodeDir)
+
+    def opcodeIndex(self) -> opcodecache.OpcodeIndex:
+        """
+        Returns an index of all defined opcodes, for lookup by name and signature
+
+        .. seealso:: :class:`~ctcsound7.opcodecache.OpcodeIndex`
+        """
+        return opcodecache.OpcodeIndex(self.getOpcodes())
+
+    def _getOpcodes(self) -> list[OpcodeDef]:
         opcodes, numopcodes = self.newOpcodeList()
         if opcodes is None:
             return []
@@ -3252,7 +3809,9 @@ class CsoundPerformanceThread:
         csp = csound.csound()
         self.cpt = libcspt.NewCsoundPT(csp)
         self._callbacks: dict[str, ct._FuncPointer] = {}
-        self._processQueue: _queue.SimpleQueue | None = None
+        self._processQueue: TaskScheduler | None = None
+        self._commandRing: CommandRing | None = None
+        self._compileExecutor: _futures.ThreadPoolExecutor | None = None
         self._processCallback: tuple[ct._FuncPointer, _t.Any] | None = None
         if withProcessQueue:
             self.setProcessQueue()
@@ -3296,7 +3855,7 @@ class CsoundPerformanceThread:
         self._processCallback = (procfunc, data)
         libcspt.CsoundPTsetProcessCB(self.cpt, procfunc, ct.byref(data))
 
-    def setProcessQueue(self) -> None:
+    def setProcessQueue(self, budget: int = 1000, maxHeavyDeferrals: int = 8) -> None:
         """
         Setup a queue to pprocess tasks within the performance loop
 
@@ -3304,30 +3863,137 @@ class CsoundPerformanceThread:
         (code compilation, table access, etc), since when a performance thread is
         active any access to the API can result in high latency
 
+        Args:
+            budget: the max. time (in microseconds) spent running tasks at each
+                performance cycle. Tasks which do not fit within the budget are
+                deferred to later cycles. See :meth:`setTaskBudget`
+            maxHeavyDeferrals: the max. number of consecutive cycles in which
+                heavy tasks can be deferred
+
+        Tasks are scheduled with one of two priorities (see :meth:`task`):
+        'control' tasks (setting channels, sending events, ...) are run
+        before 'heavy' tasks (code compilation, ...), so that a slow task does not
+        delay quick ones. Heavy tasks still make progress under a steady stream
+        of control tasks: once they have been deferred for *maxHeavyDeferrals*
+        cycles, one heavy task is run at the start of the next cycle.
+
         .. note:: this sets up the process callback.
         """
         if self._processQueue is not None:
+            self._processQueue.budget = budget
+            self._processQueue.maxHeavyDeferrals = maxHeavyDeferrals
             return
         elif self._processCallback is not None:
             raise RuntimeError(f"Process callback already set")
-        self._processQueue = _queue.SimpleQueue()
+        self._processQueue = TaskScheduler(budget=budget, maxHeavyDeferrals=maxHeavyDeferrals)
         self._setProcessCallback(self._processQueueCallback)
 
+    def setTaskBudget(self, budget: int) -> None:
+        """
+        Set the max. time spent running tasks of the process queue at each cycle
+
+        Args:
+            budget: the time budget, in microseconds
+        """
+        if self._processQueue is None:
+            raise RuntimeError("The process queue is not active, start it via "
+                               "the setProcessQueue method")
+        self._processQueue.budget = budget
+
+    def schedulerStats(self) -> SchedulerStats:
+        """
+        Returns a snapshot of the counters of the process queue
+
+        Returns:
+            a :class:`~ctcsound7.scheduler.SchedulerStats`, with the current queue
+            depth, the number of tasks executed and deferred and the number of
+            cycles which overran the time budget
+        """
+        if self._processQueue is None:
+            raise RuntimeError("The process queue is not active, start it via "
+                               "the setProcessQueue method")
+        stats = _dataclasses.replace(self._processQueue.stats)
+        stats.queueDepth = len(self._processQueue)
+        return stats
+
+    def setCommandRing(self, capacity=1024, maxfields=16, channels: _t.Sequence[str] = ()
+                       ) -> CommandRing:
+        """
+        Setup a ring buffer to send events and channel values to the performance loop
+
+        Args:
+            capacity: the max. number of commands pending at any moment (rounded
+                up to a power of two). Commands pushed while the ring is full
+                are dropped (see :attr:`CommandRing.dropped`)
+            maxfields: the max. number of pfields of an event
+            channels: the names of the control channels which will be set via
+                the ring. Channels are resolved here, before the performance
+                starts: only these channels can be set via the ring
+
+        Returns:
+            the :class:`~ctcsound7.ringbuffer.CommandRing`
+
+        This is an alternative to :meth:`setProcessQueue`. Instead of a python
+        queue of tasks, commands are written to preallocated arrays and all
+        pending commands are consumed at each performance cycle, before
+        the next block is computed. Only one thread should push commands.
+
+        .. note:: this sets up the process callback, so it can't be used together
+            with :meth:`setProcessQueue` or :meth:`setProcessCallback`
+
+        .. code-block:: python
+
+            cs = Csound()
+            cs.compileOrc(...)
+            thread = cs.performanceThread()
+            ring = thread.setCommandRing(channels=['cutoff'])
+            thread.play()
+            ring.setChannel('cutoff', 2000)
+            ring.event('i', [1, 0, 2, 0.1])
+        """
+        if self._commandRing is not None:
+            missing = set(channels).difference(self._commandRing.channels())
+            if missing:
+                raise ValueError(f"The command ring is already set, channels {sorted(missing)} "
+                                 f"were not declared when it was created")
+            return self._commandRing
+        elif self._processCallback is not None:
+            raise RuntimeError(f"Process callback already set: {self._processCallback}")
+        channels = list(channels)
+        self._commandRing = CommandRing(capacity=capacity, maxfields=maxfields,
+                                        channels=channels,
+                                        channelIndex=self._csound._channelIndex(channels))
+        self._setProcessCallback(self._makeCommandRingCallback(self._commandRing))
+        return self._commandRing
+
+    def _makeCommandRingCallback(self, ring: CommandRing) -> _t.Callable[[ct.c_void_p], None]:
+        cs = self._csound.cs
+        scoreEvent = libcsound.csoundScoreEvent
+        kinds = _eventOrdToChar
+
+        def sendEvent(kind: int, pfields, numfields: int) -> None:
+            scoreEvent(cs, kinds[kind], pfields, numfields)
+
+        def callback(data) -> None:
+            ring.drain(sendEvent)
+
+        return callback
+
     def _processQueueCallback(self, data) -> None:
         assert self._processQueue is not None
-        N = self._processQueue.qsize()
-        if N > 0:
-            for _ in range(min(10, N)):
-                job = self._processQueue.get_nowait()
-                job(self._csound, self)
+        self._processQueue.run(self._csound, self)
 
-    def task(self, func: _t.Callable[[Csound, CsoundPerformanceThread, _t.Any], None], data=None) -> None:
+    def task(self, func: _t.Callable[[Csound, CsoundPerformanceThread], None], data=None, priority='control') -> None:
         """
         Add a task to the process queue, to be picked up by the process callback
 
         Args:
             func: a function of the form (csound: Csound, thread: CsoundPerformanceThread) -> None,
                 which can access the csound
+            priority: one of 'control' (for quick tasks) or 'heavy' (for tasks which
+                might take long, like compiling code). Control tasks are run before
+                heavy tasks, unless heavy tasks have been deferred for too long
+                (see :meth:`setProcessQueue`)
 
         .. note:: this sets the process callback for this thread. It will fail if the
             process callback has been set already.
@@ -3355,7 +4021,7 @@ class CsoundPerformanceThread:
             raise RuntimeError("This action needs the process queue, start it via "
                                "the setProcessQueue method")
         assert self._processQueue is not None
-        self._processQueue.put_nowait(func)
+        self._processQueue.put(func, priority=priority)
 
     def sync(self, timeout: float | None = None) -> None:
         """
@@ -3364,10 +4030,11 @@ class CsoundPerformanceThread:
         Args:
             timeout: if given, a max. amount of time to wait
         """
-        if self._processQueue is None or self._processQueue.qsize() == 0:
+        if self._processQueue is None or len(self._processQueue) == 0:
             return
         event = _threading.Event()
-        self.task(lambda cs, pt, e=event: e.set())
+        # heavy tasks run after any control task, so this runs after every pending task
+        self.task(lambda cs, pt, e=event: e.set(), priority='heavy')
         event.wait(timeout=timeout)
 
     def compile(self, code: str) -> None:
@@ -3382,12 +4049,62 @@ class CsoundPerformanceThread:
         To solve this, the performance thread provides a process callback, which
         is fired at each cycle. This method uses that callback to schedule
         a compilation action
+
+        .. seealso:: :meth:`compileAsync`, which compiles without blocking the performance
         """
         if self._processQueue is None:
             raise RuntimeError("This action needs the process queue, start it via "
                                "the setProcessQueue method")
         assert self._processQueue is not None
-        self._processQueue.put_nowait(lambda cs, pt: cs.compileOrc(code))
+        self._processQueue.put(lambda cs, pt: cs.compileOrc(code), priority='heavy')
+
+    def compileAsync(self, code: str) -> _futures.Future:
+        """
+        Compile orchestra code without blocking the performance
+
+        Args:
+            code: code to send to the running csound instance
+
+        Returns:
+            a :class:`concurrent.futures.Future`. Its result is CSOUND_SUCCESS once
+            the code has been compiled. If the compilation fails, the future
+            holds a RuntimeError
+
+        The code is parsed and compiled on a worker thread (one worker per
+        performance thread, so compilations are performed in order). The compiled
+        code is merged into the running engine by csound at the next cycle boundary,
+        so the performance never waits for the compilation, in contrast to
+        :meth:`compile`, which compiles within the process callback.
+
+        .. code-block:: python
+
+            thread = cs.performanceThread()
+            thread.play()
+            future = thread.compileAsync(r'''
+            instr 10
+              ...
+            endin
+            ''')
+            future.result()   # wait until compiled, raises if there were errors
+        """
+        if self._compileExecutor is None:
+            self._compileExecutor = _futures.ThreadPoolExecutor(max_workers=1,
+                                                                thread_name_prefix='csound-compile')
+        return self._compileExecutor.submit(self._compileOrcAsync, code)
+
+    def _compileOrcAsync(self, code: str) -> int:
+        cs = self._csound.cs
+        tree = libcsound.csoundParseOrc(cs, cstring(code))
+        if not tree:
+            raise RuntimeError("Could not parse code")
+        try:
+            ret = libcsound.csoundCompileTreeAsync(cs, tree)
+        finally:
+            # The tree is compiled before being queued for merging, it can be freed here
+            libcsound.csoundDeleteTree(cs, tree)
+        if ret != CSOUND_SUCCESS:
+            raise RuntimeError(f"Could not compile code, error code: {ret}")
+        return ret
 
     def evalCode(self, code: str, callback: _t.Callable[[float], None]=None, timeout=5.) -> float:
         """
@@ -3420,10 +4137,10 @@ class CsoundPerformanceThread:
             q = _queue.SimpleQueue()
             def func(cs, pt, q=q):
                  q.put(cs.evalCode(code))
-            self.task(func)
+            self.task(func, priority='heavy')
             return q.get(timeout=timeout)
         else:
-            self.task(lambda cs, pt, func=callback: func(cs.evalCode(code)))
+            self.task(lambda cs, pt, func=callback: func(cs.evalCode(code)), priority='heavy')
             return 0.
 
     def csound(self) -> ct.c_void_p:
@@ -3490,6 +4207,32 @@ class CsoundPerformanceThread:
         numfields = p.size
         libcspt.CsoundPTscoreEvent(self.cpt, ct.c_int(absp2mode), cchar(kind), numfields, ptr)
 
+    def scoreEvents(self, absp2mode: int, kind: str, pfields: np.ndarray) -> None:
+        """
+        Sends multiple score events in one call
+
+        Args:
+            absp2mode: if non-zero, the start time of the events is measured
+                from the beginning of performance, instead of relative to the current time
+            kind: the kind of event, one of 'i', 'f', 'e'
+            pfields: a 2D array of shape (numevents, numfields), each row holds
+                the pfields of one event, starting with p1. Events with less pfields
+                than *numfields* are padded at the end with NaN. Rows consisting only
+                of NaN are skipped
+
+        The rows are passed directly to csound, without any intermediate copy,
+        if *pfields* is a C-contiguous array of dtype MYFLT (float64).
+
+        .. seealso:: :meth:`Csound.events`
+        """
+        rows, counts, arr = _util.eventRows(pfields)
+        cpt = self.cpt
+        scoreEvent = libcspt.CsoundPTscoreEvent
+        kindchar = cchar(kind)
+        for row, numfields in zip(rows, counts):
+            if numfields:
+                scoreEvent(cpt, absp2mode, kindchar, numfields, row)
+
     def inputMessage(self, s: str) -> None:
         """Sends a score event as a string, similarly to line events (-L)."""
         libcspt.CsoundPTinputMessage(self.cpt, cstring(s))
@@ -3510,6 +4253,9 @@ class CsoundPerformanceThread:
         Also releases any resources associated with the performance thread
         object.
         """
+        if self._compileExecutor is not None:
+            self._compileExecutor.shutdown(wait=False)
+            self._compileExecutor = None
         return libcspt.CsoundPTjoin(self.cpt)
 
     def flushMessageQueue(self) -> None:
@@ -3531,6 +4277,146 @@ class CsoundPerformanceThread:
         self.scoreEvent(int(absolute), "e", [0, time])
 
 
+class PvsChannel:
+    """
+    A pvs (fsig) channel exchanging frames as numpy arrays
+
+    Args:
+        csound: the Csound instance
+        name: the name of the channel
+        fftsize: FFT analysis size
+        overlap: analysis overlap size in samples
+        winsize: analysis window size in samples
+        wintype: analysis window type, one of the PVS_WIN_* constants
+        format: analysis data format, one of the PVS_* format constants
+
+    .. note::
+
+        Do not create a PvsChannel directly, use :meth:`Csound.openPvsChannel`
+
+    The frame is held in a preallocated float32 array of shape ``(fftsize//2+1, 2)``
+    (one (amp, freq) pair per bin, for the default format), which is shared
+    with a :class:`PvsdatExt` struct. Reading (via :code:`pvsout`) and writing
+    (via :code:`pvsin`) pass that struct to csound, so no allocation takes place.
+    The framecount is tracked, so that :meth:`PvsChannel.poll` only returns
+    a frame when a new one has been produced.
+    """
+    __slots__ = ('name', 'fftsize', 'overlap', 'winsize', 'format', '_cs', '_cname',
+                 '_pvsdat', '_frame', '_lastFramecount', '__weakref__')
+
+    def __init__(self, csound: Csound, name: str, fftsize: int, overlap: int,
+                 winsize: int, wintype: int, format: int):
+        self.name = name
+        """The name of the channel"""
+
+        self.fftsize = fftsize
+        """The fft size"""
+
+        self.overlap = overlap
+        """The overlap size, in samples"""
+
+        self.winsize = winsize
+        """The window size, in samples"""
+
+        self.format = format
+        """The data format, one of PVS_AMP_FREQ, PVS_AMP_PHASE, PVS_COMPLEX, PVS_TRACKS"""
+
+        self._cs = csound.cs
+        self._cname = cstring(name)
+        self._frame = np.zeros((fftsize // 2 + 1, 2), dtype=np.float32)
+        self._pvsdat = PvsdatExt(N=fftsize, sliding=0, NB=0, overlap=overlap, winsize=winsize,
+                                 wintype=wintype, format=format, framecount=0,
+                                 frame=self._frame.ctypes.data_as(ct.POINTER(ct.c_float)))
+        self._lastFramecount = -1
+
+    def __repr__(self) -> str:
+        return f"PvsChannel(name={self.name!r}, fftsize={self.fftsize}, overlap={self.overlap})"
+
+    @property
+    def valid(self) -> bool:
+        """True if this channel can still be used"""
+        return self._cs is not None
+
+    def invalidate(self) -> None:
+        """
+        Invalidate this channel. Any access after this raises RuntimeError
+        """
+        self._cs = None
+
+    def array(self) -> np.ndarray:
+        """
+        The frame buffer of this channel, as last read or written
+
+        Returns:
+            a float32 array of shape (fftsize//2+1, 2)
+        """
+        return self._frame
+
+    @property
+    def framecount(self) -> int:
+        """The framecount of the last frame read"""
+        return self._pvsdat.framecount
+
+    def _fetch(self) -> None:
+        if self._cs is None:
+            raise RuntimeError(f"The pvs channel '{self.name}' is not valid anymore")
+        ret = libcsound.csoundGetPvsChannel(self._cs, ct.byref(self._pvsdat), self._cname)
+        if ret != CSOUND_SUCCESS:
+            raise RuntimeError(f"Could not read pvs channel '{self.name}', error code: {ret}")
+
+    def poll(self) -> np.ndarray | None:
+        """
+        Reads the channel, returns the frame if it is new, None otherwise
+
+        A frame is new if its framecount has changed since the last call to
+        this method. The returned array is the frame buffer of this channel,
+        copy it if it needs to outlive the next read
+        """
+        self._fetch()
+        framecount = self._pvsdat.framecount
+        if framecount == self._lastFramecount:
+            return None
+        self._lastFramecount = framecount
+        return self._frame
+
+    def read(self, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Reads the current frame of the channel and copies it
+
+        Args:
+            out: if given, the frame is copied into this array, which must have
+                the shape (fftsize//2+1, 2)
+
+        Returns:
+            the copied frame (*out*, if given)
+        """
+        self._fetch()
+        if out is None:
+            return self._frame.copy()
+        np.copyto(out, self._frame)
+        return out
+
+    def write(self, frame: np.ndarray) -> None:
+        """
+        Writes a whole frame to the channel
+
+        Args:
+            frame: an array of shape (fftsize//2+1, 2) (or with the same number
+                of elements)
+        """
+        if self._cs is None:
+            raise RuntimeError(f"The pvs channel '{self.name}' is not valid anymore")
+        src = np.asarray(frame, dtype=np.float32)
+        if src.size != self._frame.size:
+            raise ValueError(f"Expected a frame of shape {self._frame.shape}, got {src.shape}")
+        if src.ctypes.data != self._frame.ctypes.data:
+            self._frame.reshape(-1)[:] = src.reshape(-1)
+        self._pvsdat.framecount += 1
+        ret = libcsound.csoundSetPvsChannel(self._cs, ct.byref(self._pvsdat), self._cname)
+        if ret != CSOUND_SUCCESS:
+            raise RuntimeError(f"Could not write pvs channel '{self.name}', error code: {ret}")
+
+
 def getSystemSr(module: str = '') -> tuple[float, str]:
     """
     Get the system samplerate reported by csound
@@ -3564,3 +4450,13 @@ def getSystemSr(module: str = '') -> tuple[float, str]:
             break
     csound.destroyMessageBuffer()
     return sr, module
+
+
+def _getOpcodes(opcodeDir='') -> list[OpcodeDef]:
+    # Plugins are loaded when csound starts
+    cs = Csound(opcodeDir=opcodeDir)
+    for option in ('-n', '-m0', '-d'):
+        cs.setOption(option)
+    cs.compileOrc('sr = 44100\nksmps = 64\nnchnls = 2\n0dbfs = 1\n')
+    cs.start()
+    return cs._getOpcodes()
@@ -6,11 +6,19 @@ import warnings
 import ctypes as ct
 import queue as _queue
 import threading as _threading
+import dataclasses as _dataclasses
+import concurrent.futures as _futures
 
 from .common import *
 from . import _util
 from . import _dll
+from . import opcodecache
+from . import messages as _messages
+from .handles import ChannelHandle, HandleCache, TableHandle
+from .ringbuffer import CommandRing
+from .scheduler import TaskScheduler, SchedulerStats
 
+import weakref as _weakref
 import typing as _t
 
 
@@ -370,9 +378,9 @@ def _declareAPI(libcsound, libcspt):
 
 
 if not BUILDING_DOCS:
-    libcsound, libcsoundpath = _dll.csoundDLL()
-    libcspt = libcsound
-    _declareAPI(libcsound, libcspt)
+    _libcsound, libcsoundpath = _dll.csoundDLL()
+    # Prototypes are declared on first use, see _dll.lazyDeclare
+    libcsound, libcspt = _dll.lazyDeclare(_declareAPI, _libcsound, _libcsound)
 
 
 _scoreEventToTypenum = {
@@ -380,6 +388,8 @@ _scoreEventToTypenum = {
     'f': CS_TABLE_EVENT,
     'e': CS_END_EVENT}
 
+_eventOrdToTypenum = {ord(kind): typenum for kind, typenum in _scoreEventToTypenum.items()}
+
 
 # --------------------------------------------------------------------------------
 
@@ -420,6 +430,9 @@ class Csound:
             self.cs = libcsound.csoundCreate(ct.py_object(hostData), opcdir)
             self._fromPointer = False
 
+        self._opcodeDir = opcodeDir
+        """The plugins folder given at creation, if any"""
+
         self._callbacks: dict[str, ct._FuncPointer] = {}
         """Holds any callback set"""
 
@@ -430,6 +443,18 @@ class Csound:
 
         self._started = False
 
+        self._options: list[str] = []
+        """The options set via setOption since the instance was created or reset"""
+
+        self._channelHandles = HandleCache(maxsize=1024)
+        """Caches channel handles, invalidated on reset"""
+
+        self._channelIndexes = HandleCache(maxsize=64)
+        """Caches compiled channel indexes, see setControlChannels"""
+
+        self._tableHandles = HandleCache(maxsize=256)
+        """Caches table handles, invalidated on reset"""
+
     def __del__(self):
         """Destroys an instance of Csound."""
         if self._perfthread:
@@ -596,6 +621,7 @@ class Csound:
         """
         if self._compilationStarted:
             raise RuntimeError(f"Cannot set options once code has already been compiled")
+        self._options.append(option)
         return libcsound.csoundSetOption(self.cs, cstring(option))
 
     def params(self, params: CsoundParams = None) -> CsoundParams:
@@ -1043,6 +1069,10 @@ class Csound:
         libcsound.csoundReset(self.cs)
         self._started = False
         self._compilationStarted = False
+        self._options.clear()
+        self._channelHandles.clear()
+        self._channelIndexes.clear()
+        self._tableHandles.clear()
 
     #
     # Realtime Audio I/O
@@ -1103,6 +1133,102 @@ class Csound:
         size = self.ksmps() * self.nchnls()
         return _util.castarray(buf, shape=(size,))
 
+    def render(self, dur: float = 0., out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Renders audio offline into a numpy array, without writing any soundfile
+
+        Args:
+            dur: the duration to render, in seconds. If not given, renders until
+                the end of the score (or until *out* is full, if given)
+            out: if given, a C-contiguous array of MYFLT with shape ``(frames, nchnls)``
+                where the rendered audio is placed. Otherwise an array is allocated
+
+        Returns:
+            a view of the output array containing only the rendered frames
+
+        If the performance has not been started yet, host audio I/O is enabled
+        (see :meth:`Csound.setHostAudioIO`) and csound is started. Then
+        :meth:`Csound.performKsmps` is called in a loop and each block of
+        :meth:`Csound.spout` is copied into the output array. Rendering stops
+        when *dur* is reached, *out* is full or the score ends, whichever
+        happens first.
+
+        .. code-block:: python
+
+            cs = Csound()
+            cs.compileOrc(...)
+            cs.scoreEvent('i', [1, 0, 4])
+            samples = cs.render(4)  # shape: (4 * sr, nchnls)
+
+        """
+        if not self._started:
+            self.setHostAudioIO()
+            self.start()
+        sr = self.sr()
+        cs = self.cs
+        perform = libcsound.csoundPerformKsmps
+        return _util.renderLoop(perform=lambda: perform(cs),
+                                source=ct.addressof(libcsound.csoundGetSpout(cs).contents),
+                                blockframes=self.ksmps(),
+                                nchnls=self.nchnls(),
+                                numframes=round(dur * sr),
+                                out=out,
+                                growframes=int(sr * 10))
+
+    def stream(self,
+               chunkFrames: int = 4096,
+               input: _t.Iterator[np.ndarray] | None = None,
+               numBuffers: int = 2
+               ) -> _t.Iterator[np.ndarray]:
+        """
+        Performs csound, yielding the generated audio in fixed-size chunks
+
+        Args:
+            chunkFrames: the number of frames of each chunk. Must be a multiple
+                of ksmps
+            input: if given, an iterator of arrays of shape ``(chunkFrames, nchnlsInput)``.
+                Each array is fed to :meth:`Csound.spin`, one ksmps block at a
+                time, while the corresponding output chunk is generated. The
+                stream stops when the input is exhausted. The last array can
+                have fewer frames, it is then padded with zeros
+            numBuffers: the number of preallocated chunks, reused in a round-robin
+                fashion
+
+        Returns:
+            a generator of arrays of shape ``(chunkFrames, nchnls)``. The last
+            chunk might be shorter if the score ends, or if the last input array
+            is shorter (in which case it has as many frames as that array)
+
+        The yielded arrays are views into a ring of *numBuffers* preallocated
+        arrays: a chunk is overwritten *numBuffers* chunks later, so a consumer
+        which needs to keep a chunk for longer must copy it. Since this is a
+        generator, the performance only advances as fast as chunks are consumed.
+        If the performance has not been started yet, host audio I/O is enabled
+        and csound is started.
+
+        .. code-block:: python
+
+            cs = Csound()
+            cs.compileOrc(...)
+            for chunk in cs.stream(chunkFrames=1024):
+                sock.send(chunk.astype('float32').tobytes())
+
+        """
+        if not self._started:
+            self.setHostAudioIO()
+            self.start()
+        cs = self.cs
+        perform = libcsound.csoundPerformKsmps
+        return _util.streamLoop(perform=lambda: perform(cs),
+                                source=ct.addressof(libcsound.csoundGetSpout(cs).contents),
+                                blockframes=self.ksmps(),
+                                nchnls=self.nchnls(),
+                                chunkframes=chunkFrames,
+                                numbuffers=numBuffers,
+                                inputs=iter(input) if input is not None else None,
+                                sink=ct.addressof(libcsound.csoundGetSpin(cs).contents),
+                                inchnls=self.nchnlsInput())
+
     #
     # Realtime MIDI I/O
     #
@@ -1207,9 +1333,50 @@ class Csound:
         informational message, using a less granular signature.
         This callback can be set for --realtime mode.
         This callback is cleared after reset.
+
+        Args:
+            attr: not used, kept for backwards compatibility. The attribute
+                of each message is passed to *function*
+            function: a function ``(csound: CSOUND_p, attr: int, message: bytes) -> None``
+
+        The function is called from the thread where csound prints the message,
+        which can be the performance thread. To keep the cost within that thread
+        low use a :class:`~ctcsound7.messages.MessageDispatcher` (see
+        :meth:`Csound.messageDispatcher`)
         """
         self._messageStringCallback = MSGSTRFUNC(function)
-        libcsound.csoundSetMessageStringCallback(self.cs, ct.c_int32(attr), self._messageStringCallback)
+        libcsound.csoundSetMessageStringCallback(self.cs, self._messageStringCallback)
+
+    def messageDispatcher(self, capacity=8192, interval=0.02, start=True) -> _messages.MessageDispatcher:
+        """
+        Routes csound's messages to python handlers called from a separate thread
+
+        Args:
+            capacity: the max. number of messages waiting to be dispatched. If
+                the dispatch thread falls behind, further messages are dropped
+                (and counted)
+            interval: the max. time the dispatch thread waits before dispatching
+                pending messages, in seconds
+            start: if True, start the dispatch thread
+
+        Returns:
+            the :class:`~ctcsound7.messages.MessageDispatcher`. Add handlers
+            via :meth:`~ctcsound7.messages.MessageDispatcher.addHandler`
+
+        This installs a message string callback (see :meth:`Csound.setMessageStringCallback`)
+        which only stores the raw message, its attribute and a timestamp.
+        Decoding and calling the handlers happens in the dispatch thread.
+
+        .. code-block:: python
+
+            dispatcher = cs.messageDispatcher()
+            dispatcher.addHandler(lambda batch: logfile.writelines(msg for msg, attr in batch))
+        """
+        dispatcher = _messages.MessageDispatcher(capacity=capacity, interval=interval)
+        self.setMessageStringCallback(0, dispatcher.callback)
+        if start:
+            dispatcher.start()
+        return dispatcher
 
     def createMessageBuffer(self, echo=False) -> None:
         """
@@ -1284,6 +1451,42 @@ class Csound:
             yield msg, attr
             self.popFirstMessage()
 
+    def drainMessages(self, max: int | None = None) -> list[tuple[str, int]]:
+        """
+        Reads all pending messages from the message buffer in one batch
+
+        Args:
+            max: if given, the max. number of messages to read. Any remaining
+                messages are left in the buffer
+
+        Returns:
+            a list of tuples (message: str, attribute: int), in the order
+            they were produced
+
+        Compared to :meth:`~Csound.iterMessages` the count is queried only once
+        and the library functions are called directly, without going through
+        the wrapper methods. Messages are decoded after the buffer has been
+        drained. A message buffer must have been created via
+        :meth:`~Csound.createMessageBuffer`
+
+        .. seealso:: :class:`~ctcsound7.messages.MessagePump`
+        """
+        cs = self.cs
+        count = libcsound.csoundGetMessageCnt(cs)
+        if max is not None and count > max:
+            count = max
+        if count <= 0:
+            return []
+        getFirst = libcsound.csoundGetFirstMessage
+        getAttr = libcsound.csoundGetFirstMessageAttr
+        pop = libcsound.csoundPopFirstMessage
+        raw = []
+        for _ in range(count):
+            raw.append((getFirst(cs), getAttr(cs)))
+            pop(cs)
+        return [(msg.decode('utf-8', errors='replace') if msg else '', attr)
+                for msg, attr in raw]
+
     #
     # Channels, Controls and Events
     #
@@ -1577,6 +1780,51 @@ class Csound:
         """
         libcsound.csoundUnlockChannel(self.cs, cstring(channel))
 
+    def channel(self, name: str, kind='control', locking=False) -> ChannelHandle:
+        """
+        Returns a handle to a control or audio channel
+
+        Args:
+            name: the name of the channel
+            kind: one of 'control', 'audio'
+            locking: if True, access via the handle is protected by the channel lock
+
+        Returns:
+            a :class:`~ctcsound7.handles.ChannelHandle`
+
+        The channel is created (as a bidirectional channel) if it does not exist yet.
+        The pointer to the channel is resolved once, so setting or getting the
+        value through the handle avoids encoding the name and looking up the
+        channel at each call. Handles are cached per instance (the least recently
+        used are evicted when the cache is full) and are invalidated when this
+        instance is reset.
+
+        .. code-block:: python
+
+            freq = cs.channel('freq')
+            freq.value = 440
+            # or
+            freq.set(440)
+        """
+        key = (name, kind)
+        handle = self._channelHandles.get(key)
+        if handle is not None and handle.locking == locking:
+            return handle
+        if kind not in ('control', 'audio'):
+            raise ValueError(f"kind should be one of 'control', 'audio', got {kind}")
+        arr, err = self.channelPtr(name, kind=kind, output=True, input=True)
+        if err:
+            raise RuntimeError(f"Could not get a pointer to channel '{name}': {err}")
+        cs = self.cs
+        cname = cstring(name)
+        lockfunc, unlockfunc = libcsound.csoundLockChannel, libcsound.csoundUnlockChannel
+        lock = lambda: lockfunc(cs, cname)
+        unlock = lambda: unlockfunc(cs, cname)
+        handle = ChannelHandle(name=name, kind=kind, array=arr, lock=lock, unlock=unlock,
+                               locking=locking)
+        self._channelHandles.put(key, handle)
+        return handle
+
     def controlChannel(self, name: str) -> tuple[float, int]:
         """Retrieves the value of control channel identified by *name*.
 
@@ -1600,6 +1848,84 @@ class Csound:
         """
         libcsound.csoundSetControlChannel(self.cs, cstring(name), MYFLT(val))
 
+    def _channelIndex(self, names: _t.Sequence[str]) -> _util.ChannelIndex:
+        key = tuple(names)
+        index = self._channelIndexes.get(key)
+        if index is None:
+            index = _util.ChannelIndex([self.channel(name) for name in key])
+            self._channelIndexes.put(key, index)
+        return index
+
+    def setControlChannels(self,
+                           names: _t.Sequence[str],
+                           values: np.ndarray | _t.Sequence[float],
+                           lock=False
+                           ) -> None:
+        """
+        Sets the value of multiple control channels in one operation
+
+        Args:
+            names: the names of the channels
+            values: the values, one for each channel
+            lock: if True, all channels are locked during the operation
+
+        The channels are resolved the first time a given sequence of names is
+        used and the resulting index is cached, so that subsequent calls with
+        the same names set the values through the cached channel views, without
+        any name lookup. If the memory of the channels is contiguous all values
+        are set in one vectorized operation, otherwise the views are set one by
+        one. Channels are created if they do not exist. The cache is invalidated
+        on reset.
+
+        .. code-block:: python
+
+            names = [f'gain{i}' for i in range(100)]
+            gains = np.zeros(100)
+            while True:
+                ...
+                cs.setControlChannels(names, gains)
+                cs.performKsmps()
+
+        .. seealso:: :meth:`Csound.controlChannels`, :meth:`Csound.channel`
+        """
+        index = self._channelIndex(names)
+        if lock:
+            index.lock()
+            try:
+                index.scatter(values)
+            finally:
+                index.unlock()
+        else:
+            index.scatter(values)
+
+    def controlChannels(self,
+                        names: _t.Sequence[str],
+                        out: np.ndarray | None = None,
+                        lock=False
+                        ) -> np.ndarray:
+        """
+        Retrieves the value of multiple control channels in one operation
+
+        Args:
+            names: the names of the channels
+            out: if given, the values are placed in this array, which must
+                be of the same size as *names*
+            lock: if True, all channels are locked during the operation
+
+        Returns:
+            an array with the value of each channel (*out*, if given)
+
+        .. seealso:: :meth:`Csound.setControlChannels`
+        """
+        index = self._channelIndex(names)
+        if lock:
+            index.lock()
+            try:
+                return index.gather(out)
+            finally:
+                index.unlock()
+        return index.gather(out)
+
     def audioChannel(self, name: str, samples: np.ndarray):
         """Copies the audio channel identified by name into ndarray samples.
 
@@ -1703,17 +2029,86 @@ class Csound:
         """
         sizes = libcsound.csoundArrayDataSizes(adat)
         dims = libcsound.csoundArrayDataDimensions(adat)
-        return tuple(_util.castarray(sizes, shape=(dims,)))
+        return tuple(sizes[i] for i in range(dims))
 
     def setArrayData(self, adat: ARRAYDAT_p, data: np.ndarray) -> None:
-        """Set the data in the ARRAYDAT adat."""
-        # TODO: check data, get a void pointer to the data
-        libcsound.csoundSetArrayData(adat, data)
+        """Set the data in the ARRAYDAT adat.
+
+        Args:
+            adat: the array, a ARRAYDAT_p struct
+            data: the data to copy. It must have the same number of elements
+                as the array (for audio arrays, ksmps samples per element)
+        """
+        view = _arrayDataView(adat, self.ksmps())
+        src = np.ascontiguousarray(data, dtype=MYFLT)
+        if view is None or src.size != view.size:
+            shape = view.shape if view is not None else ()
+            raise ValueError(f"Size mismatch, the array has shape {shape}, got data with shape {src.shape}")
+        libcsound.csoundSetArrayData(adat, src.ctypes.data)
 
     def arrayData(self, adat: ARRAYDAT_p) -> np.ndarray:
-        """Get the data from the ARRAYDAT adat."""
-        # TODO: construct a numpy array pointing to the returned data
-        return libcsound.csoundGetArrayData(adat)
+        """Get the data from the ARRAYDAT adat.
+
+        Returns:
+            a numpy array pointing to the data of the array (no copy is made).
+            For audio arrays the last axis holds the ksmps samples of each
+            element. String arrays are not supported
+
+        .. seealso:: :meth:`Csound.openArrayChannel`
+        """
+        view = _arrayDataView(adat, self.ksmps())
+        if view is None:
+            raise RuntimeError("The array has no data")
+        return view
+
+    def openArrayChannel(self,
+                         name: str,
+                         kind='k',
+                         size: int | _t.Sequence[int] | None = None
+                         ) -> ArrayChannel:
+        """
+        Opens an array channel as a numpy view
+
+        Args:
+            name: the name of the channel
+            kind: the kind of array, one of 'k', 'a'. Only used if the
+                channel needs to be created
+            size: the size of the array or the sizes of each dimension. Needed
+                if the channel does not exist yet
+
+        Returns:
+            an :class:`ArrayChannel`
+
+        The channel is cached and invalidated when this instance is reset
+
+        .. code-block:: python
+
+            cs = Csound()
+            cs.compileOrc(r'''
+            instr 1
+              kspectrum[] chnget "spectrum"
+              ...
+            endin
+            ''')
+            spectrum = cs.openArrayChannel('spectrum', size=1024)
+            spectrum.set(np.random.uniform(0, 1, 1024))
+
+        """
+        key = (name, 'array')
+        chan = self._channelHandles.get(key)
+        if chan is not None:
+            return chan
+        if size is not None:
+            adat = self.initArrayChannel(name, dtype=kind, size=size)
+            if not adat:
+                raise RuntimeError(f"Could not initialize array channel '{name}'")
+        else:
+            adat, err = self._channelPtr(name, CSOUND_ARRAY_CHANNEL | CSOUND_INPUT_CHANNEL | CSOUND_OUTPUT_CHANNEL)
+            if err:
+                raise RuntimeError(f"Could not open array channel '{name}': {err}")
+        chan = ArrayChannel(name, adat=adat, ksmps=self.ksmps())
+        self._channelHandles.put(key, chan)
+        return chan
 
     # These two functions are using c void * for the data.
     # Not very useful in Python. To be refined.
@@ -1776,15 +2171,72 @@ class Csound:
         """Get the current framecount from PVSDAT pvsdat."""
         return libcsound.csoundPvsDataFramecount(pvsdat)
 
-    # These two functions are using c float * for the frame data.
-    # Not very useful in Python. To be refined.
-    def pvsData(self, pvsdat):
-        """Get the analysis data frame from the PVSDAT pvsdat."""
-        return libcsound.csoundGetPvsData(pvsdat)
+    def pvsData(self, pvsdat: PVSDAT_p) -> np.ndarray:
+        """Get the analysis data frame from the PVSDAT pvsdat.
 
-    def setPvsData(self, pvsdat, frame):
-        """Set the analysis data frame in the PVSDAT pvsdat."""
-        libcsound.csoundSetPvsData(pvsdat, frame)
+        Returns:
+            a float32 array of shape (fftsize//2+1, 2) pointing to the frame
+            data (no copy is made)
+
+        .. seealso:: :meth:`Csound.openPvsChannel`
+        """
+        ptr = libcsound.csoundGetPvsData(pvsdat)
+        if not ptr:
+            raise RuntimeError("The pvs data has no frame")
+        fftsize = libcsound.csoundPvsDataFFTSize(pvsdat)
+        return np.ctypeslib.as_array(ptr, shape=(fftsize // 2 + 1, 2))
+
+    def setPvsData(self, pvsdat: PVSDAT_p, frame: np.ndarray) -> None:
+        """Set the analysis data frame in the PVSDAT pvsdat.
+
+        Args:
+            pvsdat: the pvs data
+            frame: an array with fftsize+2 elements, for example of shape
+                (fftsize//2+1, 2)
+        """
+        fftsize = libcsound.csoundPvsDataFFTSize(pvsdat)
+        src = np.ascontiguousarray(frame, dtype=np.float32)
+        if src.size != fftsize + 2:
+            raise ValueError(f"Expected a frame of {fftsize + 2} elements, got shape {src.shape}")
+        libcsound.csoundSetPvsData(pvsdat, src.ctypes.data_as(ct.POINTER(ct.c_float)))
+
+    def openPvsChannel(self,
+                       name: str,
+                       fftsize=1024,
+                       overlap=256,
+                       winsize=0,
+                       wintype: int | str = 'hann',
+                       format=PVS_AMP_FREQ
+                       ) -> PvsChannel:
+        """
+        Opens a pvs (fsig) channel, giving access to its frames as numpy arrays
+
+        Args:
+            name: the name of the channel
+            fftsize: FFT analysis size
+            overlap: analysis overlap size in samples
+            winsize: analysis window size in samples. If not given, the fftsize is used
+            wintype: analysis window type. See :meth:`Csound.initPvsChannel`
+            format: analysis data format
+
+        Returns:
+            a :class:`PvsChannel`
+
+        The analysis parameters are only used if the channel does not exist yet.
+        The channel is cached and invalidated when this instance is reset
+        """
+        key = (name, 'pvs')
+        chan = self._channelHandles.get(key)
+        if chan is not None:
+            return chan
+        pvsdat = self.initPvsChannel(name, fftsize=fftsize, overlap=overlap,
+                                     winsize=winsize or fftsize, wintype=wintype,
+                                     format=format)
+        if not pvsdat:
+            raise RuntimeError(f"Could not initialize pvs channel '{name}'")
+        chan = PvsChannel(name, pvsdat=pvsdat)
+        self._channelHandles.put(key, chan)
+        return chan
 
     def channelDatasize(self, name: str) -> int:
         """Returns the size of data stored in a channel."""
@@ -1822,6 +2274,46 @@ class Csound:
         n_fields = ct.c_int32(p.size)
         libcsound.csoundEvent(self.cs, ct.c_int32(eventtype), ptr, n_fields, ct.c_int32(not block))
 
+    def events(self, kind: str, pfields: np.ndarray, block=True) -> None:
+        """
+        Send multiple events in one call
+
+        Args:
+            kind: the kind of event, one of 'i', 'f', 'e'
+            pfields: a 2D array of shape (numevents, numfields), each row holds
+                the pfields of one event, starting with p1. Events with less pfields
+                than *numfields* are padded at the end with NaN. Rows consisting only
+                of NaN are skipped
+            block: if True, the operation is blocking. Otherwise it is
+                performed asynchronously
+
+        The rows are passed directly to csound, without any intermediate copy,
+        if *pfields* is a C-contiguous array of dtype MYFLT (float64). Otherwise
+        it is converted once for the whole batch.
+
+        .. code-block:: python
+
+            import numpy as np
+            pfields = np.full((1000, 5), np.nan)
+            pfields[:, 0] = 1
+            pfields[:, 1] = np.linspace(0, 10, 1000)
+            pfields[:, 2] = 0.1
+            pfields[:, 3] = np.random.uniform(60, 72, 1000)
+            cs.events('i', pfields)
+
+        .. seealso:: :meth:`Csound.event`
+        """
+        eventtype = _scoreEventToTypenum.get(kind)
+        if eventtype is None:
+            raise ValueError(f"Invalid event kind, get {kind}, expected one of {_scoreEventToTypenum.keys()}")
+        rows, counts, arr = _util.eventRows(pfields)
+        cs = self.cs
+        event = libcsound.csoundEvent
+        async_ = int(not block)
+        for row, numfields in zip(rows, counts):
+            if numfields:
+                event(cs, eventtype, row, numfields, async_)
+
     def scoreEvent(self, kind: str, pfields: _t.Sequence[float] | np.ndarray) -> int:
         """
         Send a new event
@@ -1961,6 +2453,33 @@ class Csound:
         """
         return libcsound.csoundTableLength(self.cs, ct.c_int32(table))
 
+    def tableCopyOut(self, table: int, dest: np.ndarray) -> None:
+        """Copies the contents of a function table into a supplied ndarray *dest*.
+
+        The destination needs to have the size of the table
+
+        .. seealso:: :meth:`Csound.tableHandle`
+        """
+        self.tableHandle(table).copyOut(dest)
+
+    def tableCopyIn(self, table: int, src: np.ndarray) -> None:
+        """Copies the contents of an ndarray *src* into a given function *table*.
+
+        The table needs to have sufficient space to receive all the array contents.
+
+        .. seealso:: :meth:`Csound.tableHandle`
+        """
+        self.tableHandle(table).copyIn(src)
+
+    def tableCopyInAsync(self, table: int, src: np.ndarray) -> None:
+        """Asynchronous version of :py:meth:`tableCopyIn()`.
+
+        The copy is performed at the start of the next cycle of the performance
+        thread, if it has a process queue (see :meth:`CsoundPerformanceThread.setProcessQueue`).
+        Otherwise it is performed immediately
+        """
+        self.tableHandle(table).copyInAsync(src)
+
     def table(self, tableNum: int) -> np.ndarray | None:
         """Returns a pointer to function table tableNum as an ndarray.
 
@@ -1987,6 +2506,130 @@ class Csound:
             return None
         return _util.castarray(ptr, shape=(size,)) if size >= 0 else None
 
+    def tableHandle(self, tableNum: int) -> TableHandle:
+        """
+        Returns a handle to a function table
+
+        Args:
+            tableNum: the table number
+
+        Returns:
+            a :class:`~ctcsound7.handles.TableHandle`
+
+        The handle keeps the numpy view of the table, its size and its GEN
+        arguments, so repeated access does not rebuild them. Handles are cached
+        per table number: calling this method again with the same number returns
+        the same handle, after checking (with a single call into csound) whether
+        the table has been redefined. Handles are invalidated when this instance
+        is reset. Raises RuntimeError if the table does not exist
+
+        .. code-block:: python
+
+            wave = cs.tableHandle(1)
+            wave.copyIn(samples)
+            wave[0:10] = 0
+            print(wave.gen, wave.args)
+        """
+        handle = self._tableHandles.get(tableNum)
+        if handle is not None:
+            try:
+                handle.refresh()
+                return handle
+            except RuntimeError:
+                self._tableHandles.pop(tableNum)
+                raise
+        cs = self.cs
+        getTable, getTableArgs = libcsound.csoundGetTable, libcsound.csoundGetTableArgs
+
+        def resolve(cs=cs, tableNum=tableNum):
+            ptr = ct.POINTER(MYFLT)()
+            size = getTable(cs, ct.byref(ptr), tableNum)
+            return ptr, size
+
+        def resolveArgs(cs=cs, tableNum=tableNum):
+            ptr = ct.POINTER(MYFLT)()
+            size = getTableArgs(cs, ct.byref(ptr), tableNum)
+            return _util.castarray(ptr, shape=(size,)).copy() if size > 0 else None
+
+        selfref = _weakref.ref(self)
+
+        def defer(func) -> bool:
+            csound = selfref()
+            thread = csound._perfthread if csound is not None else None
+            if thread is None or thread._processQueue is None:
+                return False
+            thread.task(lambda csound, thread: func())
+            return True
+
+        handle = TableHandle(tableNum, resolve=resolve, resolveArgs=resolveArgs, defer=defer)
+        self._tableHandles.put(tableNum, handle)
+        return handle
+
+    def tableFromArray(self, arr: np.ndarray | _t.Sequence[float], tabnum=0) -> int:
+        """
+        Create a function table with the data in *arr*
+
+        Args:
+            arr: the data. A 2D array (numframes, numchannels) is stored interleaved
+            tabnum: the table number. 0 lets csound assign a number. If a table
+                with this number exists it is replaced
+
+        Returns:
+            the number of the created table
+
+        The table is allocated empty (with the exact size of the data, via
+        ``ftgen`` and GEN -2) within a single :meth:`Csound.evalCode`, then
+        the data is copied into it with one memmove. The data is never converted
+        to text, so this is suitable for large arrays, such as sample data.
+
+        .. seealso:: :meth:`Csound.tablesFromArrays`, :meth:`Csound.tableHandle`
+        """
+        data = _util.tableData(arr)
+        code = f'i__tabnum ftgen {int(tabnum)}, 0, -{len(data)}, -2, 0\nreturn i__tabnum'
+        tabnum = int(self.evalCode(code))
+        if tabnum <= 0:
+            raise RuntimeError(f"Could not create a table of size {len(data)}")
+        view = self.tableHandle(tabnum).array(refresh=False)
+        ct.memmove(view.ctypes.data, data.ctypes.data, data.nbytes)
+        return tabnum
+
+    def tablesFromArrays(self,
+                         arrays: _t.Sequence[np.ndarray],
+                         tabnums: _t.Sequence[int] | None = None
+                         ) -> list[int]:
+        """
+        Create many function tables from arrays, in one compile pass
+
+        Args:
+            arrays: the data for each table. 2D arrays are stored interleaved
+            tabnums: if given, the table number for each array (0 lets csound
+                assign a number)
+
+        Returns:
+            the numbers of the created tables, in the order of *arrays*
+
+        All tables are allocated within a single :meth:`Csound.evalCode`, then
+        each is filled with one memmove.
+
+        .. seealso:: :meth:`Csound.tableFromArray`
+        """
+        datas = [_util.tableData(arr) for arr in arrays]
+        if not datas:
+            return []
+        if tabnums is None:
+            tabnums = [0] * len(datas)
+        elif len(tabnums) != len(datas):
+            raise ValueError(f"Expected {len(datas)} table numbers, got {len(tabnums)}")
+        self.evalCode(_util.emptyTablesCode([len(data) for data in datas], tabnums))
+        created = [int(num) for num in self.stringChannel(_util.TABLENUMS_CHANNEL).split()]
+        if len(created) != len(datas):
+            raise RuntimeError(f"Could not create the tables, expected {len(datas)} tables, "
+                               f"created {len(created)}")
+        for tabnum, data in zip(created, datas):
+            view = self.tableHandle(tabnum).array(refresh=False)
+            ct.memmove(view.ctypes.data, data.ctypes.data, data.nbytes)
+        return created
+
     #
     # Score Handling
     #
@@ -2249,8 +2892,38 @@ class Csound:
         self._callbacks['openFileCallback'] = f = OPENFILEFUNC(function)
         libcsound.csoundSetOpenFileCallback(self.cs, f)
 
-    def getOpcodes(self) -> list[OpcodeDef]:
-        return _getOpcodes()
+    def getOpcodes(self, cached=True) -> list[OpcodeDef]:
+        """
+        Get a list of all defined opcodes
+
+        Args:
+            cached: if True, use the opcode cache. The list is cached on disk,
+                keyed by the csound library, its version and the plugins folder,
+                and memoized within the process (see :mod:`ctcsound7.opcodecache`)
+
+        Returns:
+            a list of OpcodeDef, a dataclass with attributes ``name``: ``str``,
+            ``outtypes``: ``str``, ``intypes``: ``str``, ``flags``: ``int``
+
+        csound 7 has no API to list the opcodes of an instance: the opcodes are
+        always queried from a fresh csound instance (using the same plugins folder
+        as this instance), so user defined opcodes compiled in this instance are
+        not included, whether cached or not. *cached* only determines if the
+        opcode cache is used. This differs from csound 6, where ``cached=False``
+        (the default there) returns the opcodes of this instance
+        """
+        if not cached:
+            return _getOpcodes(self._opcodeDir)
+        return opcodecache.cachedOpcodes(lambda: _getOpcodes(self._opcodeDir), libcsoundpath,
+                                         libcsound.csoundGetVersion(), opcodeDir=self._opcodeDir)
+
+    def opcodeIndex(self) -> opcodecache.OpcodeIndex:
+        """
+        Returns an index of all defined opcodes, for lookup by name and signature
+
+        .. seealso:: :class:`~ctcsound7.opcodecache.OpcodeIndex`
+        """
+        return opcodecache.OpcodeIndex(self.getOpcodes())
 
     def setOutput(self, name: str, filetype='', format='') -> None:
         """
@@ -2344,7 +3017,9 @@ class CsoundPerformanceThread:
         self._csound = csound
         self.cpt = libcspt.csoundCreatePerformanceThread(csound.csound())
         self._processCallback: tuple[ct._FuncPointer, _t.Any] | None = None
-        self._processQueue: _queue.SimpleQueue | None = None
+        self._processQueue: TaskScheduler | None = None
+        self._commandRing: CommandRing | None = None
+        self._compileExecutor: _futures.ThreadPoolExecutor | None = None
         self._status = 'paused'
         if withProcessQueue:
             self.setProcessQueue()
@@ -2383,7 +3058,7 @@ class CsoundPerformanceThread:
         self._processCallback = (procfunc, data)
         libcspt.csoundPerformanceThreadSetProcessCB(self.cpt, procfunc, ct.byref(data))
 
-    def setProcessQueue(self) -> None:
+    def setProcessQueue(self, budget: int = 1000, maxHeavyDeferrals: int = 8) -> None:
         """
         Setup a queue to pprocess tasks within the performance loop
 
@@ -2391,22 +3066,125 @@ class CsoundPerformanceThread:
         (code compilation, table access, etc), since when a performance thread is
         active any access to the API can result in high latency
 
+        Args:
+            budget: the max. time (in microseconds) spent running tasks at each
+                performance cycle. Tasks which do not fit within the budget are
+                deferred to later cycles. See :meth:`setTaskBudget`
+            maxHeavyDeferrals: the max. number of consecutive cycles in which
+                heavy tasks can be deferred
+
+        Tasks are scheduled with one of two priorities (see :meth:`task`):
+        'control' tasks (setting channels, sending events, ...) are run
+        before 'heavy' tasks (code compilation, ...), so that a slow task does not
+        delay quick ones. Heavy tasks still make progress under a steady stream
+        of control tasks: once they have been deferred for *maxHeavyDeferrals*
+        cycles, one heavy task is run at the start of the next cycle.
+
         .. note:: this sets up the process callback.
         """
         if self._processQueue is not None:
+            self._processQueue.budget = budget
+            self._processQueue.maxHeavyDeferrals = maxHeavyDeferrals
             return
         elif self._processCallback is not None:
             raise RuntimeError(f"Process callback already set: {self._processCallback}")
-        self._processQueue = _queue.SimpleQueue()
+        self._processQueue = TaskScheduler(budget=budget, maxHeavyDeferrals=maxHeavyDeferrals)
         self._setProcessCallback(self._processQueueCallback)
 
+    def setTaskBudget(self, budget: int) -> None:
+        """
+        Set the max. time spent running tasks of the process queue at each cycle
+
+        Args:
+            budget: the time budget, in microseconds
+        """
+        if self._processQueue is None:
+            raise RuntimeError("The process queue is not active, start it via "
+                               "the setProcessQueue method")
+        self._processQueue.budget = budget
+
+    def schedulerStats(self) -> SchedulerStats:
+        """
+        Returns a snapshot of the counters of the process queue
+
+        Returns:
+            a :class:`~ctcsound7.scheduler.SchedulerStats`, with the current queue
+            depth, the number of tasks executed and deferred and the number of
+            cycles which overran the time budget
+        """
+        if self._processQueue is None:
+            raise RuntimeError("The process queue is not active, start it via "
+                               "the setProcessQueue method")
+        stats = _dataclasses.replace(self._processQueue.stats)
+        stats.queueDepth = len(self._processQueue)
+        return stats
+
+    def setCommandRing(self, capacity=1024, maxfields=16, channels: _t.Sequence[str] = ()
+                       ) -> CommandRing:
+        """
+        Setup a ring buffer to send events and channel values to the performance loop
+
+        Args:
+            capacity: the max. number of commands pending at any moment (rounded
+                up to a power of two). Commands pushed while the ring is full
+                are dropped (see :attr:`CommandRing.dropped`)
+            maxfields: the max. number of pfields of an event
+            channels: the names of the control channels which will be set via
+                the ring. Channels are resolved here, before the performance
+                starts: only these channels can be set via the ring
+
+        Returns:
+            the :class:`~ctcsound7.ringbuffer.CommandRing`
+
+        This is an alternative to :meth:`setProcessQueue`. Instead of a python
+        queue of tasks, commands are written to preallocated arrays and all
+        pending commands are consumed at each performance cycle, before
+        the next block is computed. Only one thread should push commands.
+
+        .. note:: this sets up the process callback, so it can't be used together
+            with :meth:`setProcessQueue` or :meth:`setProcessCallback`
+
+        .. code-block:: python
+
+            cs = Csound()
+            cs.compileOrc(...)
+            thread = cs.performanceThread()
+            ring = thread.setCommandRing(channels=['cutoff'])
+            thread.play()
+            ring.setChannel('cutoff', 2000)
+            ring.event('i', [1, 0, 2, 0.1])
+        """
+        if self._commandRing is not None:
+            missing = set(channels).difference(self._commandRing.channels())
+            if missing:
+                raise ValueError(f"The command ring is already set, channels {sorted(missing)} "
+                                 f"were not declared when it was created")
+            return self._commandRing
+        elif self._processCallback is not None:
+            raise RuntimeError(f"Process callback already set: {self._processCallback}")
+        channels = list(channels)
+        self._commandRing = CommandRing(capacity=capacity, maxfields=maxfields,
+                                        channels=channels,
+                                        channelIndex=self._csound._channelIndex(channels))
+        self._setProcessCallback(self._makeCommandRingCallback(self._commandRing))
+        return self._commandRing
+
+    def _makeCommandRingCallback(self, ring: CommandRing) -> _t.Callable[[ct.c_void_p], None]:
+        cs = self._csound.cs
+        event = libcsound.csoundEvent
+        typenums = _eventOrdToTypenum
+
+        def sendEvent(kind: int, pfields, numfields: int) -> None:
+            event(cs, typenums[kind], pfields, numfields, 0)
+
+        def callback(data) -> None:
+            ring.drain(sendEvent)
+
+        return callback
+
     def _processQueueCallback(self, data) -> None:
         assert self._processQueue is not None
-        N = self._processQueue.qsize()
-        if N > 0:
-            for _ in range(min(10, N)):
-                job = self._processQueue.get_nowait()
-                job(self._csound, self)
+        self._processQueue.run(self._csound, self)
 
     def compile(self, code: str) -> None:
         """
@@ -2420,12 +3198,54 @@ class CsoundPerformanceThread:
         To solve this, the performance thread provides a process callback, which
         is fired at each cycle. This method uses that callback to schedule
         a compilation action
+
+        .. seealso:: :meth:`compileAsync`, which compiles without blocking the performance
         """
         if self._processQueue is None:
             raise RuntimeError("This action needs the process queue, start it via "
                                "the setProcessQueue method")
         assert self._processQueue is not None
-        self._processQueue.put_nowait(lambda cs, pt: cs.compileOrc(code))
+        self._processQueue.put(lambda cs, pt: cs.compileOrc(code), priority='heavy')
+
+    def compileAsync(self, code: str) -> _futures.Future:
+        """
+        Compile orchestra code without blocking the performance
+
+        Args:
+            code: code to send to the running csound instance
+
+        Returns:
+            a :class:`concurrent.futures.Future`. Its result is CSOUND_SUCCESS once
+            the code has been compiled. If the compilation fails, the future
+            holds a RuntimeError
+
+        The code is parsed and compiled on a worker thread (one worker per
+        performance thread, so compilations are performed in order). The compiled
+        code is merged into the running engine by csound at the next cycle boundary,
+        so the performance never waits for the compilation, in contrast to
+        :meth:`compile`, which compiles within the process callback.
+
+        .. code-block:: python
+
+            thread = cs.performanceThread()
+            thread.play()
+            future = thread.compileAsync(r'''
+            instr 10
+              ...
+            endin
+            ''')
+            future.result()   # wait until compiled, raises if there were errors
+        """
+        if self._compileExecutor is None:
+            self._compileExecutor = _futures.ThreadPoolExecutor(max_workers=1,
+                                                                thread_name_prefix='csound-compile')
+        return self._compileExecutor.submit(self._compileOrcAsync, code)
+
+    def _compileOrcAsync(self, code: str) -> int:
+        ret = libcsound.csoundCompileOrc(self._csound.cs, cstring(code), 1)
+        if ret != CSOUND_SUCCESS:
+            raise RuntimeError(f"Could not compile code, error code: {ret}")
+        return ret
 
     def evalCode(self, code: str, callback: _t.Callable[[float], None]=None, timeout=5.) -> float:
         """
@@ -2458,19 +3278,23 @@ class CsoundPerformanceThread:
             q = _queue.SimpleQueue()
             def func(cs, pt, q=q):
                  q.put(cs.evalCode(code))
-            self.task(func)
+            self.task(func, priority='heavy')
             return q.get(timeout=timeout)
         else:
-            self.task(lambda cs, pt, func=callback: func(cs.evalCode(code)))
+            self.task(lambda cs, pt, func=callback: func(cs.evalCode(code)), priority='heavy')
             return 0.
 
-    def task(self, func: _t.Callable[[Csound, CsoundPerformanceThread, _t.Any], None], data=None) -> None:
+    def task(self, func: _t.Callable[[Csound, CsoundPerformanceThread], None], data=None, priority='control') -> None:
         """
         Add a task to the process queue, to be picked up by the process callback
 
         Args:
             func: a function of the form (csound: Csound, thread: CsoundPerformanceThread) -> None,
                 which can access the csound
+            priority: one of 'control' (for quick tasks) or 'heavy' (for tasks which
+                might take long, like compiling code). Control tasks are run before
+                heavy tasks, unless heavy tasks have been deferred for too long
+                (see :meth:`setProcessQueue`)
 
         .. note:: this sets the process callback for this thread. It will fail if the
             process callback has been set already.
@@ -2498,7 +3322,7 @@ class CsoundPerformanceThread:
             raise RuntimeError("This action needs the process queue, start it via "
                                "the setProcessQueue method")
         assert self._processQueue is not None
-        self._processQueue.put_nowait(func)
+        self._processQueue.put(func, priority=priority)
 
     def sync(self, timeout: float | None = None) -> None:
         """
@@ -2507,10 +3331,11 @@ class CsoundPerformanceThread:
         Args:
             timeout: if given, a max. amount of time to wait
         """
-        if self._processQueue is None or self._processQueue.qsize() == 0:
+        if self._processQueue is None or len(self._processQueue) == 0:
             return
         event = _threading.Event()
-        self.task(lambda cs, pt, e=event: e.set())
+        # heavy tasks run after any control task, so this runs after every pending task
+        self.task(lambda cs, pt, e=event: e.set(), priority='heavy')
         event.wait(timeout=timeout)
 
     def csound(self) -> ct.c_void_p:
@@ -2583,6 +3408,32 @@ class CsoundPerformanceThread:
         numFields = p.size
         libcspt.csoundPerformanceThreadScoreEvent(self.cpt, ct.c_int32(absp2mode), cchar(kind), numFields, ptr)
 
+    def scoreEvents(self, absp2mode: int, kind: str, pfields: np.ndarray) -> None:
+        """
+        Sends multiple score events in one call
+
+        Args:
+            absp2mode: if non-zero, the start time of the events is measured
+                from the beginning of performance, instead of relative to the current time
+            kind: the kind of event, one of 'i', 'f', 'e'
+            pfields: a 2D array of shape (numevents, numfields), each row holds
+                the pfields of one event, starting with p1. Events with less pfields
+                than *numfields* are padded at the end with NaN. Rows consisting only
+                of NaN are skipped
+
+        The rows are passed directly to csound, without any intermediate copy,
+        if *pfields* is a C-contiguous array of dtype MYFLT (float64).
+
+        .. seealso:: :meth:`Csound.events`
+        """
+        rows, counts, arr = _util.eventRows(pfields)
+        cpt = self.cpt
+        scoreEvent = libcspt.csoundPerformanceThreadScoreEvent
+        kindchar = cchar(kind)
+        for row, numfields in zip(rows, counts):
+            if numfields:
+                scoreEvent(cpt, absp2mode, kindchar, numfields, row)
+
     def inputMessage(self, s: str):
         """Sends a score event as a string, similarly to line events.
 
@@ -2607,6 +3458,9 @@ class CsoundPerformanceThread:
         Also releases any resources associated with the performance thread
         object.
         """
+        if self._compileExecutor is not None:
+            self._compileExecutor.shutdown(wait=False)
+            self._compileExecutor = None
         return libcspt.csoundPerformanceThreadJoin(self.cpt)
 
     def flushMessageQueue(self):
@@ -2628,6 +3482,294 @@ class CsoundPerformanceThread:
         self.scoreEvent(int(absolute), "e", [0, time])
 
 
+def _arrayDataView(adat: ARRAYDAT_p, ksmps: int) -> np.ndarray | None:
+    """
+    Returns a numpy array pointing to the data of the ARRAYDAT adat
+
+    Returns None if the array has no data. For audio arrays the last axis
+    holds the ksmps samples of each element
+    """
+    kind = pstring(libcsound.csoundArrayDataType(adat))
+    if kind == 'S':
+        raise ValueError("String arrays cannot be accessed as numpy arrays")
+    data = libcsound.csoundGetArrayData(adat)
+    if not data:
+        return None
+    dims = libcsound.csoundArrayDataDimensions(adat)
+    sizesptr = libcsound.csoundArrayDataSizes(adat)
+    shape = tuple(sizesptr[i] for i in range(dims))
+    if kind == 'a':
+        shape = shape + (ksmps,)
+    return _util.castarray(ct.c_void_p(data), shape=shape)
+
+
+class ArrayChannel:
+    """
+    A numpy view over an array channel
+
+    Args:
+        name: the name of the channel
+        adat: the ARRAYDAT_p of the channel
+        ksmps: the ksmps of the csound instance, used for audio arrays
+
+    .. note::
+
+        Do not create an ArrayChannel directly, use :meth:`Csound.openArrayChannel`
+
+    The array returned by :meth:`ArrayChannel.array` points directly to the
+    memory of the channel, with the dtype and shape of the csound array. For
+    'k' and 'i' arrays the shape is the shape of the csound array; for 'a' arrays
+    an extra last axis holds the ksmps samples of each element. String arrays
+    are not supported.
+
+    If the array is resized within csound its data might be reallocated; the
+    view is rebuilt whenever the data pointer or the shape changes. The channel
+    is invalidated when the csound instance is reset.
+
+    .. code-block:: python
+
+        cs = Csound()
+        cs.compileOrc(...)
+        spectrum = cs.openArrayChannel('spectrum', kind='k', size=1024)
+        while not cs.performKsmps():
+            spectrum.set(computeSpectrum())
+    """
+    __slots__ = ('name', 'kind', '_adat', '_ksmps', '_view', '__weakref__')
+
+    def __init__(self, name: str, adat: ARRAYDAT_p, ksmps: int):
+        self.name = name
+        """The name of the channel"""
+
+        self.kind = pstring(libcsound.csoundArrayDataType(adat))
+        """The kind of array, one of 'k', 'i', 'a'"""
+
+        if self.kind == 'S':
+            raise ValueError(f"String array channels are not supported (channel '{name}')")
+
+        self._adat = adat
+        self._ksmps = ksmps
+        self._view: np.ndarray | None = None
+
+    def __repr__(self) -> str:
+        return f"ArrayChannel(name={self.name!r}, kind={self.kind!r}, valid={self.valid})"
+
+    @property
+    def valid(self) -> bool:
+        """True if this channel can still be used"""
+        return self._adat is not None
+
+    def invalidate(self) -> None:
+        """
+        Invalidate this channel. Any access after this raises RuntimeError
+        """
+        self._adat = None
+        self._view = None
+
+    def array(self) -> np.ndarray:
+        """
+        A numpy array pointing to the memory of the channel
+
+        The returned array is only valid as long as the array is not resized
+        within csound
+        """
+        adat = self._adat
+        if adat is None:
+            raise RuntimeError(f"The array channel '{self.name}' is not valid anymore")
+        view = self._view
+        data = libcsound.csoundGetArrayData(adat)
+        if view is None or view.ctypes.data != data or view.size != self._size():
+            view = self._view = _arrayDataView(adat, self._ksmps)
+            if view is None:
+                raise RuntimeError(f"The array channel '{self.name}' has no data")
+        return view
+
+    def _size(self) -> int:
+        adat = self._adat
+        dims = libcsound.csoundArrayDataDimensions(adat)
+        sizes = libcsound.csoundArrayDataSizes(adat)
+        size = 1
+        for i in range(dims):
+            size *= sizes[i]
+        return size * self._ksmps if self.kind == 'a' else size
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        """The shape of the array"""
+        return self.array().shape
+
+    def get(self) -> np.ndarray:
+        """
+        Returns a copy of the data of the channel
+        """
+        return self.array().copy()
+
+    def set(self, data: np.ndarray) -> None:
+        """
+        Copies *data* into the channel
+
+        Args:
+            data: an array with the same number of elements as the channel.
+                It is converted to a contiguous array of MYFLT if needed and
+                copied in a single operation
+        """
+        view = self.array()
+        src = np.ascontiguousarray(data, dtype=MYFLT)
+        if src.size != view.size:
+            raise ValueError(f"Size mismatch, the channel '{self.name}' has shape {view.shape} "
+                             f"({view.size} elements), got data with shape {src.shape}")
+        ct.memmove(view.ctypes.data, src.ctypes.data, src.nbytes)
+
+    @property
+    def value(self) -> np.ndarray:
+        """The array data. Setting it copies the given data into the channel"""
+        return self.array()
+
+    @value.setter
+    def value(self, data: np.ndarray) -> None:
+        self.set(data)
+
+
+class PvsChannel:
+    """
+    A numpy view over a pvs (fsig) channel
+
+    Args:
+        name: the name of the channel
+        pvsdat: the PVSDAT_p of the channel
+
+    .. note::
+
+        Do not create a PvsChannel directly, use :meth:`Csound.openPvsChannel`
+
+    The current frame is exposed as a float32 array of shape ``(fftsize//2+1, 2)``,
+    where each row holds the (amp, freq) pair of one bin (for the default
+    format). The array points directly to the memory of the channel.
+    The framecount of the channel is tracked, so that :meth:`PvsChannel.poll`
+    only returns a frame when a new one has been produced.
+
+    .. code-block:: python
+
+        cs = Csound()
+        cs.compileOrc(r'''
+        instr 1
+          fsig pvsanal ain, 1024, 256, 1024, 1
+          pvsout fsig, "spectrum"
+        endin
+        ''')
+        chan = cs.openPvsChannel('spectrum', fftsize=1024, overlap=256)
+        while not cs.performKsmps():
+            if (frame := chan.poll()) is not None:
+                amps = frame[:, 0]
+    """
+    __slots__ = ('name', 'fftsize', 'overlap', 'winsize', 'format', '_pvsdat',
+                 '_view', '_lastFramecount', '__weakref__')
+
+    def __init__(self, name: str, pvsdat: PVSDAT_p):
+        self.name = name
+        """The name of the channel"""
+
+        self.fftsize: int = libcsound.csoundPvsDataFFTSize(pvsdat)
+        """The fft size"""
+
+        self.overlap: int = libcsound.csoundPvsDataOverlap(pvsdat)
+        """The overlap size, in samples"""
+
+        self.winsize: int = libcsound.csoundPvsDataWindowSize(pvsdat)
+        """The window size, in samples"""
+
+        self.format: int = libcsound.csoundPvsDataFormat(pvsdat)
+        """The data format, one of PVS_AMP_FREQ, PVS_AMP_PHASE, PVS_COMPLEX, PVS_TRACKS"""
+
+        self._pvsdat = pvsdat
+        self._view: np.ndarray | None = None
+        self._lastFramecount = -1
+
+    def __repr__(self) -> str:
+        return f"PvsChannel(name={self.name!r}, fftsize={self.fftsize}, overlap={self.overlap})"
+
+    @property
+    def valid(self) -> bool:
+        """True if this channel can still be used"""
+        return self._pvsdat is not None
+
+    def invalidate(self) -> None:
+        """
+        Invalidate this channel. Any access after this raises RuntimeError
+        """
+        self._pvsdat = None
+        self._view = None
+
+    def array(self) -> np.ndarray:
+        """
+        The current frame, as a view over the memory of the channel
+
+        Returns:
+            a float32 array of shape (fftsize//2+1, 2)
+        """
+        pvsdat = self._pvsdat
+        if pvsdat is None:
+            raise RuntimeError(f"The pvs channel '{self.name}' is not valid anymore")
+        ptr = libcsound.csoundGetPvsData(pvsdat)
+        if not ptr:
+            raise RuntimeError(f"The pvs channel '{self.name}' has no data")
+        view = self._view
+        if view is None or view.ctypes.data != ct.addressof(ptr.contents):
+            view = self._view = np.ctypeslib.as_array(ptr, shape=(self.fftsize // 2 + 1, 2))
+        return view
+
+    @property
+    def framecount(self) -> int:
+        """The current framecount of the channel"""
+        if self._pvsdat is None:
+            raise RuntimeError(f"The pvs channel '{self.name}' is not valid anymore")
+        return libcsound.csoundPvsDataFramecount(self._pvsdat)
+
+    def poll(self) -> np.ndarray | None:
+        """
+        Returns the current frame if it is new, None otherwise
+
+        A frame is new if the framecount of the channel has changed since the
+        last call to this method. The returned array is a view over the
+        memory of the channel, copy it if it needs to outlive the next frame
+        """
+        framecount = self.framecount
+        if framecount == self._lastFramecount:
+            return None
+        self._lastFramecount = framecount
+        return self.array()
+
+    def read(self, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Copies the current frame
+
+        Args:
+            out: if given, the frame is copied into this array, which must have
+                the shape (fftsize//2+1, 2)
+
+        Returns:
+            the copied frame (*out*, if given)
+        """
+        view = self.array()
+        if out is None:
+            return view.copy()
+        np.copyto(out, view)
+        return out
+
+    def write(self, frame: np.ndarray) -> None:
+        """
+        Writes a whole frame to the channel
+
+        Args:
+            frame: an array of shape (fftsize//2+1, 2) (or with the same number
+                of elements). It is converted to a contiguous float32 array if needed
+        """
+        view = self.array()
+        src = np.ascontiguousarray(frame, dtype=np.float32)
+        if src.size != view.size:
+            raise ValueError(f"Expected a frame of shape {view.shape}, got {src.shape}")
+        libcsound.csoundSetPvsData(self._pvsdat, src.ctypes.data_as(ct.POINTER(ct.c_float)))
+
+
 def getSystemSr(module: str = '') -> tuple[float, str]:
     """
     Get the system samplerate reported by csound
@@ -2662,8 +3804,8 @@ def getSystemSr(module: str = '') -> tuple[float, str]:
     return sr, module
 
 
-def _getOpcodes() -> list[OpcodeDef]:
-    cs = Csound()
+def _getOpcodes(opcodeDir='') -> list[OpcodeDef]:
+    cs = Csound(opcodeDir=opcodeDir)
     cs.createMessageBuffer(echo=False)
     cs.setOption('-z1')
     msgcnt = cs.messageCnt()
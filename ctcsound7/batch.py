@@ -0,0 +1,212 @@
+"""
+Render many csound jobs offline, in parallel, using a pool of processes
+
+Each worker process holds one :class:`~ctcsound7.Csound` instance, which is
+reset between jobs. The rendered samples are written by the worker into
+a shared memory block, which the parent process maps as a numpy array
+without copying.
+
+.. code-block:: python
+
+    from ctcsound7 import batch
+
+    jobs = [batch.RenderJob(csd=open(path).read()) for path in paths]
+    results = batch.renderMany(jobs, workers=4)
+    for result in results:
+        print(result.job.name, result.samples.shape, result.renderTime)
+        ...
+        result.release()
+"""
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+import numpy as np
+import typing as _t
+
+from .common import MYFLT
+
+if _t.TYPE_CHECKING:
+    from . import Csound
+
+
+@dataclass
+class RenderJob:
+    """
+    A job to be rendered offline
+
+    Either *csd* or *orc* must be given
+    """
+    csd: str = ''
+    """The text of a csd file"""
+
+    orc: str = ''
+    """Orchestra code, used if no csd is given"""
+
+    sco: str = ''
+    """Score code, sent after compiling *orc*"""
+
+    options: list[str] = field(default_factory=list)
+    """Command-line options, set before compiling"""
+
+    dur: float = 0.
+    """The duration to render, in seconds. 0 renders until the end of the score"""
+
+    name: str = ''
+    """A name to identify this job"""
+
+
+@dataclass
+class RenderResult:
+    """
+    The result of rendering a :class:`RenderJob`
+
+    The samples are a view over a shared memory block. Call
+    :meth:`RenderResult.release` when done with them, or copy them
+    if they need to outlive this result
+    """
+    job: RenderJob
+    """The rendered job"""
+
+    samples: np.ndarray | None = None
+    """The rendered samples, an array of shape (numframes, nchnls). None if the job failed"""
+
+    sr: float = 0.
+    """The samplerate of the rendered samples"""
+
+    error: str = ''
+    """An error message if the job failed"""
+
+    compileTime: float = 0.
+    """Time spent resetting csound and compiling the job, in seconds"""
+
+    renderTime: float = 0.
+    """Time spent rendering, in seconds"""
+
+    totalTime: float = 0.
+    """Time from submitting the job until the result was received, in seconds"""
+
+    pid: int = 0
+    """The pid of the worker process which rendered this job"""
+
+    _shm: shared_memory.SharedMemory | None = None
+
+    def release(self) -> None:
+        """
+        Release the shared memory holding the samples
+
+        The samples are not accessible after this
+        """
+        if self._shm is not None:
+            self.samples = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+def compileJob(cs: Csound, job: RenderJob) -> None:
+    """
+    Configure and compile a job in a fresh (or reset) csound instance
+
+    Args:
+        cs: the csound instance, not started
+        job: the job to compile
+    """
+    for option in job.options:
+        cs.setOption(option)
+    if job.csd:
+        err = cs.compileCsdText(job.csd)
+    elif job.orc:
+        err = cs.compileOrc(job.orc)
+    else:
+        raise ValueError(f"The job '{job.name}' has no code to render")
+    if err:
+        raise RuntimeError(f"Could not compile job '{job.name}', error code: {err}")
+    if job.sco:
+        cs.inputMessage(job.sco)
+
+
+_workerCsound: Csound | None = None
+_workerUsed = False
+
+
+def _initWorker() -> None:
+    global _workerCsound
+    from . import Csound
+    _workerCsound = Csound()
+
+
+def _renderJob(job: RenderJob) -> tuple[str, tuple[int, ...], float, float, float, int]:
+    global _workerUsed
+    cs = _workerCsound
+    assert cs is not None
+    t0 = time.perf_counter()
+    if _workerUsed:
+        cs.reset()
+    _workerUsed = True
+    compileJob(cs, job)
+    t1 = time.perf_counter()
+    samples = cs.render(dur=job.dur)
+    t2 = time.perf_counter()
+    shm = shared_memory.SharedMemory(create=True, size=max(samples.nbytes, 1))
+    np.ndarray(samples.shape, dtype=MYFLT, buffer=shm.buf)[...] = samples
+    name = shm.name
+    shm.close()
+    _untrack(shm)
+    return name, samples.shape, cs.sr(), t1 - t0, t2 - t1, os.getpid()
+
+
+def _untrack(shm: shared_memory.SharedMemory) -> None:
+    # The ownership of the block is passed to the parent process, which unlinks it
+    # on release. Without this the resource tracker might unlink it when the
+    # worker exits
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')   # type: ignore
+    except Exception:
+        pass
+
+
+def renderMany(jobs: _t.Sequence[RenderJob | str],
+               workers: int | None = None
+               ) -> list[RenderResult]:
+    """
+    Render many jobs in parallel, each worker process using its own csound instance
+
+    Args:
+        jobs: the jobs to render. A job can also be given as the text of a csd file
+        workers: the number of worker processes. If not given, the number of cpus is used
+
+    Returns:
+        a list of :class:`RenderResult`, in the order of *jobs*. A failed job
+        has its ``error`` attribute set and ``samples`` set to None
+
+    Each job is rendered offline via :meth:`~ctcsound7.Csound.render`. The samples
+    are transferred via shared memory, the parent receives zero-copy views.
+    Call :meth:`RenderResult.release` on each result when done.
+
+    .. note:: on platforms where processes are spawned (windows, macos) this
+        must be called from within an ``if __name__ == '__main__':`` block
+    """
+    renderjobs = [job if isinstance(job, RenderJob) else RenderJob(csd=job) for job in jobs]
+    results: list[RenderResult] = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initWorker) as executor:
+        t0 = time.perf_counter()
+        futures = [executor.submit(_renderJob, job) for job in renderjobs]
+        for job, future in zip(renderjobs, futures):
+            try:
+                name, shape, sr, compileTime, renderTime, pid = future.result()
+            except Exception as e:
+                results.append(RenderResult(job=job, error=str(e) or type(e).__name__,
+                                            totalTime=time.perf_counter() - t0))
+                continue
+            shm = shared_memory.SharedMemory(name=name)
+            samples = np.ndarray(shape, dtype=MYFLT, buffer=shm.buf)
+            results.append(RenderResult(job=job, samples=samples, sr=sr,
+                                        compileTime=compileTime, renderTime=renderTime,
+                                        totalTime=time.perf_counter() - t0, pid=pid,
+                                        _shm=shm))
+    return results
@@ -0,0 +1,426 @@
+"""
+Handles to csound resources which are resolved once and reused
+
+A handle caches the pointer to a csound resource (a channel, a table, ...)
+so that repeated access does not need to encode the name and look it up
+within csound each time. Handles are created via methods of the
+:class:`~ctcsound7.Csound` class (for example :meth:`~ctcsound7.Csound.channel`)
+and are invalidated when the csound instance is reset, since any pointer
+obtained before a reset is not valid anymore.
+"""
+from __future__ import annotations
+
+import weakref
+import ctypes as ct
+from collections import OrderedDict
+import numpy as np
+import typing as _t
+
+from .common import MYFLT
+from . import _util
+
+
+class HandleCache:
+    """
+    A LRU cache of handles which can invalidate every handle it ever issued
+
+    Args:
+        maxsize: the max. number of handles kept in the cache. When the
+            cache is full, the least recently used handle is evicted. An
+            evicted handle remains usable, it is only removed from the cache
+
+    Handles evicted from the cache are still tracked (via a weak reference) so
+    that :meth:`HandleCache.clear` can invalidate them.
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._cache: OrderedDict[_t.Hashable, _t.Any] = OrderedDict()
+        self._issued: weakref.WeakSet = weakref.WeakSet()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, key: _t.Hashable):
+        """
+        Get a handle from the cache, or None if not found
+        """
+        handle = self._cache.get(key)
+        if handle is not None:
+            self._cache.move_to_end(key)
+        return handle
+
+    def put(self, key: _t.Hashable, handle) -> None:
+        """
+        Add a handle to the cache, evicting the least recently used if needed
+        """
+        self._cache[key] = handle
+        self._cache.move_to_end(key)
+        self._issued.add(handle)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def pop(self, key: _t.Hashable):
+        """
+        Remove a handle from the cache and return it (None if not found)
+
+        The removed handle is **not** invalidated
+        """
+        return self._cache.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Invalidate all issued handles and empty the cache
+        """
+        for handle in list(self._issued):
+            handle.invalidate()
+        self._issued.clear()
+        self._cache.clear()
+
+
+class ChannelHandle:
+    """
+    A handle to a control or audio channel
+
+    Args:
+        name: the name of the channel
+        kind: one of 'control', 'audio'
+        array: a numpy array pointing to the channel memory, as returned
+            by :meth:`~ctcsound7.Csound.channelPtr`
+        lock: a function to lock the channel, or None if locking is not supported
+        unlock: a function to unlock the channel
+        locking: if True, access to the channel is protected by the channel lock
+
+    .. note::
+
+        Do not create a ChannelHandle directly, use :meth:`~ctcsound7.Csound.channel`
+
+    A ChannelHandle gives direct access to the memory of the channel, without
+    any name lookup. For a control channel ``.value`` is a float, for an audio
+    channel it is a numpy array of size ksmps (a view into the channel memory).
+    A handle is invalidated when the csound instance which created it is reset,
+    after which any access raises RuntimeError
+
+    .. code-block:: python
+
+        cs = Csound()
+        ...
+        freq = cs.channel('freq')
+        for i in range(1000):
+            freq.value = 440 + i
+            cs.performKsmps()
+    """
+    __slots__ = ('name', 'kind', 'locking', '_array', '_lock', '_unlock', '__weakref__')
+
+    def __init__(self,
+                 name: str,
+                 kind: str,
+                 array: np.ndarray,
+                 lock: _t.Callable[[], None] | None = None,
+                 unlock: _t.Callable[[], None] | None = None,
+                 locking=False):
+        if kind not in ('control', 'audio'):
+            raise ValueError(f"kind should be one of 'control', 'audio', got {kind}")
+        if locking and (lock is None or unlock is None):
+            raise ValueError("Locking was requested but no lock functions were given")
+        self.name = name
+        """The name of the channel"""
+
+        self.kind = kind
+        """The kind of channel, one of 'control', 'audio'"""
+
+        self.locking = locking
+        """If True, access to the channel data is protected by the channel lock"""
+
+        self._array: np.ndarray | None = array
+        self._lock = lock
+        self._unlock = unlock
+
+    def __repr__(self) -> str:
+        return f"ChannelHandle(name={self.name!r}, kind={self.kind!r}, valid={self.valid})"
+
+    @property
+    def valid(self) -> bool:
+        """True if this handle can still be used"""
+        return self._array is not None
+
+    def invalidate(self) -> None:
+        """
+        Invalidate this handle
+
+        This is called by csound when the underlying pointer is not valid anymore.
+        Any access after this raises RuntimeError
+        """
+        self._array = None
+
+    def array(self) -> np.ndarray:
+        """
+        The numpy array pointing to the channel memory
+
+        Access via this array is never locked
+        """
+        if self._array is None:
+            raise RuntimeError(f"The handle for channel '{self.name}' is not valid anymore")
+        return self._array
+
+    def get(self) -> float | np.ndarray:
+        """
+        Get the value of the channel
+
+        Returns:
+            for a control channel, the value as float. For an audio channel,
+            a copy of the channel data
+        """
+        arr = self._array
+        if arr is None:
+            raise RuntimeError(f"The handle for channel '{self.name}' is not valid anymore")
+        if self.locking:
+            self._lock()
+            try:
+                return float(arr[0]) if self.kind == 'control' else arr.copy()
+            finally:
+                self._unlock()
+        return float(arr[0]) if self.kind == 'control' else arr.copy()
+
+    def set(self, value: float | np.ndarray) -> None:
+        """
+        Set the value of the channel
+
+        Args:
+            value: the new value. For an audio channel, an array of size ksmps
+                or a scalar to fill the channel with
+        """
+        arr = self._array
+        if arr is None:
+            raise RuntimeError(f"The handle for channel '{self.name}' is not valid anymore")
+        if self.locking:
+            self._lock()
+            try:
+                arr[:] = value
+            finally:
+                self._unlock()
+        else:
+            arr[:] = value
+
+    @property
+    def value(self) -> float | np.ndarray:
+        """The value of the channel. See :meth:`ChannelHandle.get`"""
+        return self.get()
+
+    @value.setter
+    def value(self, value: float | np.ndarray) -> None:
+        self.set(value)
+
+
+class TableHandle:
+    """
+    A handle to a function table
+
+    Args:
+        tabnum: the table number
+        resolve: a function returning the table pointer and its size, as
+            returned by ``csoundGetTable``. The size is negative if the table
+            does not exist
+        resolveArgs: a function returning the GEN arguments of the table, as an array
+        defer: a function which schedules a function to be run by the performance
+            thread at the start of a cycle and returns True, or returns False if
+            this is not possible
+
+    .. note::
+
+        Do not create a TableHandle directly, use :meth:`~ctcsound7.Csound.tableHandle`
+
+    A handle keeps the numpy view of the table data, so it is not rebuilt at
+    each access. A table can be redefined (by ``ftgen`` or an ``f`` statement
+    with the same number), which can move its data or change its size: each
+    operation (and :meth:`~ctcsound7.Csound.tableHandle`) checks the pointer and
+    size of the table, a single call into csound, and rebuilds the view only
+    if these changed. A handle is invalidated when the csound instance which
+    created it is reset, after which any access raises RuntimeError
+
+    .. code-block:: python
+
+        wave = cs.tableHandle(1)
+        wave[:] = np.sin(np.linspace(0, 2*np.pi, len(wave), endpoint=False))
+        wave.copyIn(partials, start=0)
+        data = wave.copyOut()
+    """
+    __slots__ = ('tabnum', '_resolve', '_resolveArgs', '_defer', '_array', '_address',
+                 '_args', '_valid', '__weakref__')
+
+    def __init__(self,
+                 tabnum: int,
+                 resolve: _t.Callable[[], tuple[ct._Pointer, int]],
+                 resolveArgs: _t.Callable[[], np.ndarray | None],
+                 defer: _t.Callable[[_t.Callable[[], None]], bool]):
+        self.tabnum = tabnum
+        """The table number"""
+
+        self._resolve = resolve
+        self._resolveArgs = resolveArgs
+        self._defer = defer
+        self._array: np.ndarray | None = None
+        self._address = 0
+        self._args: np.ndarray | None = None
+        self._valid = True
+        self.refresh()
+
+    def __repr__(self) -> str:
+        size = len(self._array) if self._array is not None else -1
+        return f"TableHandle(tabnum={self.tabnum}, size={size}, valid={self.valid})"
+
+    @property
+    def valid(self) -> bool:
+        """True if this handle can still be used"""
+        return self._valid
+
+    def invalidate(self) -> None:
+        """
+        Invalidate this handle
+
+        This is called by csound when the underlying pointer is not valid anymore.
+        Any access after this raises RuntimeError
+        """
+        self._valid = False
+        self._array = None
+        self._args = None
+
+    def refresh(self) -> bool:
+        """
+        Check that the table still exists and update the view if it was redefined
+
+        Returns:
+            True if the view was rebuilt, False if it was still up to date
+        """
+        if not self._valid:
+            raise RuntimeError(f"The handle for table {self.tabnum} is not valid anymore")
+        ptr, size = self._resolve()
+        if size < 0:
+            self._array = None
+            raise RuntimeError(f"Table {self.tabnum} does not exist")
+        address = ct.cast(ptr, ct.c_void_p).value or 0
+        arr = self._array
+        if arr is not None and address == self._address and len(arr) == size:
+            return False
+        self._array = _util.castarray(ptr, shape=(size,))
+        self._address = address
+        self._args = None
+        return True
+
+    def array(self, refresh=True) -> np.ndarray:
+        """
+        The numpy array pointing to the table data (without the guard point)
+
+        Args:
+            refresh: if True, check first whether the table was redefined.
+                Set it to False when the table is known not to change
+        """
+        if refresh or self._array is None:
+            self.refresh()
+        assert self._array is not None
+        return self._array
+
+    def __len__(self) -> int:
+        return len(self.array())
+
+    @property
+    def size(self) -> int:
+        """The size of the table, without the guard point"""
+        return len(self.array())
+
+    @property
+    def args(self) -> np.ndarray:
+        """
+        The arguments used to generate the table, starting with the GEN number
+        """
+        self.refresh()
+        if self._args is None:
+            args = self._resolveArgs()
+            self._args = args if args is not None else np.zeros(0, dtype=MYFLT)
+        return self._args
+
+    @property
+    def gen(self) -> int:
+        """The GEN routine used to generate the table (0 if unknown)"""
+        args = self.args
+        return int(args[0]) if len(args) else 0
+
+    def __getitem__(self, index) -> float | np.ndarray:
+        out = self.array()[index]
+        return float(out) if np.isscalar(out) else out
+
+    def __setitem__(self, index, value) -> None:
+        self.array()[index] = value
+
+    def copyOut(self, dest: np.ndarray | None = None, start=0, end: int | None = None) -> np.ndarray:
+        """
+        Copy the table data (or a slice of it) out of the table
+
+        Args:
+            dest: if given, the array to copy the data into. It must have the
+                size of the slice. Otherwise a new array is created
+            start: the first index to copy
+            end: the end index (not included). None copies until the end of the table
+
+        Returns:
+            the array with the copied data (*dest*, if given)
+        """
+        data = self.array()[start:end]
+        if dest is None:
+            return data.copy()
+        np.copyto(dest, data)
+        return dest
+
+    def copyIn(self, src: np.ndarray | _t.Sequence[float], start=0) -> None:
+        """
+        Copy data into the table
+
+        Args:
+            src: the data to copy
+            start: the index of the table where to start copying
+        """
+        arr = self.array()
+        n = len(src)
+        if start < 0 or start + n > len(arr):
+            raise IndexError(f"Cannot copy {n} values at index {start}, table {self.tabnum} "
+                             f"has size {len(arr)}")
+        arr[start:start+n] = src
+
+    def copyInAsync(self, src: np.ndarray | _t.Sequence[float], start=0) -> bool:
+        """
+        Copy data into the table at the start of the next performance cycle
+
+        Args:
+            src: the data to copy. It is copied first, so it can be modified
+                right after this call
+            start: the index of the table where to start copying
+
+        Returns:
+            True if the copy was scheduled, False if it was done immediately
+
+        The copy is scheduled via the process queue of the performance thread
+        (see :meth:`~ctcsound7.CsoundPerformanceThread.setProcessQueue`), so it
+        never happens while csound is in the middle of a cycle. If the csound
+        instance has no performance thread with a process queue, the copy is
+        done immediately
+        """
+        data = np.array(src, dtype=MYFLT)
+        return self.schedule(lambda: self.copyIn(data, start=start))
+
+    def schedule(self, func: _t.Callable[[], None]) -> bool:
+        """
+        Run *func* at the start of the next performance cycle, if possible
+
+        Args:
+            func: a function without arguments, which can access this handle
+
+        Returns:
+            True if *func* was scheduled, False if it was run immediately
+
+        *func* is run via the process queue of the performance thread (see
+        :meth:`~ctcsound7.CsoundPerformanceThread.setProcessQueue`). If there
+        is no performance thread with a process queue, it is run immediately
+        """
+        if self._defer(func):
+            return True
+        func()
+        return False
@@ -0,0 +1,333 @@
+"""
+Incremental parsing of csound's output into structured records
+
+A :class:`LogParser` is fed messages as they arrive (from the message buffer,
+a :class:`~ctcsound7.messages.MessagePump` or a
+:class:`~ctcsound7.messages.MessageDispatcher`), classifies each line by
+its attribute and by known patterns and keeps running counters. Each line
+is examined once, with a fixed number of anchored patterns, so the work per
+line is constant and the log never needs to be scanned again.
+
+.. code-block:: python
+
+    from ctcsound7.logparser import LogParser
+
+    cs = ctcsound7.Csound()
+    cs.createMessageBuffer()
+    parser = LogParser()
+    cs.compileOrc(orc)
+    for record in parser.poll(cs):
+        if record.kind == 'compile-error':
+            print(f"Error at line {record.line}: {record.message}")
+    ...
+    print(parser.counters.samplesOutOfRange, parser.counters.maxAmps)
+"""
+from __future__ import annotations
+
+import re
+from collections import deque
+from dataclasses import dataclass, field
+import typing as _t
+
+from .messages import MESSAGE_TYPES, MESSAGE_TYPE_MASK
+
+if _t.TYPE_CHECKING:
+    from . import Csound
+
+
+RECORD_KINDS = ('compile-error', 'compile-failed', 'init-error', 'perf-error', 'error',
+                'warning', 'section-amps', 'out-of-range', 'overall-amps',
+                'overall-out-of-range', 'perf-stats')
+"""The kinds of records produced by a :class:`LogParser`"""
+
+
+@dataclass
+class LogRecord:
+    """
+    A classified line of csound's output
+    """
+    kind: str
+    """The kind of record, one of :data:`RECORD_KINDS`"""
+
+    message: str
+    """The text of the line (for errors and warnings, without the prefix)"""
+
+    attr: int = 0
+    """The attribute of the message"""
+
+    line: int | None = None
+    """For errors, the line within the orchestra, if known"""
+
+    instr: str = ''
+    """For init/perf errors, the instrument where the error happened"""
+
+    opcode: str = ''
+    """For init/perf errors, the opcode which caused the error, if known"""
+
+    values: list[float] = field(default_factory=list)
+    """For amplitude and range records, one value per channel. For perf-stats, the number of errors"""
+
+
+@dataclass
+class LogCounters:
+    """
+    Running counters of a :class:`LogParser`
+    """
+    lines: int = 0
+    """The number of lines parsed"""
+
+    compileErrors: int = 0
+    """The number of compile errors"""
+
+    initErrors: int = 0
+    """The number of init errors"""
+
+    perfErrors: int = 0
+    """The number of performance errors"""
+
+    errors: int = 0
+    """The number of other messages with the error attribute"""
+
+    warnings: int = 0
+    """The number of warnings"""
+
+    samplesOutOfRange: int = 0
+    """The number of samples out of range, summed over sections and channels"""
+
+    maxAmps: list[float] = field(default_factory=list)
+    """The max. amplitude per channel, over all sections reported so far"""
+
+    overallAmps: list[float] = field(default_factory=list)
+    """The overall amplitudes per channel, reported at the end of the performance"""
+
+    errorsInPerformance: int | None = None
+    """The number of errors reported at the end of the performance, None if not reported yet"""
+
+
+_number = re.compile(r'[-+]?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?')
+
+_initErrorRe = re.compile(r'\s*INIT ERROR(?: in instr (\S+))?(?: \(opcode ([^)]*)\))?(?: line (\d+))?\s*:?\s*(.*)')
+_perfErrorRe = re.compile(r'\s*PERF ERROR(?: in instr (\S+))?(?: \(opcode ([^)]*)\))?(?: line (\d+))?\s*:?\s*(.*)')
+_compileErrorRe = re.compile(r'\s*error:\s*(.*)', re.IGNORECASE)
+_lineRe = re.compile(r'\bline:?\s*(\d+)', re.IGNORECASE)
+_lineInfoRe = re.compile(r'\s*Line:\s*(\d+)')
+_parseFailedRe = re.compile(r'\s*Parsing failed due to (\d+) (?:syntax|semantic) errors?')
+_warningRe = re.compile(r'\s*WARNING:?\s*(.*)')
+# Preceded by 'end of score.', 'end of performance', ... Searched only if the line contains it
+_overallAmpsRe = re.compile(r'overall amps:\s*(.*)')
+_overallRangeRe = re.compile(r'\s*overall samples out of range:\s*(.*)')
+_rangeRe = re.compile(r'\s*number of samples out of range:\s*(.*)')
+# 'B  0.000 ..  1.000 T  1.000 TT  1.000 M: ...' at the end of a score event, or
+# 'rtevent:  T  0.500 TT  0.500 M: ...' for realtime events
+_sectionAmpsRe = re.compile(r'\s*(?:B\s*[-\d.]+\s*\.\.\s*[-\d.]+|rtevent:)\s+T\s*[\d.]+\s+TT\s*[\d.]+\s+M:\s*(.*)')
+_perfStatsRe = re.compile(r'\s*(\d+) errors? in performance')
+
+_errorType = MESSAGE_TYPES['error']
+_warningType = MESSAGE_TYPES['warning']
+
+
+def _values(text: str) -> list[float]:
+    return [float(x) for x in _number.findall(text)]
+
+
+class LogParser:
+    """
+    Parses csound's output incrementally into :class:`LogRecord`
+
+    Args:
+        keep: the max. number of records kept in :attr:`LogParser.records`
+        onRecord: if given, a function ``(record: LogRecord) -> None`` called
+            for each record as it is parsed
+
+    Messages do not necessarily correspond to lines: csound often prints a
+    line in several messages. The parser buffers partial lines and parses a
+    line once it is complete. The attribute of a line is the attribute of
+    its first message.
+
+    A parser can be used as a handler of a :class:`~ctcsound7.messages.MessageDispatcher`,
+    since :meth:`LogParser.feedMessages` accepts a batch of (message, attribute)
+
+    .. code-block:: python
+
+        dispatcher = cs.messageDispatcher()
+        parser = LogParser()
+        dispatcher.addHandler(parser.feedMessages)
+    """
+    def __init__(self,
+                 keep=1000,
+                 onRecord: _t.Callable[[LogRecord], None] | None = None):
+        self.records: deque[LogRecord] = deque(maxlen=keep)
+        """The most recent records"""
+
+        self.counters = LogCounters()
+        """Running counters"""
+
+        self.onRecord = onRecord
+        self._partial: list[str] = []
+        self._partialAttr = 0
+        self._lastCompileError: LogRecord | None = None
+        self._lookahead = 0
+
+    def __repr__(self) -> str:
+        return f"LogParser(lines={self.counters.lines}, records={len(self.records)})"
+
+    def feed(self, message: str, attr: int = 0) -> list[LogRecord]:
+        """
+        Parse a message
+
+        Args:
+            message: the message, which may contain any number of lines, or part of a line
+            attr: the attribute of the message
+
+        Returns:
+            the records parsed from the lines completed by this message
+        """
+        if '\n' not in message:
+            if not self._partial:
+                self._partialAttr = attr
+            self._partial.append(message)
+            return []
+        records: list[LogRecord] = []
+        lines = message.split('\n')
+        if self._partial:
+            self._partial.append(lines[0])
+            lines[0] = ''.join(self._partial)
+            firstAttr = self._partialAttr
+            self._partial.clear()
+        else:
+            firstAttr = attr
+        last = lines.pop()
+        if last:
+            self._partial.append(last)
+            self._partialAttr = attr
+        for i, line in enumerate(lines):
+            record = self._parseLine(line, firstAttr if i == 0 else attr)
+            if record is not None:
+                records.append(record)
+        return records
+
+    def feedMessages(self, messages: _t.Iterable[tuple[str, int]]) -> list[LogRecord]:
+        """
+        Parse a sequence of messages
+
+        Args:
+            messages: a sequence of tuples (message: str, attribute: int), as returned
+                by :meth:`~ctcsound7.Csound.iterMessages` or :meth:`~ctcsound7.Csound.drainMessages`
+
+        Returns:
+            the records parsed
+        """
+        records: list[LogRecord] = []
+        for message, attr in messages:
+            if message:
+                records.extend(self.feed(message, attr))
+        return records
+
+    def poll(self, csound: Csound) -> list[LogRecord]:
+        """
+        Drain the message buffer of *csound* and parse the messages
+
+        The message buffer must have been created via :meth:`~ctcsound7.Csound.createMessageBuffer`
+
+        Returns:
+            the records parsed
+        """
+        return self.feedMessages(csound.drainMessages())
+
+    def flush(self) -> list[LogRecord]:
+        """
+        Parse any buffered partial line
+
+        Returns:
+            the records parsed (at most one)
+        """
+        if not self._partial:
+            return []
+        line = ''.join(self._partial)
+        self._partial.clear()
+        record = self._parseLine(line, self._partialAttr)
+        return [record] if record is not None else []
+
+    def _emit(self, record: LogRecord) -> LogRecord:
+        self.records.append(record)
+        if self.onRecord is not None:
+            self.onRecord(record)
+        return record
+
+    def _parseLine(self, line: str, attr: int) -> LogRecord | None:
+        counters = self.counters
+        counters.lines += 1
+        if not line or line.isspace():
+            return None
+        msgtype = attr & MESSAGE_TYPE_MASK
+
+        # A compile error is often followed, within a few lines, by a line
+        # stating where it happened
+        lastError = self._lastCompileError
+        if lastError is not None:
+            self._lookahead -= 1
+            if self._lookahead <= 0:
+                self._lastCompileError = None
+            m = _lineInfoRe.match(line)
+            if m is not None:
+                lastError.line = int(m.group(1))
+                self._lastCompileError = None
+                return None
+
+        if (m := _initErrorRe.match(line)) is not None:
+            counters.initErrors += 1
+            instr, opcode, lineno, msg = m.groups()
+            return self._emit(LogRecord('init-error', msg, attr=attr, instr=instr or '',
+                                        opcode=opcode or '',
+                                        line=int(lineno) if lineno else None))
+        if (m := _perfErrorRe.match(line)) is not None:
+            counters.perfErrors += 1
+            instr, opcode, lineno, msg = m.groups()
+            return self._emit(LogRecord('perf-error', msg, attr=attr, instr=instr or '',
+                                        opcode=opcode or '',
+                                        line=int(lineno) if lineno else None))
+        if (m := _compileErrorRe.match(line)) is not None:
+            counters.compileErrors += 1
+            msg = m.group(1)
+            lm = _lineRe.search(msg)
+            record = LogRecord('compile-error', msg, attr=attr,
+                               line=int(lm.group(1)) if lm else None)
+            if record.line is None:
+                self._lastCompileError = record
+                self._lookahead = 3
+            return self._emit(record)
+        if (m := _parseFailedRe.match(line)) is not None:
+            return self._emit(LogRecord('compile-failed', line.strip(), attr=attr,
+                                        values=[float(m.group(1))]))
+        if (m := _warningRe.match(line)) is not None:
+            counters.warnings += 1
+            return self._emit(LogRecord('warning', m.group(1), attr=attr))
+        if (m := _rangeRe.match(line)) is not None:
+            values = _values(m.group(1))
+            counters.samplesOutOfRange += int(sum(values))
+            return self._emit(LogRecord('out-of-range', line.strip(), attr=attr, values=values))
+        if (m := _overallRangeRe.match(line)) is not None:
+            return self._emit(LogRecord('overall-out-of-range', line.strip(), attr=attr,
+                                        values=_values(m.group(1))))
+        if 'overall amps:' in line and (m := _overallAmpsRe.search(line)) is not None:
+            counters.overallAmps = values = _values(m.group(1))
+            return self._emit(LogRecord('overall-amps', line.strip(), attr=attr, values=values))
+        if (m := _sectionAmpsRe.match(line)) is not None:
+            values = _values(m.group(1))
+            maxAmps = counters.maxAmps
+            if len(maxAmps) < len(values):
+                maxAmps.extend([0.] * (len(values) - len(maxAmps)))
+            for i, value in enumerate(values):
+                if abs(value) > maxAmps[i]:
+                    maxAmps[i] = abs(value)
+            return self._emit(LogRecord('section-amps', line.strip(), attr=attr, values=values))
+        if (m := _perfStatsRe.match(line)) is not None:
+            counters.errorsInPerformance = n = int(m.group(1))
+            return self._emit(LogRecord('perf-stats', line.strip(), attr=attr, values=[float(n)]))
+        if msgtype == _errorType:
+            counters.errors += 1
+            return self._emit(LogRecord('error', line.strip(), attr=attr))
+        if msgtype == _warningType:
+            counters.warnings += 1
+            return self._emit(LogRecord('warning', line.strip(), attr=attr))
+        return None
@@ -0,0 +1,497 @@
+"""
+Handling csound's messages off the audio thread
+
+A verbose orchestra can print thousands of lines per second. If the message
+buffer is not drained it grows without limit. A :class:`MessagePump` drains
+it from a background thread at a fixed interval into a bounded queue,
+optionally filtering messages by type and collapsing repeated lines.
+
+A :class:`MessageDispatcher` does not use the message buffer: it installs a
+message callback which only stores each raw message, and dispatches them
+in batches to python handlers from its own thread.
+
+.. code-block:: python
+
+    from ctcsound7.messages import MessagePump
+
+    cs = ctcsound7.Csound()
+    pump = MessagePump(cs, interval=0.05, types=['error', 'warning', 'orch'])
+    cs.compileOrc(...)
+    cs.start()
+    pump.start()
+    ...
+    for msg, attr in pump.messages():
+        print(msg, end='')
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+import typing as _t
+
+if _t.TYPE_CHECKING:
+    from . import Csound
+
+
+MESSAGE_TYPES = {
+    'default': 0x0000,
+    'error': 0x1000,
+    'orch': 0x2000,
+    'realtime': 0x3000,
+    'warning': 0x4000,
+    'stdout': 0x5000
+}
+"""Maps the name of a message type to its value (see CSOUNDMSG_* constants)"""
+
+MESSAGE_TYPE_MASK = 0x7000
+"""Mask to extract the message type from the attribute of a message"""
+
+_typeNames = {value: name for name, value in MESSAGE_TYPES.items()}
+
+
+def messageType(attr: int) -> str:
+    """
+    The name of the type of a message, given its attribute
+
+    Args:
+        attr: the attribute of the message, as returned by :meth:`~ctcsound7.Csound.readMessage`
+
+    Returns:
+        one of 'default', 'error', 'orch', 'realtime', 'warning', 'stdout'
+    """
+    return _typeNames.get(attr & MESSAGE_TYPE_MASK, 'default')
+
+
+def _typeValues(types: _t.Sequence[str | int]) -> frozenset[int]:
+    values = set()
+    for t in types:
+        if isinstance(t, str):
+            if t not in MESSAGE_TYPES:
+                raise ValueError(f"Unknown message type '{t}', expected one of {list(MESSAGE_TYPES)}")
+            values.add(MESSAGE_TYPES[t])
+        else:
+            values.add(t & MESSAGE_TYPE_MASK)
+    return frozenset(values)
+
+
+@dataclass
+class PumpStats:
+    """
+    Counters of a :class:`MessagePump`
+    """
+    drained: int = 0
+    """The number of messages read from csound"""
+
+    queued: int = 0
+    """The number of messages currently in the queue"""
+
+    filtered: int = 0
+    """The number of messages discarded because of their type"""
+
+    suppressed: int = 0
+    """The number of repeated messages collapsed by the rate limit"""
+
+    dropped: int = 0
+    """The number of messages dropped because the queue was full"""
+
+
+class MessagePump:
+    """
+    Drains the message buffer of a csound instance from a background thread
+
+    Args:
+        csound: the csound instance
+        interval: the time between drains, in seconds
+        maxlen: the max. number of messages kept in the queue. When the queue
+            is full the oldest messages are dropped
+        types: if given, only messages of these types are kept. A type is
+            either a name ('default', 'error', 'orch', 'realtime', 'warning',
+            'stdout') or one of the CSOUNDMSG_* constants
+        maxRepeats: a line repeated consecutively more than this number of
+            times is suppressed; when a different line arrives, a single line
+            stating how many repetitions were suppressed is queued instead.
+            0 disables rate limiting
+        callback: if given, a function ``(message: str, attr: int) -> None``
+            called (from the pump thread) for each queued message
+        createBuffer: if True, create the message buffer of *csound*. Set it
+            to False if the buffer has been created already
+
+    The message buffer should be created before compiling, in order to
+    capture all messages, so the pump is best created right after the
+    csound instance. The pump thread only performs the draining;
+    the audio thread is never blocked by it beyond the buffer's own lock.
+    """
+    def __init__(self,
+                 csound: Csound,
+                 interval: float = 0.05,
+                 maxlen: int = 10000,
+                 types: _t.Sequence[str | int] | None = None,
+                 maxRepeats: int = 0,
+                 callback: _t.Callable[[str, int], None] | None = None,
+                 createBuffer=True):
+        self.csound = csound
+        self.interval = interval
+        self.types = _typeValues(types) if types is not None else None
+        self.maxRepeats = maxRepeats
+        self.callback = callback
+
+        self._queue: deque[tuple[str, int]] = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._stats = PumpStats()
+        self._stopEvent = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lastMessage = ''
+        self._lastAttr = 0
+        self._repeats = 0
+        if createBuffer:
+            csound.createMessageBuffer(echo=False)
+
+    def __repr__(self) -> str:
+        return f"MessagePump(interval={self.interval}, running={self.running})"
+
+    def __enter__(self) -> MessagePump:
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    @property
+    def running(self) -> bool:
+        """True if the pump thread is running"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """
+        Start the pump thread
+        """
+        if self.running:
+            return
+        self._stopEvent.clear()
+        self._thread = threading.Thread(target=self._run, name='csound-messages', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the pump thread, after a last drain
+        """
+        if self._thread is not None:
+            self._stopEvent.set()
+            self._thread.join()
+            self._thread = None
+        self.pump()
+        with self._lock:
+            self._flushRepeats()
+
+    def _run(self) -> None:
+        while not self._stopEvent.wait(self.interval):
+            self.pump()
+
+    def _enqueue(self, msg: str, attr: int) -> None:
+        # Called with the lock held
+        queue = self._queue
+        if len(queue) == queue.maxlen:
+            self._stats.dropped += 1
+        queue.append((msg, attr))
+        if self.callback is not None:
+            self.callback(msg, attr)
+
+    def _flushRepeats(self) -> None:
+        # Called with the lock held
+        if self._repeats > self.maxRepeats:
+            suppressed = self._repeats - self.maxRepeats
+            self._enqueue(f"(last message repeated {suppressed} more times)\n", self._lastAttr)
+        self._repeats = 0
+
+    def pump(self) -> int:
+        """
+        Drain the message buffer once
+
+        This is called periodically by the pump thread, but it can also be
+        called directly (for example, without starting the thread)
+
+        Returns:
+            the number of messages drained
+        """
+        messages = self.csound.drainMessages()
+        if not messages:
+            return 0
+        types = self.types
+        maxRepeats = self.maxRepeats
+        with self._lock:
+            stats = self._stats
+            stats.drained += len(messages)
+            for msg, attr in messages:
+                if types is not None and (attr & MESSAGE_TYPE_MASK) not in types:
+                    stats.filtered += 1
+                    continue
+                if maxRepeats > 0:
+                    if msg == self._lastMessage:
+                        self._repeats += 1
+                        if self._repeats > maxRepeats:
+                            stats.suppressed += 1
+                            continue
+                    else:
+                        self._flushRepeats()
+                        self._lastMessage = msg
+                        self._lastAttr = attr
+                        self._repeats = 1
+                self._enqueue(msg, attr)
+        return len(messages)
+
+    def messages(self, max: int | None = None) -> list[tuple[str, int]]:
+        """
+        Remove and return the queued messages
+
+        Args:
+            max: if given, the max. number of messages to return
+
+        Returns:
+            a list of tuples (message: str, attribute: int), oldest first
+        """
+        with self._lock:
+            queue = self._queue
+            n = len(queue) if max is None else min(max, len(queue))
+            return [queue.popleft() for _ in range(n)]
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> PumpStats:
+        """
+        Returns a snapshot of the counters of this pump
+        """
+        with self._lock:
+            s = self._stats
+            return PumpStats(drained=s.drained, queued=len(self._queue), filtered=s.filtered,
+                             suppressed=s.suppressed, dropped=s.dropped)
+
+
+@dataclass
+class DispatcherStats:
+    """
+    Counters of a :class:`MessageDispatcher`
+    """
+    received: int = 0
+    """The number of messages received from csound"""
+
+    dispatched: int = 0
+    """The number of messages passed to the handlers"""
+
+    dropped: int = 0
+    """The number of messages dropped because too many were pending"""
+
+    pending: int = 0
+    """The number of messages waiting to be dispatched"""
+
+    batches: int = 0
+    """The number of batches dispatched"""
+
+    handlerErrors: int = 0
+    """The number of times a handler raised an exception"""
+
+    meanLatency: float = 0.
+    """Mean time between a message being received and being dispatched, in seconds"""
+
+    maxLatency: float = 0.
+    """Max. time between a message being received and being dispatched, in seconds"""
+
+
+class MessageDispatcher:
+    """
+    Dispatches csound's messages in batches from a separate thread
+
+    Args:
+        capacity: the max. number of messages waiting to be dispatched. When
+            reached, further messages are dropped and counted as such
+        interval: the time between dispatches, in seconds
+
+    Use :meth:`~ctcsound7.Csound.messageDispatcher` to create a dispatcher
+    and install it as the message callback of a csound instance.
+
+    The callback, which runs in the thread where csound prints (usually the
+    performance thread), only stores the raw message, its attribute and a
+    timestamp in a preallocated ring of *capacity* slots: it does not allocate
+    any container, decode, format, lock or call any user code. When the ring
+    is full the message is dropped and counted. Any callback into python needs
+    to hold the GIL, but this keeps the time it is held within csound's thread
+    as short as possible. Decoding and
+    calling the handlers happens in the dispatch thread. The stats report
+    dropped messages and the latency between a message being received and
+    being dispatched.
+    """
+    def __init__(self, capacity=8192, interval=0.02):
+        if capacity < 1:
+            raise ValueError(f"The capacity must be a positive integer, got {capacity}")
+        self.capacity = capacity
+        """The max. number of pending messages"""
+
+        self.interval = interval
+        """The time between dispatches, in seconds"""
+
+        # A single-producer / single-consumer ring: the head is only advanced
+        # by the callback, the tail only by dispatch
+        self._attrs: list[int] = [0] * capacity
+        self._msgs: list[bytes | None] = [None] * capacity
+        self._times: list[float] = [0.] * capacity
+        self._head = 0
+        self._tail = 0
+        self._handlers: list[tuple[_t.Callable[[list[tuple[str, int]]], None], frozenset[int] | None]] = []
+        self._received = 0
+        self._dropped = 0
+        self._dispatched = 0
+        self._batches = 0
+        self._handlerErrors = 0
+        self._latencySum = 0.
+        self._maxLatency = 0.
+        self._lock = threading.Lock()
+        self._stopEvent = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __repr__(self) -> str:
+        return f"MessageDispatcher(capacity={self.capacity}, running={self.running})"
+
+    def __enter__(self) -> MessageDispatcher:
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def callback(self, csound, attr: int, msg: bytes) -> None:
+        """
+        The message callback installed in csound
+
+        Called from csound's thread for each message
+        """
+        self._received += 1
+        head = self._head
+        if head - self._tail >= self.capacity:
+            self._dropped += 1
+            return
+        idx = head % self.capacity
+        self._attrs[idx] = attr
+        self._msgs[idx] = msg
+        self._times[idx] = time.perf_counter()
+        # Publish the message once its slot has been written
+        self._head = head + 1
+
+    def addHandler(self,
+                   handler: _t.Callable[[list[tuple[str, int]]], None],
+                   types: _t.Sequence[str | int] | None = None
+                   ) -> None:
+        """
+        Add a handler
+
+        Args:
+            handler: a function ``(batch: list[tuple[str, int]]) -> None``, called
+                from the dispatch thread with a list of (message, attribute)
+            types: if given, only messages of these types are passed to the
+                handler (see :class:`MessagePump` for the possible values)
+
+        An exception raised by a handler is counted (see :meth:`MessageDispatcher.stats`)
+        and does not affect other handlers
+        """
+        typevalues = _typeValues(types) if types is not None else None
+        with self._lock:
+            self._handlers = self._handlers + [(handler, typevalues)]
+
+    def removeHandler(self, handler: _t.Callable) -> None:
+        """
+        Remove a handler previously added via :meth:`MessageDispatcher.addHandler`
+        """
+        with self._lock:
+            self._handlers = [(h, types) for h, types in self._handlers if h is not handler]
+
+    @property
+    def running(self) -> bool:
+        """True if the dispatch thread is running"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """
+        Start the dispatch thread
+        """
+        if self.running:
+            return
+        self._stopEvent.clear()
+        self._thread = threading.Thread(target=self._run, name='csound-dispatch', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the dispatch thread, after dispatching any pending messages
+        """
+        if self._thread is not None:
+            self._stopEvent.set()
+            self._thread.join()
+            self._thread = None
+        self.dispatch()
+
+    def _run(self) -> None:
+        while not self._stopEvent.wait(self.interval):
+            self.dispatch()
+
+    def dispatch(self) -> int:
+        """
+        Dispatch all pending messages as one batch
+
+        This is called periodically by the dispatch thread
+
+        Returns:
+            the number of messages dispatched
+        """
+        with self._lock:
+            head = self._head
+            tail = self._tail
+            n = head - tail
+            if n == 0:
+                return 0
+            capacity = self.capacity
+            attrs, msgs, times = self._attrs, self._msgs, self._times
+            now = time.perf_counter()
+            batch = []
+            latencySum = 0.
+            maxLatency = self._maxLatency
+            for pos in range(tail, head):
+                idx = pos % capacity
+                msg = msgs[idx]
+                msgs[idx] = None
+                batch.append((msg.decode('utf-8', errors='replace') if msg else '', attrs[idx]))
+                latency = now - times[idx]
+                latencySum += latency
+                if latency > maxLatency:
+                    maxLatency = latency
+            # Free the slots
+            self._tail = head
+            self._latencySum += latencySum
+            self._maxLatency = maxLatency
+            self._dispatched += n
+            self._batches += 1
+            handlers = self._handlers
+        for handler, types in handlers:
+            if types is None:
+                sub = batch
+            else:
+                sub = [item for item in batch if (item[1] & MESSAGE_TYPE_MASK) in types]
+                if not sub:
+                    continue
+            try:
+                handler(sub)
+            except Exception:
+                self._handlerErrors += 1
+        return n
+
+    def stats(self) -> DispatcherStats:
+        """
+        Returns a snapshot of the counters of this dispatcher
+        """
+        with self._lock:
+            dispatched = self._dispatched
+            return DispatcherStats(received=self._received, dispatched=dispatched,
+                                   dropped=self._dropped, pending=self._head - self._tail,
+                                   batches=self._batches, handlerErrors=self._handlerErrors,
+                                   meanLatency=self._latencySum / dispatched if dispatched else 0.,
+                                   maxLatency=self._maxLatency)
@@ -0,0 +1,217 @@
+"""
+Persistent cache of the opcodes defined by csound
+
+Querying csound for its opcodes is slow: it needs a csound instance and,
+for csound 7, parsing the output of ``-z1``. The list only changes when the
+csound library, its version or the plugins folders change, so it is cached
+on disk, keyed by those, and memoized within the process. The cached list is
+always queried from a fresh instance, with all plugins loaded: it does not
+depend on the state of the instance asking for it.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import typing as _t
+
+from .common import OpcodeDef
+from . import _util
+
+
+_memo: dict[str, list[OpcodeDef]] = {}
+_memoLock = threading.Lock()
+
+# One lock per key, held while the opcodes for that key are loaded, so that
+# loading does not block callers asking for other keys
+_keyLocks: dict[str, threading.Lock] = {}
+
+# Bump this if the format of the cache file changes
+_FORMAT = 2
+
+
+def _pathInfo(path: str) -> list:
+    try:
+        realpath = os.path.realpath(path)
+        st = os.stat(realpath)
+        return [realpath, st.st_mtime_ns, st.st_size]
+    except OSError:
+        return [path, 0, 0]
+
+
+def _cacheKey(libpath: str, version: int, opcodeDir='') -> str:
+    fileinfo = _pathInfo(libpath)
+    # The modification time of a folder changes when plugins are added or removed
+    dirinfo = _pathInfo(opcodeDir) if opcodeDir else None
+    env = sorted((k, v) for k, v in os.environ.items() if k.startswith('OPCODE'))
+    data = json.dumps([_FORMAT, fileinfo, version, dirinfo, env])
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()[:32]
+
+
+def _readCache(path: str) -> list[OpcodeDef] | None:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = json.load(f)
+        return [OpcodeDef(name=name, outtypes=outtypes, intypes=intypes, flags=flags)
+                for name, outtypes, intypes, flags in rows]
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def _writeCache(path: str, opcodes: list[OpcodeDef]) -> None:
+    rows = [(opc.name, opc.outtypes, opc.intypes, opc.flags) for opc in opcodes]
+    tmppath = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmppath, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, separators=(',', ':'))
+        os.replace(tmppath, path)
+    except OSError:
+        # The cache is an optimization, failing to write it is not an error
+        try:
+            os.unlink(tmppath)
+        except OSError:
+            pass
+
+
+def cachedOpcodes(loader: _t.Callable[[], list[OpcodeDef]],
+                  libpath: str,
+                  version: int,
+                  opcodeDir=''
+                  ) -> list[OpcodeDef]:
+    """
+    Returns the opcodes defined by csound, using the cache if possible
+
+    Args:
+        loader: a function querying a fresh csound instance, with all plugins
+            loaded, for its opcodes. Called on a cache miss
+        libpath: the path of the csound library
+        version: the version of csound
+        opcodeDir: the folder plugins are loaded from, if overridden
+
+    Returns:
+        a list of :class:`~ctcsound7.common.OpcodeDef`
+
+    The cache is keyed by the path, modification time and size of the csound
+    library, its version, the plugins folder and any environment variable
+    starting with ``OPCODE`` (which determine where plugins are loaded from)
+    """
+    key = _cacheKey(libpath, version, opcodeDir=opcodeDir)
+    with _memoLock:
+        opcodes = _memo.get(key)
+        if opcodes is not None:
+            return list(opcodes)
+        keyLock = _keyLocks.setdefault(key, threading.Lock())
+    with keyLock:
+        with _memoLock:
+            opcodes = _memo.get(key)
+        if opcodes is not None:
+            # Loaded by another thread while we waited
+            return list(opcodes)
+        path = os.path.join(_util.userCacheDir('opcodes'), key + '.json')
+        opcodes = _readCache(path)
+        if opcodes is None:
+            opcodes = loader()
+            if not opcodes:
+                # Plugins might not be loaded yet, do not cache an empty list
+                return opcodes
+            _writeCache(path, opcodes)
+        with _memoLock:
+            _memo[key] = opcodes
+        return list(opcodes)
+
+
+def clearCache() -> None:
+    """
+    Remove all cached opcode lists, both in memory and on disk
+    """
+    with _memoLock:
+        _memo.clear()
+        folder = _util.userCacheDir('opcodes')
+        for entry in os.scandir(folder):
+            if entry.name.endswith('.json'):
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+
+
+class OpcodeIndex:
+    """
+    An index of opcodes, for fast lookup by name and signature
+
+    Args:
+        opcodes: the opcodes to index, as returned by :meth:`~ctcsound7.Csound.getOpcodes`
+
+    An opcode can have multiple definitions (one per signature), so lookups
+    return lists.
+
+    .. code-block:: python
+
+        index = csound.opcodeIndex()
+        'oscili' in index           # True
+        index.find('oscili', outtypes='a')
+        index.find(intypes='kk')    # all opcodes taking two k inputs
+    """
+    def __init__(self, opcodes: _t.Sequence[OpcodeDef]):
+        self.opcodes = list(opcodes)
+        """All opcode definitions"""
+
+        self._byName: dict[str, list[OpcodeDef]] = {}
+        self._byOuttypes: dict[str, list[OpcodeDef]] = {}
+        self._byIntypes: dict[str, list[OpcodeDef]] = {}
+        for opc in self.opcodes:
+            self._byName.setdefault(opc.name, []).append(opc)
+            self._byOuttypes.setdefault(opc.outtypes, []).append(opc)
+            self._byIntypes.setdefault(opc.intypes, []).append(opc)
+
+    def __len__(self) -> int:
+        return len(self.opcodes)
+
+    def __iter__(self) -> _t.Iterator[OpcodeDef]:
+        return iter(self.opcodes)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._byName
+
+    def names(self) -> list[str]:
+        """The names of all opcodes, sorted"""
+        return sorted(self._byName)
+
+    def get(self, name: str) -> list[OpcodeDef]:
+        """
+        All definitions of the opcode *name* (an empty list if not found)
+        """
+        return self._byName.get(name, [])
+
+    def find(self,
+             name: str | None = None,
+             outtypes: str | None = None,
+             intypes: str | None = None
+             ) -> list[OpcodeDef]:
+        """
+        Find opcode definitions matching all the given criteria
+
+        Args:
+            name: the name of the opcode
+            outtypes: the exact output signature, for example 'a' or 'kk'
+            intypes: the exact input signature
+
+        Returns:
+            the matching definitions
+        """
+        candidates: list[list[OpcodeDef]] = []
+        if name is not None:
+            candidates.append(self._byName.get(name, []))
+        if outtypes is not None:
+            candidates.append(self._byOuttypes.get(outtypes, []))
+        if intypes is not None:
+            candidates.append(self._byIntypes.get(intypes, []))
+        if not candidates:
+            return list(self.opcodes)
+        # Filter the smallest candidate list by the rest of the criteria
+        candidates.sort(key=len)
+        return [opc for opc in candidates[0]
+                if (name is None or opc.name == name)
+                and (outtypes is None or opc.outtypes == outtypes)
+                and (intypes is None or opc.intypes == intypes)]
@@ -0,0 +1,121 @@
+"""
+Render many csound jobs in parallel using threads within one process
+
+ctypes releases the GIL while calling into csound, so independent csound
+instances rendering on different threads run in parallel. Compared to
+:func:`ctcsound7.batch.renderMany` there is no process startup and no
+transfer of the rendered samples between processes.
+
+.. code-block:: python
+
+    from ctcsound7.parallel import ParallelRenderer
+    from ctcsound7.batch import RenderJob
+
+    renderer = ParallelRenderer(workers=4, options=['-m0'])
+    results = renderer.render([RenderJob(orc=orc, sco=sco, dur=10) for sco in scores])
+"""
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import typing as _t
+
+from .batch import RenderJob, RenderResult, compileJob
+from .pool import CsoundPool
+
+
+class ParallelRenderer:
+    """
+    Renders jobs offline on a pool of threads, one csound instance per thread
+
+    Args:
+        workers: the number of threads (and csound instances). If not given,
+            the number of cpus is used
+        options: options applied to each csound instance (see :class:`~ctcsound7.pool.CsoundPool`)
+        opcodeDir: if given, the folder where to load opcodes from
+        bufferFrames: csound 6 only, the size (in frames) of the buffer rendered
+            by each call into csound (the ``-b`` option). It is rounded by
+            csound to a multiple of ksmps. Options of a job can override it
+
+    The csound instances are created in advance and reused across calls to
+    :meth:`ParallelRenderer.render`, being reset between jobs. Each job is
+    rendered via :meth:`~ctcsound7.Csound.render`, which returns to python
+    (and takes the GIL) after each block: the block is copied into the
+    output array with a single memmove.
+
+    With csound 6 each block is a whole buffer (:meth:`~ctcsound7.Csound.performBuffer`),
+    so with the default *bufferFrames* many performance cycles are computed
+    for each time the GIL is taken.
+
+    .. note::
+
+        csound 7 has no API to perform more than one cycle per call: blocks
+        are ksmps frames long (:meth:`~ctcsound7.Csound.performKsmps`), and
+        the GIL is taken at every performance cycle. The threads then contend
+        for the GIL when ksmps is small and scaling with the number of workers
+        suffers. Use a large ksmps if possible, or render in separate processes
+        (:func:`ctcsound7.batch.renderMany`).
+    """
+    def __init__(self,
+                 workers: int | None = None,
+                 options: _t.Sequence[str] = (),
+                 opcodeDir='',
+                 bufferFrames=16384):
+        from . import VERSION
+        self.workers = workers or os.cpu_count() or 1
+        """The number of threads"""
+
+        if VERSION < 7000 and bufferFrames > 0:
+            options = [f'--iobufsamps={bufferFrames}',
+                       f'--hardwarebufsamps={bufferFrames * 2}',
+                       *options]
+
+        self._pool = CsoundPool(options=options, opcodeDir=opcodeDir,
+                                maxSize=self.workers, minSize=self.workers, idleTimeout=0)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                            thread_name_prefix='csound-render')
+
+    def __enter__(self) -> ParallelRenderer:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _renderJob(self, job: RenderJob, t0: float) -> RenderResult:
+        with self._pool.instance() as cs:
+            t1 = time.perf_counter()
+            try:
+                compileJob(cs, job)
+                t2 = time.perf_counter()
+                samples = cs.render(dur=job.dur)
+            except Exception as e:
+                return RenderResult(job=job, error=str(e) or type(e).__name__,
+                                    totalTime=time.perf_counter() - t0, pid=os.getpid())
+            t3 = time.perf_counter()
+            return RenderResult(job=job, samples=samples, sr=cs.sr(),
+                                compileTime=t2 - t1, renderTime=t3 - t2,
+                                totalTime=t3 - t0, pid=os.getpid())
+
+    def render(self, jobs: _t.Sequence[RenderJob | str]) -> list[RenderResult]:
+        """
+        Render the given jobs in parallel
+
+        Args:
+            jobs: the jobs to render. A job can also be given as the text of a csd file
+
+        Returns:
+            a list of :class:`~ctcsound7.batch.RenderResult`, in the order of *jobs*.
+            A failed job has its ``error`` attribute set and ``samples`` set to None
+        """
+        renderjobs = [job if isinstance(job, RenderJob) else RenderJob(csd=job) for job in jobs]
+        t0 = time.perf_counter()
+        futures = [self._executor.submit(self._renderJob, job, t0) for job in renderjobs]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        """
+        Shut down the threads and destroy the csound instances
+        """
+        self._executor.shutdown(wait=True)
+        self._pool.close()
@@ -0,0 +1,297 @@
+"""
+A pool of pre-created csound instances
+
+Creating a :class:`~ctcsound7.Csound` instance (loading plugins, parsing options)
+can take tens of milliseconds. A :class:`CsoundPool` keeps configured instances
+around and resets them between uses.
+
+.. code-block:: python
+
+    from ctcsound7.pool import CsoundPool
+
+    pool = CsoundPool(options=['-n', '-m0', '--ksmps=64'], maxSize=4, minSize=2)
+
+    def handleRequest(orc, dur):
+        with pool.instance() as cs:
+            cs.compileOrc(orc)
+            return cs.render(dur)
+"""
+from __future__ import annotations
+
+import contextlib
+import threading
+import time
+from dataclasses import dataclass
+import typing as _t
+
+if _t.TYPE_CHECKING:
+    from . import Csound
+
+
+@dataclass
+class PoolStats:
+    """
+    Counters of a :class:`CsoundPool`
+    """
+    idle: int = 0
+    """The number of idle instances"""
+
+    inUse: int = 0
+    """The number of instances currently handed out"""
+
+    created: int = 0
+    """The number of instances created"""
+
+    reused: int = 0
+    """The number of times an instance was handed out again after being returned"""
+
+    evicted: int = 0
+    """The number of idle instances destroyed after the idle timeout"""
+
+    discarded: int = 0
+    """The number of returned instances which could not be reused"""
+
+
+class _Entry:
+    __slots__ = ('csound', 'uses', 'lastUsed')
+
+    def __init__(self, csound: Csound):
+        self.csound = csound
+        self.uses = 0
+        self.lastUsed = time.monotonic()
+
+
+class CsoundPool:
+    """
+    A pool of configured csound instances, reused via reset
+
+    Args:
+        options: command-line options applied to each instance (via
+            :meth:`~ctcsound7.Csound.setOption`) after creating it and after
+            each reset
+        opcodeDir: if given, the folder where to load opcodes from
+        maxSize: the max. number of instances, idle and in use. When all
+            instances are in use :meth:`CsoundPool.acquire` blocks until one
+            is returned
+        minSize: the number of instances created in advance. Idle instances
+            are never evicted below this number
+        idleTimeout: idle instances not used for this time (in seconds) are
+            destroyed. Eviction happens whenever an instance is acquired or
+            released
+        setup: if given, a function ``(csound) -> None`` called after the
+            options have been applied, to configure an instance further
+
+    An instance handed out by the pool is always in the same state: created
+    (or reset) and configured with the given options, not yet started.
+    When an instance is returned it is reset (which clears its started and
+    compilation state) and the options are applied again. An instance with
+    an attached performance thread, or one which fails to reset, is
+    discarded instead.
+    """
+    def __init__(self,
+                 options: _t.Sequence[str] = (),
+                 opcodeDir='',
+                 maxSize=4,
+                 minSize=0,
+                 idleTimeout=60.,
+                 setup: _t.Callable[[Csound], None] | None = None):
+        if maxSize < 1:
+            raise ValueError(f"maxSize must be at least 1, got {maxSize}")
+        if not 0 <= minSize <= maxSize:
+            raise ValueError(f"minSize should be between 0 and maxSize ({maxSize}), got {minSize}")
+        self.options = list(options)
+        """The options applied to each instance"""
+
+        self.opcodeDir = opcodeDir
+        self.maxSize = maxSize
+        self.minSize = minSize
+        self.idleTimeout = idleTimeout
+        self.setup = setup
+
+        self._idle: list[_Entry] = []
+        self._inUse: dict[int, _Entry] = {}
+        # Instances being created or reset outside of the lock. They count
+        # towards maxSize
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._stats = PoolStats()
+        self._closed = False
+        for _ in range(minSize):
+            self._idle.append(self._create())
+            self._stats.created += 1
+
+    def __enter__(self) -> CsoundPool:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"CsoundPool(maxSize={self.maxSize}, idle={len(self._idle)}, inUse={len(self._inUse)})"
+
+    def _configure(self, csound: Csound) -> None:
+        for option in self.options:
+            csound.setOption(option)
+        if self.setup is not None:
+            self.setup(csound)
+
+    def _create(self) -> _Entry:
+        # Called without the lock held
+        from . import Csound
+        csound = Csound(opcodeDir=self.opcodeDir)
+        self._configure(csound)
+        return _Entry(csound)
+
+    def _evictIdle(self) -> list[_Entry]:
+        # Called with the lock held. Returns the evicted entries, so that the
+        # caller can let them be destroyed after releasing the lock
+        if self.idleTimeout <= 0 or len(self._idle) <= self.minSize:
+            return []
+        now = time.monotonic()
+        keep = [entry for entry in self._idle if now - entry.lastUsed < self.idleTimeout]
+        # Keep the most recently used instances if we went under minSize
+        if len(keep) < self.minSize:
+            keep = sorted(self._idle, key=lambda entry: entry.lastUsed)[-self.minSize:]
+        evicted = [entry for entry in self._idle if entry not in keep]
+        self._stats.evicted += len(evicted)
+        self._idle = keep
+        return evicted
+
+    def acquire(self, timeout: float | None = None) -> Csound:
+        """
+        Get an instance from the pool
+
+        Args:
+            timeout: if given, the max. time to wait for an instance when
+                all instances are in use
+
+        Returns:
+            a csound instance, configured and not started. It must be
+            returned via :meth:`CsoundPool.release`
+
+        .. seealso:: :meth:`CsoundPool.instance`
+
+        Only the bookkeeping happens with the lock of the pool held: a new
+        instance is created outside of it, so other threads are not blocked
+        while it is created
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("This pool has been closed")
+            evicted = self._evictIdle()
+            ok = self._cond.wait_for(
+                lambda: self._closed or self._idle or len(self._inUse) + self._pending < self.maxSize,
+                timeout=timeout)
+            if not ok:
+                raise TimeoutError(f"No csound instance available after {timeout} seconds")
+            if self._closed:
+                raise RuntimeError("This pool has been closed")
+            if self._idle:
+                # The most recently used instance
+                entry = self._idle.pop()
+                self._stats.reused += 1
+                entry.uses += 1
+                self._inUse[id(entry.csound)] = entry
+                return entry.csound
+            # Reserve a slot for the new instance
+            self._pending += 1
+        del evicted
+        try:
+            entry = self._create()
+        except BaseException:
+            with self._cond:
+                self._pending -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._pending -= 1
+            self._stats.created += 1
+            entry.uses += 1
+            self._inUse[id(entry.csound)] = entry
+            return entry.csound
+
+    def release(self, csound: Csound) -> None:
+        """
+        Return an instance to the pool
+
+        The instance is reset and configured again, outside of the lock
+        of the pool
+        """
+        with self._cond:
+            entry = self._inUse.pop(id(csound), None)
+            if entry is None:
+                raise ValueError(f"The csound instance {csound} does not belong to this pool")
+            reusable = not self._closed and csound._perfthread is None
+            if reusable:
+                # The instance keeps its slot while it is reset
+                self._pending += 1
+            else:
+                self._stats.discarded += 1
+                evicted = self._evictIdle()
+                self._cond.notify()
+                return
+        try:
+            csound.reset()
+            self._configure(csound)
+        except Exception:
+            reusable = False
+        with self._cond:
+            self._pending -= 1
+            if reusable and not self._closed:
+                entry.lastUsed = time.monotonic()
+                self._idle.append(entry)
+            else:
+                self._stats.discarded += 1
+            evicted = self._evictIdle()
+            self._cond.notify()
+
+    @contextlib.contextmanager
+    def instance(self, timeout: float | None = None) -> _t.Iterator[Csound]:
+        """
+        Context manager to use an instance of the pool
+
+        Args:
+            timeout: if given, the max. time to wait for an instance when
+                all instances are in use
+
+        .. code-block:: python
+
+            with pool.instance() as cs:
+                cs.compileOrc(...)
+                samples = cs.render(10)
+        """
+        csound = self.acquire(timeout=timeout)
+        try:
+            yield csound
+        finally:
+            self.release(csound)
+
+    def reuseCount(self, csound: Csound) -> int:
+        """
+        The number of times the given instance has been handed out
+
+        Args:
+            csound: an instance currently in use
+        """
+        entry = self._inUse.get(id(csound))
+        if entry is None:
+            raise ValueError(f"The csound instance {csound} is not in use")
+        return entry.uses
+
+    def stats(self) -> PoolStats:
+        """
+        Returns a snapshot of the counters of this pool
+        """
+        with self._cond:
+            return PoolStats(idle=len(self._idle), inUse=len(self._inUse),
+                             created=self._stats.created, reused=self._stats.reused,
+                             evicted=self._stats.evicted, discarded=self._stats.discarded)
+
+    def close(self) -> None:
+        """
+        Destroy all idle instances. Instances in use are destroyed when returned
+        """
+        with self._cond:
+            self._closed = True
+            self._idle.clear()
+            self._cond.notify_all()
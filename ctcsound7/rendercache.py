@@ -0,0 +1,257 @@
+"""
+A persistent cache of offline renders
+
+Rendering the same code with the same options twice produces the same
+samples, as long as any randomness is seeded. A :class:`RenderCache` stores
+rendered samples on disk as ``.npy`` files, keyed by a hash of everything
+which determines the result: the code, the options, the duration, the version
+of csound and the random seed. A cache hit returns a memory-mapped array
+without creating a csound instance.
+
+.. code-block:: python
+
+    from ctcsound7.rendercache import RenderCache
+    from ctcsound7.batch import RenderJob
+
+    cache = RenderCache(maxBytes=2**30)
+    samples = cache.render(RenderJob(orc=orc, sco=sco, dur=10), seed=42)
+"""
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import numpy as np
+import typing as _t
+
+from .batch import RenderJob, compileJob
+from . import _util
+
+if _t.TYPE_CHECKING:
+    from . import Csound
+
+
+_csInstrumentsRe = re.compile(r'<CsInstruments>[^\n]*\n?', re.IGNORECASE)
+
+
+def _seededJob(job: RenderJob, seed: int) -> RenderJob:
+    """
+    A copy of *job* with its orchestra starting with the ``seed`` opcode
+    """
+    line = f'seed {int(seed)}\n'
+    if job.csd:
+        m = _csInstrumentsRe.search(job.csd)
+        if m is None:
+            raise ValueError(f"The csd of job '{job.name}' has no <CsInstruments> section")
+        csd = job.csd[:m.end()] + line + job.csd[m.end():]
+        return dataclasses.replace(job, csd=csd)
+    return dataclasses.replace(job, orc=line + job.orc)
+
+
+class RenderCache:
+    """
+    An on-disk cache of rendered samples with an LRU size cap
+
+    Args:
+        path: the folder where the cache is stored. If not given, a folder
+            within the user's cache folder is used
+        maxBytes: the max. size of the cache, in bytes. When exceeded, the
+            least recently used renders are removed
+
+    Renders are stored as ``.npy`` files and returned as read-only memory-mapped
+    arrays. The recency of an entry is given by the modification time of its
+    file, which is updated on each hit, so the LRU order persists across
+    sessions. The cache is opt-in: only renders performed via
+    :meth:`RenderCache.render` are cached.
+    """
+    def __init__(self, path='', maxBytes=2**31):
+        self.path = path or _util.userCacheDir('renders')
+        """The folder of this cache"""
+
+        self.maxBytes = maxBytes
+        """The max. size of this cache, in bytes"""
+
+        self.hits = 0
+        """The number of cache hits"""
+
+        self.misses = 0
+        """The number of cache misses"""
+
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"RenderCache(path={self.path!r}, maxBytes={self.maxBytes})"
+
+    def key(self, job: RenderJob, seed: int | None = None, options: _t.Sequence[str] = ()) -> str:
+        """
+        The key identifying the render of *job* with the given *seed*
+
+        Args:
+            job: the job
+            seed: the random seed
+            options: options already set in the csound instance rendering
+                the job, set before the options of the job itself
+
+        The key is a hash of the code, the options and duration of the job,
+        the version of csound and the seed
+        """
+        from . import VERSION, APIVERSION
+        data = json.dumps({'csd': job.csd, 'orc': job.orc, 'sco': job.sco,
+                           'options': [*options, *job.options], 'dur': job.dur,
+                           'version': VERSION, 'apiversion': APIVERSION,
+                           'seed': seed},
+                          sort_keys=True)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def _entryPath(self, key: str) -> str:
+        return os.path.join(self.path, key + '.npy')
+
+    def get(self, job: RenderJob, seed: int | None = None, options: _t.Sequence[str] = ()
+            ) -> np.ndarray | None:
+        """
+        Get the cached render of *job*, or None if not found
+
+        Args:
+            job: the job
+            seed: the random seed
+            options: options set in the csound instance before the options of the job
+
+        Returns:
+            a read-only memory-mapped array of shape (numframes, nchnls), or None
+        """
+        path = self._entryPath(self.key(job, seed=seed, options=options))
+        try:
+            samples = np.load(path, mmap_mode='r')
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return samples
+
+    def put(self,
+            job: RenderJob,
+            samples: np.ndarray,
+            seed: int | None = None,
+            options: _t.Sequence[str] = ()
+            ) -> np.ndarray:
+        """
+        Add a render to the cache
+
+        Args:
+            job: the rendered job
+            samples: the rendered samples
+            seed: the random seed used
+            options: options set in the csound instance before the options of the job
+
+        Returns:
+            the samples, as a read-only memory-mapped array of the cached file
+        """
+        path = self._entryPath(self.key(job, seed=seed, options=options))
+        fd, tmppath = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, samples)
+            os.replace(tmppath, path)
+        except BaseException:
+            os.unlink(tmppath)
+            raise
+        self.evict(keep=path)
+        return np.load(path, mmap_mode='r')
+
+    def render(self,
+               job: RenderJob | str,
+               seed: int | None = None,
+               csound: Csound | None = None
+               ) -> np.ndarray:
+        """
+        Render *job*, or return the cached render if found
+
+        Args:
+            job: the job to render, or the text of a csd file
+            seed: the seed for csound's random generators. If given, the ``seed``
+                opcode is prepended to the orchestra of the job, so that it runs
+                before any other code. Renders which use random generators are
+                only reproducible when a seed is given
+            csound: the csound instance used to render on a cache miss. It
+                must be fresh (or reset), without any code compiled. Options
+                already set via :meth:`~ctcsound7.Csound.setOption` are part
+                of the key. If not given, a new instance is created
+
+        Returns:
+            a read-only memory-mapped array of shape (numframes, nchnls)
+        """
+        if isinstance(job, str):
+            job = RenderJob(csd=job)
+        if csound is not None and csound._started:
+            raise ValueError("The csound instance must be fresh or reset, it should not be started")
+        options = list(csound._options) if csound is not None else []
+        samples = self.get(job, seed=seed, options=options)
+        if samples is not None:
+            self.hits += 1
+            return samples
+        self.misses += 1
+        if csound is None:
+            from . import Csound
+            csound = Csound()
+        compileJob(csound, job if seed is None else _seededJob(job, seed))
+        return self.put(job, csound.render(dur=job.dur), seed=seed, options=options)
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith('.npy'):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def size(self) -> int:
+        """The size of this cache, in bytes"""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, keep='') -> int:
+        """
+        Remove the least recently used renders until the cache fits within maxBytes
+
+        Args:
+            keep: the path of an entry which should not be removed
+
+        Returns:
+            the number of entries removed
+        """
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for mtime, size, path in sorted(entries):
+                if total <= self.maxBytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.unlink(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            return removed
+
+    def clear(self) -> None:
+        """
+        Remove all renders from this cache
+        """
+        with self._lock:
+            for _, _, path in self._entries():
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
@@ -0,0 +1,207 @@
+"""
+A preallocated single-producer / single-consumer ring buffer of commands
+
+The ring is used to send commands (score events, channel values) from
+python to a running performance thread without going through a python
+queue. See :meth:`~ctcsound7.CsoundPerformanceThread.setCommandRing`
+"""
+from __future__ import annotations
+
+import ctypes
+import numpy as np
+import typing as _t
+
+from .common import MYFLT
+from . import _util
+
+
+CMD_EVENT = 1
+CMD_CHANNEL = 2
+
+
+class CommandRing:
+    """
+    A fixed-size ring buffer of command records
+
+    Args:
+        capacity: the max. number of commands which can be pending at any
+            moment. It is rounded up to a power of two
+        maxfields: the max. number of pfields of an event
+        channels: the names of the control channels which can be set via
+            this ring
+        channelIndex: a :class:`~ctcsound7._util.ChannelIndex` over *channels*,
+            in the same order
+
+    .. note::
+
+        Do not create a CommandRing directly, use
+        :meth:`~ctcsound7.CsoundPerformanceThread.setCommandRing`
+
+    Commands are written to preallocated numpy arrays by one producer thread
+    and consumed by one consumer thread (the performance thread, via
+    :meth:`CommandRing.drain`). The head index is only written by the producer,
+    the tail index only by the consumer, so no lock is needed: a record
+    is published by advancing the head after it has been written.
+    All pending commands are consumed at each performance cycle, in the
+    order in which they were pushed.
+
+    The channels are resolved when the ring is created, so pushing a
+    channel value never calls into csound. Only one thread should push
+    commands to the ring.
+    """
+    def __init__(self,
+                 capacity: int,
+                 maxfields: int,
+                 channels: _t.Sequence[str] = (),
+                 channelIndex: _util.ChannelIndex | None = None):
+        if capacity < 1:
+            raise ValueError(f"The capacity must be a positive integer, got {capacity}")
+        if maxfields < 1:
+            raise ValueError(f"maxfields must be a positive integer, got {maxfields}")
+        if channels and (channelIndex is None or len(channelIndex) != len(channels)):
+            raise ValueError("A channel index over the given channels is needed")
+        capacity = 1 << (capacity - 1).bit_length()
+        self.capacity = capacity
+        """The max. number of pending commands"""
+
+        self.maxfields = maxfields
+        """The max. number of pfields per event"""
+
+        self.dropped = 0
+        """The number of commands which were dropped because the ring was full"""
+
+        self._mask = capacity - 1
+        # [head, tail]. head is written by the producer, tail by the consumer
+        self._indices = np.zeros((2,), dtype=np.int64)
+        # [command, numfields or channel slot, event kind]
+        self._header = np.zeros((capacity, 3), dtype=np.int64)
+        self._pfields = np.zeros((capacity, maxfields), dtype=MYFLT)
+        # Flat views of the records, so that single items can be read and
+        # written without creating intermediate arrays
+        self._headerView = self._header.reshape(-1).data
+        self._pfieldsView = self._pfields.reshape(-1).data
+        self._rows = list(((MYFLT * maxfields) * capacity).from_address(self._pfields.ctypes.data))
+        self._channelSlots: dict[str, int] = {name: slot for slot, name in enumerate(channels)}
+        self._channelIndex = channelIndex
+
+    def __len__(self) -> int:
+        """The number of pending commands"""
+        return int(self._indices[0] - self._indices[1])
+
+    def _reserve(self) -> int:
+        head = int(self._indices[0])
+        if head - int(self._indices[1]) >= self.capacity:
+            self.dropped += 1
+            return -1
+        return head
+
+    def channels(self) -> list[str]:
+        """
+        The names of the channels which can be set via this ring
+        """
+        return list(self._channelSlots)
+
+    def channelSlot(self, name: str) -> int:
+        """
+        The slot of a channel within this ring
+
+        Raises KeyError if the channel was not declared when the ring was created
+        """
+        slot = self._channelSlots.get(name)
+        if slot is None:
+            raise KeyError(f"Channel '{name}' was not declared for this ring, "
+                           f"declared channels: {list(self._channelSlots)}")
+        return slot
+
+    def event(self, kind: str, pfields: _t.Sequence[float] | np.ndarray) -> bool:
+        """
+        Push a score event
+
+        Args:
+            kind: the kind of event, one of 'i', 'f', 'e'
+            pfields: the pfields of the event, starting with p1
+
+        Returns:
+            True if the event was pushed, False if the ring was full
+        """
+        numfields = len(pfields)
+        if numfields > self.maxfields:
+            raise ValueError(f"Too many pfields ({numfields}), this ring accepts "
+                             f"up to {self.maxfields}")
+        head = self._reserve()
+        if head < 0:
+            return False
+        idx = head & self._mask
+        self._pfields[idx, :numfields] = pfields
+        header = self._headerView
+        h = idx * 3
+        header[h] = CMD_EVENT
+        header[h + 1] = numfields
+        header[h + 2] = ord(kind)
+        self._indices[0] = head + 1
+        return True
+
+    def setChannel(self, name: str, value: float) -> bool:
+        """
+        Push a control channel value
+
+        Args:
+            name: the name of the channel, which must have been declared when
+                the ring was created
+            value: the new value
+
+        Returns:
+            True if the command was pushed, False if the ring was full
+        """
+        slot = self.channelSlot(name)
+        head = self._reserve()
+        if head < 0:
+            return False
+        idx = head & self._mask
+        self._pfieldsView[idx * self.maxfields] = value
+        header = self._headerView
+        h = idx * 3
+        header[h] = CMD_CHANNEL
+        header[h + 1] = slot
+        self._indices[0] = head + 1
+        return True
+
+    def drain(self, sendEvent: _t.Callable[[int, ctypes.Array, int], None]) -> int:
+        """
+        Consume all pending commands
+
+        Args:
+            sendEvent: a function ``(kind: int, pfields, numfields: int) -> None``,
+                called for each event, where *kind* is the ordinal of the event
+                kind and *pfields* a ctypes array of MYFLT which can be passed
+                as a MYFLT pointer
+
+        Returns:
+            the number of commands consumed
+
+        This is called by the consumer (the performance thread). Commands are
+        applied in the order they were pushed, reading the records in place
+        """
+        indices = self._indices
+        head = int(indices[0])
+        tail = int(indices[1])
+        if head == tail:
+            return 0
+        mask = self._mask
+        maxfields = self.maxfields
+        header = self._headerView
+        pfields = self._pfieldsView
+        rows = self._rows
+        views = None
+        for pos in range(tail, head):
+            idx = pos & mask
+            h = idx * 3
+            if header[h] == CMD_EVENT:
+                sendEvent(header[h + 2], rows[idx], header[h + 1])
+            else:
+                if views is None:
+                    assert self._channelIndex is not None
+                    views = self._channelIndex.views()
+                views[header[h + 1]][0] = pfields[idx * maxfields]
+        indices[1] = head
+        return head - tail
@@ -0,0 +1,311 @@
+"""
+A library of samples decoded once and shared by many csound instances
+
+Loading the same soundfiles via GEN01 in each of many csound instances reads
+and decodes every file once per instance. A :class:`SampleLibrary` decodes
+each soundfile once (using csound's own GEN01, so any format csound can read
+is supported) and stores the samples as ``.npy`` files which are memory-mapped.
+The decoded samples persist across sessions and, being memory-mapped, are
+shared via the page cache by all processes using the same library folder.
+Populating the tables of an instance is then a bulk copy per sample (see
+:meth:`~ctcsound7.Csound.tablesFromArrays`).
+
+.. code-block:: python
+
+    from ctcsound7.samplelib import SampleLibrary
+
+    lib = SampleLibrary()
+    lib.loadMany(glob.glob('samples/*.flac'))
+
+    for cs in instances:
+        tabnums = lib.populate(cs)
+        ...
+    tabnum = lib.table(cs, 'samples/piano-C4.flac')
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import weakref
+from dataclasses import dataclass
+import numpy as np
+import typing as _t
+
+from .common import MYFLT
+from . import _util
+
+if _t.TYPE_CHECKING:
+    from . import Csound
+
+
+@dataclass
+class Sample:
+    """
+    A decoded soundfile
+    """
+    path: str
+    """The path of the soundfile"""
+
+    key: str
+    """A key identifying the contents of the soundfile (path, size and modification time)"""
+
+    data: np.ndarray
+    """The samples, a read-only memory-mapped array of shape (numframes, nchnls)"""
+
+    sr: float
+    """The samplerate of the soundfile"""
+
+    @property
+    def nchnls(self) -> int:
+        """The number of channels"""
+        return self.data.shape[1]
+
+    @property
+    def numframes(self) -> int:
+        """The number of frames"""
+        return self.data.shape[0]
+
+    @property
+    def duration(self) -> float:
+        """The duration, in seconds"""
+        return self.numframes / self.sr
+
+
+def _sampleKey(path: str) -> str:
+    st = os.stat(path)
+    data = json.dumps([os.path.realpath(path), st.st_size, st.st_mtime_ns, MYFLT.__name__])
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()[:32]
+
+
+class SampleLibrary:
+    """
+    Decodes soundfiles once and populates the tables of many csound instances
+
+    Args:
+        path: the folder where decoded samples are stored. If not given, a
+            folder within the user's cache folder is used
+
+    Samples are identified by the path of their soundfile. A sample is decoded
+    only if its soundfile is not found in the library folder, or if it was
+    modified since it was decoded. The library keeps track of which table holds
+    which sample within each csound instance (instances are tracked via weak
+    references, so the library does not keep them alive).
+
+    The samples are stored in the range -1 to 1. They are copied unscaled
+    into the tables of an instance and then scaled in place, within the
+    tables, to its 0dbfs, so no scaled copy is made in memory.
+    """
+    def __init__(self, path=''):
+        self.path = path or _util.userCacheDir('samples')
+        """The folder where the decoded samples are stored"""
+
+        os.makedirs(self.path, exist_ok=True)
+        self._samples: dict[str, Sample] = {}
+        self._tables: weakref.WeakKeyDictionary[Csound, dict[str, int]] = weakref.WeakKeyDictionary()
+        self._decoder: Csound | None = None
+        self._lock = threading.RLock()
+
+    def __repr__(self) -> str:
+        return f"SampleLibrary(path={self.path!r}, samples={len(self._samples)})"
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def __contains__(self, path: str) -> bool:
+        return os.path.abspath(path) in self._samples
+
+    def samples(self) -> list[Sample]:
+        """The samples loaded in this library"""
+        return list(self._samples.values())
+
+    def _getDecoder(self) -> Csound:
+        if self._decoder is None:
+            from . import Csound
+            cs = Csound()
+            for option in ('-n', '-m0', '-d'):
+                cs.setOption(option)
+            cs.compileOrc('sr = 48000\nksmps = 64\nnchnls = 2\n0dbfs = 1\n')
+            cs.start()
+            self._decoder = cs
+        return self._decoder
+
+    def _decode(self, path: str) -> tuple[np.ndarray, float]:
+        cs = self._getDecoder()
+        cpath = path.replace('\\', '/').replace('"', '\\"')
+        tabnum = int(cs.evalCode(f'i__tabnum ftgen 0, 0, 0, -1, "{cpath}", 0, 0, 0\n'
+                                 f'return i__tabnum'))
+        if tabnum <= 0:
+            raise RuntimeError(f"Could not decode soundfile '{path}'")
+        try:
+            nchnls = int(cs.evalCode(f'return ftchnls({tabnum})'))
+            sr = float(cs.evalCode(f'return ftsr({tabnum})'))
+            table = cs.table(tabnum)
+            if table is None:
+                raise RuntimeError(f"Could not decode soundfile '{path}'")
+            nchnls = max(nchnls, 1)
+            numframes = len(table) // nchnls
+            data = table[:numframes * nchnls].reshape(numframes, nchnls).copy()
+        finally:
+            cs.evalCode(f'ftfree {tabnum}, 0\nreturn 0')
+        return data, sr
+
+    def load(self, path: str) -> Sample:
+        """
+        Load a soundfile into the library, decoding it if needed
+
+        Args:
+            path: the path of the soundfile
+
+        Returns:
+            the loaded :class:`Sample`
+        """
+        path = os.path.abspath(path)
+        key = _sampleKey(path)
+        with self._lock:
+            sample = self._samples.get(path)
+            if sample is not None and sample.key == key:
+                return sample
+            npypath = os.path.join(self.path, key + '.npy')
+            jsonpath = os.path.join(self.path, key + '.json')
+            try:
+                with open(jsonpath, 'r', encoding='utf-8') as f:
+                    sr = float(json.load(f)['sr'])
+                data = np.load(npypath, mmap_mode='r')
+            except (OSError, ValueError, KeyError):
+                decoded, sr = self._decode(path)
+                # Both files are written atomically. The .npy file is written
+                # last: its presence signals that the entry is complete
+                info = json.dumps({'sr': sr, 'path': path}).encode('utf-8')
+                self._writeAtomic(jsonpath, lambda f: f.write(info))
+                self._writeAtomic(npypath, lambda f: np.save(f, decoded))
+                data = np.load(npypath, mmap_mode='r')
+            sample = Sample(path=path, key=key, data=data, sr=sr)
+            self._samples[path] = sample
+            return sample
+
+    def _writeAtomic(self, path: str, write: _t.Callable[[_t.BinaryIO], None]) -> None:
+        fd, tmppath = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmppath, path)
+        except BaseException:
+            os.unlink(tmppath)
+            raise
+
+    def loadMany(self, paths: _t.Sequence[str]) -> list[Sample]:
+        """
+        Load many soundfiles into the library
+
+        Returns:
+            the loaded samples, in the order of *paths*
+        """
+        return [self.load(path) for path in paths]
+
+    def populate(self,
+                 csound: Csound,
+                 paths: _t.Sequence[str] | None = None
+                 ) -> dict[str, int]:
+        """
+        Create tables holding the given samples within *csound*
+
+        Args:
+            csound: the csound instance
+            paths: the samples to copy, which are loaded if needed. If not given,
+                all samples in the library are copied
+
+        Returns:
+            a dict mapping the path of each sample to its table number
+
+        Samples which already have a table in *csound* are not copied again.
+        All tables are created in one compile pass and each is filled with
+        a single bulk copy
+        """
+        if paths is None:
+            samples = self.samples()
+        else:
+            samples = self.loadMany(paths)
+        with self._lock:
+            tables = self._tablesFor(csound)
+            missing = [sample for sample in samples if sample.path not in tables]
+            if missing:
+                tabnums = csound.tablesFromArrays([sample.data for sample in missing])
+                scale = csound.get0dBFS()
+                for sample, tabnum in zip(missing, tabnums):
+                    if scale != 1:
+                        # Scaled in place, within the table: the samples are
+                        # copied straight from the memory-mapped file
+                        view = csound.tableHandle(tabnum).array(refresh=False)
+                        np.multiply(view, scale, out=view)
+                    tables[sample.path] = tabnum
+            return {sample.path: tables[sample.path] for sample in samples}
+
+    def _tablesFor(self, csound: Csound) -> dict[str, int]:
+        # Called with the lock held. Drops tables not valid anymore (for example,
+        # after a reset)
+        tables = self._tables.get(csound)
+        if tables is None:
+            tables = self._tables[csound] = {}
+            return tables
+        for path, tabnum in list(tables.items()):
+            sample = self._samples.get(path)
+            if sample is None or csound.tableLength(tabnum) != sample.data.size:
+                del tables[path]
+        return tables
+
+    def table(self, csound: Csound, path: str) -> int | None:
+        """
+        The table number holding the given sample within *csound*
+
+        Args:
+            csound: the csound instance
+            path: the path of the soundfile
+
+        Returns:
+            the table number, or None if the sample has no table in *csound*
+        """
+        with self._lock:
+            return self._tablesFor(csound).get(os.path.abspath(path))
+
+    def tables(self, csound: Csound) -> dict[str, int]:
+        """
+        All samples with a table within *csound*
+
+        Returns:
+            a dict mapping the path of each sample to its table number
+        """
+        with self._lock:
+            return dict(self._tablesFor(csound))
+
+    def forget(self, csound: Csound) -> None:
+        """
+        Stop tracking the tables of *csound*
+
+        The tables themselves are not freed
+        """
+        with self._lock:
+            self._tables.pop(csound, None)
+
+    def close(self) -> None:
+        """
+        Destroy the csound instance used for decoding
+        """
+        with self._lock:
+            self._decoder = None
+
+    def clear(self) -> None:
+        """
+        Remove all decoded samples, in memory and on disk
+        """
+        with self._lock:
+            self._samples.clear()
+            self._tables.clear()
+            for entry in os.scandir(self.path):
+                if entry.name.endswith(('.npy', '.json')):
+                    try:
+                        os.unlink(entry.path)
+                    except OSError:
+                        pass
@@ -0,0 +1,150 @@
+"""
+Time-budgeted task scheduling for the process queue of a performance thread
+
+See :meth:`~ctcsound7.CsoundPerformanceThread.setProcessQueue`
+"""
+from __future__ import annotations
+
+import time
+from collections import deque
+from dataclasses import dataclass
+import typing as _t
+
+
+PRIORITIES = ('control', 'heavy')
+
+
+@dataclass
+class SchedulerStats:
+    """
+    Counters of a :class:`TaskScheduler`
+    """
+    queueDepth: int = 0
+    """The number of tasks waiting to be executed"""
+
+    executed: int = 0
+    """The number of tasks executed"""
+
+    deferred: int = 0
+    """The number of times a task was left for a later cycle because the budget was exhausted"""
+
+    overruns: int = 0
+    """The number of cycles which took longer than the budget"""
+
+    cycles: int = 0
+    """The number of cycles in which at least one task was executed"""
+
+    promoted: int = 0
+    """The number of heavy tasks run ahead of control tasks because they were deferred for too long"""
+
+
+class TaskScheduler:
+    """
+    Runs queued tasks within a time budget per performance cycle
+
+    Args:
+        budget: the max. time (in microseconds) spent running tasks at each cycle
+        maxHeavyDeferrals: the max. number of consecutive cycles in which pending
+            heavy tasks can be deferred. After that, one heavy task is run at
+            the start of the next cycle, before any control task
+
+    Tasks have one of two priorities: 'control' (quick tasks, like setting
+    a channel or sending an event) and 'heavy' (tasks which might take long,
+    like compiling code). At each cycle control tasks are run first, then heavy
+    tasks, until the budget is exhausted; the remaining tasks are deferred to
+    the next cycles. A heavy task is only started if its expected duration
+    (a running average of previous heavy tasks) fits in the remaining budget.
+    To guarantee progress at least one task is run per cycle, even if it
+    exceeds the budget, and heavy tasks are not starved by a steady stream
+    of control tasks: a heavy task is promoted once heavy tasks have been
+    deferred for *maxHeavyDeferrals* cycles.
+
+    Tasks can be added from any thread; :meth:`TaskScheduler.run` is called
+    by the performance thread.
+    """
+    def __init__(self, budget: int = 1000, maxHeavyDeferrals: int = 8):
+        self.budget = budget
+        """The time budget per cycle, in microseconds"""
+
+        self.maxHeavyDeferrals = maxHeavyDeferrals
+        """The max. number of consecutive cycles in which heavy tasks can be deferred"""
+
+        self.stats = SchedulerStats()
+        """The counters of this scheduler"""
+
+        self._control: deque[_t.Callable] = deque()
+        self._heavy: deque[_t.Callable] = deque()
+        self._heavyAvgNs = 0.
+        self._heavyDeferrals = 0
+
+    def __len__(self) -> int:
+        return len(self._control) + len(self._heavy)
+
+    def put(self, task: _t.Callable, priority='control') -> None:
+        """
+        Add a task
+
+        Args:
+            task: the task. It will be called with the arguments passed to :meth:`TaskScheduler.run`
+            priority: one of 'control', 'heavy'
+        """
+        if priority == 'control':
+            self._control.append(task)
+        elif priority == 'heavy':
+            self._heavy.append(task)
+        else:
+            raise ValueError(f"Invalid priority '{priority}', expected one of {PRIORITIES}")
+
+    def _runHeavy(self, args: tuple) -> None:
+        clock = time.perf_counter_ns
+        now = clock()
+        self._heavy.popleft()(*args)
+        elapsed = clock() - now
+        self._heavyAvgNs = elapsed if not self._heavyAvgNs else self._heavyAvgNs * 0.8 + elapsed * 0.2
+
+    def run(self, *args) -> int:
+        """
+        Run pending tasks within the time budget
+
+        Args:
+            args: the arguments passed to each task
+
+        Returns:
+            the number of tasks run
+        """
+        control, heavy = self._control, self._heavy
+        if not control and not heavy:
+            return 0
+        clock = time.perf_counter_ns
+        start = clock()
+        deadline = start + self.budget * 1000
+        numtasks = 0
+        stats = self.stats
+        if heavy and self._heavyDeferrals >= self.maxHeavyDeferrals:
+            self._runHeavy(args)
+            stats.promoted += 1
+            numtasks += 1
+        heavyRun = numtasks
+        while control:
+            if numtasks and clock() >= deadline:
+                break
+            control.popleft()(*args)
+            numtasks += 1
+        while heavy and not control:
+            if numtasks and clock() + self._heavyAvgNs >= deadline:
+                break
+            self._runHeavy(args)
+            heavyRun += 1
+            numtasks += 1
+        if heavyRun or not heavy:
+            self._heavyDeferrals = 0
+        else:
+            self._heavyDeferrals += 1
+        stats.cycles += 1
+        stats.executed += numtasks
+        if clock() - start > self.budget * 1000:
+            stats.overruns += 1
+        stats.queueDepth = pending = len(control) + len(heavy)
+        if pending:
+            stats.deferred += pending
+        return numtasks
@@ -0,0 +1,251 @@
+"""
+Streaming very long samples through a ring of fixed-size tables
+
+Loading an hour-long recording into a single function table allocates all
+of it within csound. A :class:`TableStream` instead keeps a few fixed-size
+tables per stream: while csound plays one table, a background thread
+refills the ones already played with the next blocks of a memory-mapped
+source.
+
+Two control channels connect the stream with the orchestra:
+
+* ``<name>.ready``: set by the stream, the index of the last block which
+  has been copied into its table. It is updated at the start of a cycle
+* ``<name>.block``: set by the orchestra, the index of the block being played
+
+Block ``i`` is stored in table ``stream.tables[i % len(stream.tables)]``. The
+block size is a multiple of ksmps, so that a block always starts at the
+beginning of a cycle. An orchestra playing a mono stream could look like this:
+
+.. code-block:: python
+
+    stream = TableStream(cs, np.load('long.npy', mmap_mode='r'), blockSize=32768, name='stream')
+    cs.compileOrc(f'''
+    instr Play
+      itabs[] fillarray {", ".join(map(str, stream.tables))}
+      kblock init 0
+      kpos init 0
+      kready chnget "stream.ready"
+      if kblock <= kready then
+        asig tablera itabs[kblock % lenarray(itabs)], kpos, 0
+      else
+        asig = 0
+      endif
+      kpos += ksmps
+      if kpos >= {stream.blockSize} then
+        kpos = 0
+        kblock += 1
+        chnset kblock, "stream.block"
+      endif
+      outs asig, asig
+    endin
+    ''')
+    stream.start()
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+import numpy as np
+import typing as _t
+
+from .common import MYFLT
+
+if _t.TYPE_CHECKING:
+    from . import Csound
+    from .samplelib import Sample
+
+
+@dataclass
+class StreamStats:
+    """
+    Counters of a :class:`TableStream`
+    """
+    blocksFilled: int = 0
+    """The number of blocks copied into the tables"""
+
+    blockPlaying: int = 0
+    """The index of the block being played, as reported by the orchestra"""
+
+    prefetchDepth: int = 0
+    """The number of blocks ready ahead of the one being played"""
+
+    minPrefetchDepth: int = 0
+    """The smallest prefetch depth seen since the stream started"""
+
+    underruns: int = 0
+    """The number of blocks which were not ready when the orchestra started playing them"""
+
+    bytesCopied: int = 0
+    """The number of bytes copied into the tables"""
+
+
+class TableStream:
+    """
+    Streams a long source through a ring of tables refilled in the background
+
+    Args:
+        csound: the csound instance
+        source: the samples, an array of shape (numframes,) or (numframes, nchnls),
+            usually memory-mapped (``np.load(path, mmap_mode='r')``, ``np.memmap``).
+            The path of a ``.npy`` file or a :class:`~ctcsound7.samplelib.Sample`
+            are also accepted
+        blockSize: the size of each table, in frames. It must be a multiple of ksmps
+        numTables: the number of tables in the ring. The prefetch depth (the
+            number of blocks ready ahead of the one playing) is at most
+            ``numTables - 1``
+        name: the prefix of the control channels used by the stream
+        interval: how often the background thread checks the block being
+            played, in seconds. It should be well below the duration of a block
+
+    The tables are created (via :meth:`~ctcsound7.Csound.tablesFromArrays`)
+    and filled with the first blocks when the stream is created. Multichannel
+    sources are stored interleaved. The last block is padded with zeros.
+    """
+    def __init__(self,
+                 csound: Csound,
+                 source: np.ndarray | str | Sample,
+                 blockSize=65536,
+                 numTables=2,
+                 name='stream',
+                 interval=0.01):
+        if isinstance(source, str):
+            source = np.load(source, mmap_mode='r')
+        elif not isinstance(source, np.ndarray):
+            source = source.data
+        if source.ndim == 1:
+            source = source.reshape(-1, 1)
+        if numTables < 2:
+            raise ValueError(f"At least two tables are needed, got {numTables}")
+        ksmps = csound.ksmps()
+        if blockSize % ksmps != 0:
+            raise ValueError(f"The block size ({blockSize}) must be a multiple of ksmps ({ksmps})")
+
+        self.source = source
+        """The source samples, shape (numframes, nchnls)"""
+
+        self.blockSize = blockSize
+        """The size of each block, in frames"""
+
+        self.name = name
+        """The prefix of the control channels"""
+
+        self.interval = interval
+
+        self.numBlocks = -(-len(source) // blockSize)
+        """The number of blocks in the source"""
+
+        nchnls = source.shape[1]
+        empty = np.zeros(blockSize * nchnls, dtype=MYFLT)
+        self.tables: list[int] = csound.tablesFromArrays([empty] * numTables)
+        """The table numbers of the ring"""
+
+        self._handles = [csound.tableHandle(tabnum) for tabnum in self.tables]
+        self._ready = csound.channel(f'{name}.ready')
+        self._playing = csound.channel(f'{name}.block')
+        self._playing.set(0)
+        self._filled = -1
+        self._stats = StreamStats()
+        self._statsLock = threading.Lock()
+        self._stopEvent = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lastUnderrun = -1
+        self._prefetch(0)
+        self._ready.set(self._filled)
+        self._stats.minPrefetchDepth = self._filled
+
+    def __repr__(self) -> str:
+        return (f"TableStream(name={self.name!r}, blockSize={self.blockSize}, "
+                f"tables={self.tables}, numBlocks={self.numBlocks})")
+
+    def __enter__(self) -> TableStream:
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    @property
+    def finished(self) -> bool:
+        """True if all blocks of the source have been played"""
+        return int(self._playing.get()) >= self.numBlocks
+
+    def _fillBlock(self, block: int) -> None:
+        handle = self._handles[block % len(self._handles)]
+        view = handle.array(refresh=False)
+        frames = self.source[block * self.blockSize:(block + 1) * self.blockSize]
+        n = frames.size
+        view[:n] = frames.ravel()
+        if n < len(view):
+            view[n:] = 0
+        with self._statsLock:
+            self._stats.blocksFilled += 1
+            self._stats.bytesCopied += n * view.itemsize
+
+    def _prefetch(self, playing: int) -> bool:
+        """
+        Fill the tables already played with the next blocks
+
+        Returns:
+            True if any block was filled
+        """
+        numTables = len(self._handles)
+        filled = False
+        while self._filled + 1 < min(playing + numTables, self.numBlocks):
+            self._fillBlock(self._filled + 1)
+            self._filled += 1
+            filled = True
+        return filled
+
+    def _signalReady(self) -> None:
+        ready = self._ready
+        value = self._filled
+        # The channel is set at the start of a cycle, if possible
+        self._handles[0].schedule(lambda: ready.set(value))
+
+    def _run(self) -> None:
+        while not self._stopEvent.wait(self.interval):
+            playing = int(self._playing.get())
+            if playing >= self.numBlocks:
+                break
+            underrun = playing > self._filled
+            if self._prefetch(playing):
+                self._signalReady()
+            with self._statsLock:
+                stats = self._stats
+                if underrun and playing != self._lastUnderrun:
+                    stats.underruns += 1
+                    self._lastUnderrun = playing
+                stats.blockPlaying = playing
+                stats.prefetchDepth = depth = max(self._filled - playing, 0)
+                stats.minPrefetchDepth = min(stats.minPrefetchDepth, depth)
+
+    def start(self) -> None:
+        """
+        Start the background thread refilling the tables
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopEvent.clear()
+        self._thread = threading.Thread(target=self._run, name=f'tablestream-{self.name}',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the background thread
+        """
+        if self._thread is not None:
+            self._stopEvent.set()
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> StreamStats:
+        """
+        Returns a snapshot of the counters of this stream
+        """
+        with self._statsLock:
+            s = self._stats
+            return StreamStats(blocksFilled=s.blocksFilled, blockPlaying=s.blockPlaying,
+                               prefetchDepth=s.prefetchDepth, minPrefetchDepth=s.minPrefetchDepth,
+                               underruns=s.underruns, bytesCopied=s.bytesCopied)
@@ -0,0 +1,186 @@
+"""
+Delta updates of function tables
+
+Rewriting a large table where only a small region changed copies far more
+data than needed. A :class:`TableSync` keeps a shadow copy of a table,
+finds the changed regions of each update with vectorized numpy operations
+and copies only those spans into the table, at the start of a performance
+cycle.
+
+.. code-block:: python
+
+    from ctcsound7.tablesync import TableSync
+
+    thread = cs.performanceThread(withProcessQueue=True)
+    sync = TableSync(cs, tabnum)
+    spectrum = sync.shadow.copy()
+    while running:
+        spectrum[200:240] *= 0.9
+        sync.update(spectrum)
+    print(sync.stats())
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+import numpy as np
+import typing as _t
+
+from .common import MYFLT
+
+if _t.TYPE_CHECKING:
+    from . import Csound
+
+
+@dataclass
+class TableSyncStats:
+    """
+    Counters of a :class:`TableSync`
+    """
+    updates: int = 0
+    """The number of calls to :meth:`TableSync.update` which changed the table"""
+
+    spans: int = 0
+    """The number of spans copied"""
+
+    bytesCopied: int = 0
+    """The number of bytes copied into the table"""
+
+    bytesFull: int = 0
+    """The number of bytes which copying the whole table at each update would have copied"""
+
+    @property
+    def bytesSaved(self) -> int:
+        """The number of bytes not copied, compared to full copies"""
+        return self.bytesFull - self.bytesCopied
+
+
+def dirtySpans(a: np.ndarray, b: np.ndarray, mergeGap=0) -> list[tuple[int, int]]:
+    """
+    The spans where two arrays of the same size differ
+
+    Args:
+        a: an array
+        b: an array of the same size
+        mergeGap: spans separated by this number of equal values or fewer
+            are merged into one span
+
+    Returns:
+        a list of (start, end) tuples, end not included
+    """
+    idx = np.flatnonzero(a != b)
+    if len(idx) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(idx) > mergeGap + 1)
+    starts = idx[np.concatenate(([0], breaks + 1))]
+    ends = idx[np.concatenate((breaks, [len(idx) - 1]))] + 1
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+class TableSync:
+    """
+    Keeps a table in sync with python data, copying only what changed
+
+    Args:
+        csound: the csound instance
+        tabnum: the table number
+        mergeGap: changed regions separated by this number of unchanged values
+            or fewer are copied as one span. Copying a few unchanged values
+            is cheaper than the overhead of an extra span
+
+    The shadow copy holds the contents of the table as last sent. Each call to
+    :meth:`TableSync.update` compares the new data with the shadow, updates it
+    and sends the changed spans. If the performance thread of *csound* has a
+    process queue (see :meth:`~ctcsound7.CsoundPerformanceThread.setProcessQueue`)
+    the spans are copied at the start of the next cycle, all within one task.
+    Otherwise they are copied immediately.
+
+    The shadow assumes that only this object writes to the table. Call
+    :meth:`TableSync.resync` if the table was modified elsewhere
+    """
+    def __init__(self, csound: Csound, tabnum: int, mergeGap=16):
+        self.tabnum = tabnum
+        """The table number"""
+
+        self.mergeGap = mergeGap
+        """Max. number of unchanged values between two spans copied as one"""
+
+        self._handle = csound.tableHandle(tabnum)
+        self._shadow = self._handle.copyOut()
+        self._stats = TableSyncStats()
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"TableSync(tabnum={self.tabnum}, size={len(self._shadow)})"
+
+    def __len__(self) -> int:
+        return len(self._shadow)
+
+    @property
+    def shadow(self) -> np.ndarray:
+        """
+        The contents of the table as last sent (read-only)
+        """
+        view = self._shadow.view()
+        view.flags.writeable = False
+        return view
+
+    def resync(self) -> None:
+        """
+        Read the table again into the shadow copy
+        """
+        with self._lock:
+            self._shadow = self._handle.copyOut()
+
+    def update(self, data: np.ndarray, start=0) -> int:
+        """
+        Update the table with *data*, copying only the changed spans
+
+        Args:
+            data: the new contents of the table, or of a region of it
+            start: the index of the table where *data* starts
+
+        Returns:
+            the number of values copied
+        """
+        with self._lock:
+            shadow = self._shadow
+            end = start + len(data)
+            if start < 0 or end > len(shadow):
+                raise IndexError(f"Cannot update {len(data)} values at index {start}, "
+                                 f"table {self.tabnum} has size {len(shadow)}")
+            data = np.asarray(data, dtype=MYFLT)
+            region = shadow[start:end]
+            spans = dirtySpans(region, data, mergeGap=self.mergeGap)
+            stats = self._stats
+            # A full copy would copy the whole table
+            stats.bytesFull += shadow.nbytes
+            if not spans:
+                return 0
+            # The values are copied, so data can be modified after this call
+            chunks = [(start + s0, data[s0:s1].copy()) for s0, s1 in spans]
+            for s0, s1 in spans:
+                region[s0:s1] = data[s0:s1]
+            numvalues = sum(len(chunk) for _, chunk in chunks)
+            stats.updates += 1
+            stats.spans += len(chunks)
+            stats.bytesCopied += numvalues * data.itemsize
+
+        handle = self._handle
+
+        def apply():
+            view = handle.array()
+            for index, chunk in chunks:
+                view[index:index+len(chunk)] = chunk
+
+        handle.schedule(apply)
+        return numvalues
+
+    def stats(self) -> TableSyncStats:
+        """
+        Returns a snapshot of the counters of this object
+        """
+        with self._lock:
+            s = self._stats
+            return TableSyncStats(updates=s.updates, spans=s.spans,
+                                  bytesCopied=s.bytesCopied, bytesFull=s.bytesFull)
@@ -0,0 +1,72 @@
+import sys
+import os
+
+if sys.platform.startswith('win'):
+    # Add the path for github actions.
+    if os.path.exists('C:/Program Files/csound'):
+        os.environ['PATH'] = os.environ['PATH'] + ';C:/Program Files/csound'
+
+import ctcsound7 as ct
+import numpy as np
+import argparse
+import time
+
+parser = argparse.ArgumentParser(description="Compare sending events one by one vs in batch")
+parser.add_argument('-n', '--numevents', default=20000, type=int)
+parser.add_argument('-r', '--runs', default=5, type=int)
+args = parser.parse_args()
+
+orc = r'''
+sr = 44100
+ksmps = 64
+nchnls = 2
+0dbfs = 1
+
+instr 1
+  ; p4 is optional, events might have 3 or 4 pfields
+  iamp = p4 == 0 ? 0.01 : p4
+endin
+'''
+
+
+def makeCsound():
+    cs = ct.Csound()
+    cs.setOption("-n")
+    cs.setOption("-m0")
+    cs.setOption("-d")
+    cs.compileOrc(orc)
+    cs.start()
+    return cs
+
+
+n = args.numevents
+pfields = np.full((n, 4), np.nan)
+pfields[:, 0] = 1
+pfields[:, 1] = np.linspace(0, 60, n)
+pfields[:, 2] = 0.1
+# Every other event has only 3 pfields
+pfields[::2, 3] = 0.05
+rows = [row[~np.isnan(row)].tolist() for row in pfields]
+
+print(f"Csound version: {ct.VERSION}, {n} events, best of {args.runs} runs")
+
+cs = makeCsound()
+single = []
+for _ in range(args.runs):
+    cs.rewindScore()
+    t0 = time.perf_counter()
+    for row in rows:
+        cs.scoreEvent('i', row)
+    single.append(time.perf_counter() - t0)
+
+batch = []
+for _ in range(args.runs):
+    cs.rewindScore()
+    t0 = time.perf_counter()
+    cs.events('i', pfields)
+    batch.append(time.perf_counter() - t0)
+
+t1, t2 = min(single), min(batch)
+print(f"scoreEvent, one per event: {t1*1000:.2f} ms ({n/t1:.0f} events/s)")
+print(f"events, batch:             {t2*1000:.2f} ms ({n/t2:.0f} events/s)")
+print(f"Speedup: {t1/t2:.1f}x")
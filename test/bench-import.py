@@ -0,0 +1,60 @@
+import sys
+import os
+
+if sys.platform.startswith('win'):
+    # Add the path for github actions.
+    if os.path.exists('C:/Program Files/csound'):
+        os.environ['PATH'] = os.environ['PATH'] + ';C:/Program Files/csound'
+
+import argparse
+import json
+import subprocess
+import statistics
+
+parser = argparse.ArgumentParser(description="Measure the import time of ctcsound7 via python -X importtime")
+parser.add_argument('-n', '--runs', default=10, type=int, help="Number of imports to measure")
+parser.add_argument('--top', default=10, type=int, help="Number of slowest modules to show")
+parser.add_argument('--module', default='ctcsound7', help="The module to import")
+parser.add_argument('--json', default='', help="Append the results as a json line to this file")
+args = parser.parse_args()
+
+
+def importTimes(module: str) -> dict[str, tuple[int, int]]:
+    """
+    Import module in a fresh interpreter, returns {module: (self us, cumulative us)}
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          capture_output=True, text=True, env=os.environ)
+    if proc.returncode != 0:
+        print(proc.stderr)
+        raise RuntimeError(f"Could not import {module}")
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        selfus, cumus, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(selfus), int(cumus))
+    return times
+
+
+runs = [importTimes(args.module) for _ in range(args.runs)]
+totals = [run[args.module][1] for run in runs]
+print(f"Import of {args.module}, {args.runs} runs (cumulative, ms): "
+      f"min={min(totals)/1000:.2f}, median={statistics.median(totals)/1000:.2f}, "
+      f"max={max(totals)/1000:.2f}")
+
+# Median self time per module within the package
+names = [name for name in runs[0] if name.startswith(args.module)]
+selftimes = {name: statistics.median(run[name][0] for run in runs if name in run)
+             for name in names}
+print(f"\nSlowest modules (self time, median, ms):")
+for name, us in sorted(selftimes.items(), key=lambda item: -item[1])[:args.top]:
+    print(f"  {name:40s} {us/1000:8.2f}")
+
+if args.json:
+    import ctcsound7
+    with open(args.json, 'a') as f:
+        f.write(json.dumps({'module': args.module, 'version': ctcsound7.VERSION,
+                            'median_ms': statistics.median(totals) / 1000,
+                            'min_ms': min(totals) / 1000,
+                            'modules_ms': {k: v / 1000 for k, v in selftimes.items()}}) + '\n')
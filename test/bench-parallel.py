@@ -0,0 +1,72 @@
+import sys
+import os
+
+if sys.platform.startswith('win'):
+    # Add the path for github actions.
+    if os.path.exists('C:/Program Files/csound'):
+        os.environ['PATH'] = os.environ['PATH'] + ';C:/Program Files/csound'
+
+import ctcsound7 as ct
+from ctcsound7.batch import RenderJob, renderMany
+from ctcsound7.parallel import ParallelRenderer
+import argparse
+import time
+
+parser = argparse.ArgumentParser(description="Compare rendering with threads vs a process pool")
+parser.add_argument('-j', '--jobs', default=16, type=int, help="Number of jobs to render")
+parser.add_argument('-d', '--dur', default=10, type=float, help="Duration of each job")
+parser.add_argument('-w', '--workers', default=os.cpu_count(), type=int)
+parser.add_argument('--ksmps', default=64, type=int)
+args = parser.parse_args()
+
+orc = fr'''
+sr = 44100
+ksmps = {args.ksmps}
+nchnls = 2
+0dbfs = 1
+
+instr 1
+  ; Some cpu intensive synthesis
+  asig = 0
+  kfreq = p4
+  icount = 0
+  while icount < 40 do
+    asig += vco2:a(0.01, kfreq * (1 + icount * 0.01))
+    icount += 1
+  od
+  asig = moogladder2(asig, 2000, 0.8)
+  outch 1, asig, 2, asig
+endin
+'''
+
+
+def makeJobs():
+    return [RenderJob(orc=orc, sco=f'i 1 0 {args.dur} {100 + i * 10}', dur=args.dur,
+                      options=['-m0', '-d'], name=f'job{i}')
+            for i in range(args.jobs)]
+
+
+if __name__ == '__main__':
+    print(f"Csound version: {ct.VERSION}, {args.jobs} jobs of {args.dur} seconds")
+
+    t0 = time.perf_counter()
+    with ParallelRenderer(workers=1) as renderer:
+        renderer.render(makeJobs())
+    serial = time.perf_counter() - t0
+    print(f"threads, 1 worker: {serial:.2f} s")
+
+    for workers in sorted({2, args.workers}):
+        t0 = time.perf_counter()
+        with ParallelRenderer(workers=workers) as renderer:
+            results = renderer.render(makeJobs())
+        elapsed = time.perf_counter() - t0
+        errors = [r.error for r in results if r.error]
+        print(f"threads, {workers} workers: {elapsed:.2f} s, speedup: {serial / elapsed:.2f}x"
+              + (f", errors: {errors}" if errors else ''))
+
+    t0 = time.perf_counter()
+    results = renderMany(makeJobs(), workers=args.workers)
+    elapsed = time.perf_counter() - t0
+    for result in results:
+        result.release()
+    print(f"processes, {args.workers} workers: {elapsed:.2f} s, speedup: {serial / elapsed:.2f}x")
@@ -0,0 +1,107 @@
+import sys
+import os
+
+if sys.platform.startswith('win'):
+    # Add the path for github actions.
+    if os.path.exists('C:/Program Files/csound'):
+        os.environ['PATH'] = os.environ['PATH'] + ';C:/Program Files/csound'
+
+import ctcsound7 as ct
+import numpy as np
+import argparse
+import time
+import threading
+
+parser = argparse.ArgumentParser(description="Compare the process queue with the command ring")
+parser.add_argument('-n', '--numcommands', default=20000, type=int)
+parser.add_argument('--capacity', default=4096, type=int)
+parser.add_argument('--realtime', action='store_true',
+                    help="Run with realtime output instead of as fast as possible")
+args = parser.parse_args()
+
+orc = r'''
+sr = 44100
+ksmps = 64
+nchnls = 2
+0dbfs = 1
+
+instr 1
+  kgain chnget "gain"
+endin
+'''
+
+
+def makeThread(ring: bool):
+    cs = ct.Csound()
+    cs.setOption("-odac" if args.realtime else "-n")
+    cs.setOption("-m0")
+    cs.setOption("-d")
+    cs.compileOrc(orc)
+    cs.start()
+    if ring:
+        pt = cs.performanceThread()
+        r = pt.setCommandRing(capacity=args.capacity, maxfields=4, channels=['gain'])
+    else:
+        pt = cs.performanceThread(withProcessQueue=True)
+        r = None
+    pt.play()
+    return cs, pt, r
+
+
+def benchQueue(n: int) -> tuple[float, list[float]]:
+    cs, pt, _ = makeThread(ring=False)
+    latencies = []
+    t0 = time.perf_counter()
+    for i in range(n):
+        if i % 2:
+            pt.task(lambda cs, pt, i=i: cs.scoreEvent('i', [1, 0, 0.01, i]))
+        else:
+            pt.task(lambda cs, pt, i=i: cs.setControlChannel('gain', i))
+        if i % 1000 == 0:
+            done = threading.Event()
+            t1 = time.perf_counter()
+            pt.task(lambda cs, pt, e=done: e.set())
+            done.wait()
+            latencies.append(time.perf_counter() - t1)
+    pt.sync()
+    elapsed = time.perf_counter() - t0
+    pt.stop()
+    pt.join()
+    return elapsed, latencies
+
+
+def benchRing(n: int) -> tuple[float, list[float]]:
+    cs, pt, ring = makeThread(ring=True)
+    pfields = np.array([1, 0, 0.01, 0], dtype=float)
+    latencies = []
+    t0 = time.perf_counter()
+    for i in range(n):
+        pfields[3] = i
+        if i % 2:
+            pushed = ring.event('i', pfields)
+        else:
+            pushed = ring.setChannel('gain', i)
+        while not pushed:
+            # The ring is full, wait for the performance thread to drain it
+            time.sleep(0)
+            pushed = ring.event('i', pfields) if i % 2 else ring.setChannel('gain', i)
+        if i % 1000 == 0:
+            t1 = time.perf_counter()
+            while len(ring):
+                time.sleep(0)
+            latencies.append(time.perf_counter() - t1)
+    while len(ring):
+        time.sleep(0)
+    elapsed = time.perf_counter() - t0
+    pt.stop()
+    pt.join()
+    return elapsed, latencies
+
+
+print(f"Csound version: {ct.VERSION}, {args.numcommands} commands")
+
+for name, func in [('process queue', benchQueue), ('command ring', benchRing)]:
+    elapsed, latencies = func(args.numcommands)
+    lat = np.array(latencies) * 1000
+    print(f"{name:14s}: {args.numcommands / elapsed:10.0f} commands/s, "
+          f"latency: median {np.median(lat):.3f} ms, max {lat.max():.3f} ms")
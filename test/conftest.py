@@ -0,0 +1,21 @@
+import os
+import sys
+import types
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _root not in sys.path:
+    sys.path.insert(0, _root)
+
+try:
+    import ctcsound7
+except (ImportError, OSError):
+    # The csound library is not installed. Register the package without
+    # running its __init__ (which loads the library), so that the modules
+    # written in pure python can still be tested
+    for _name in [name for name in sys.modules if name.split('.')[0] == 'ctcsound7']:
+        del sys.modules[_name]
+    _pkg = types.ModuleType('ctcsound7')
+    _pkg.__path__ = [os.path.join(_root, 'ctcsound7')]
+    _pkg.VERSION = 0
+    _pkg.APIVERSION = 0
+    sys.modules['ctcsound7'] = _pkg
@@ -0,0 +1,86 @@
+import ctypes as ct
+
+import pytest
+
+from ctcsound7._dll import LazyLibrary, lazyDeclare
+
+
+class Function:
+    pass
+
+
+class FakeLibrary:
+    """Resolves any symbol to a new function object, counting lookups"""
+    def __init__(self):
+        self.lookups = []
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        self.lookups.append(name)
+        func = Function()
+        func.name = name
+        return func
+
+
+def declareAPI(libcsound, libcspt):
+    libcsound.csoundCreate.restype = ct.c_void_p
+    libcsound.csoundCreate.argtypes = [ct.py_object]
+    libcsound.csoundGetSr.restype = ct.c_double
+    libcspt.NewCsoundPT.restype = ct.c_void_p
+
+
+def test_no_lookup_when_declaring():
+    dll = FakeLibrary()
+    lazyDeclare(declareAPI, dll, FakeLibrary())
+    assert dll.lookups == []
+
+
+def test_prototype_applied_on_first_use():
+    dll = FakeLibrary()
+    libcsound, = lazyDeclare(lambda lib: declareAPI(lib, lib), dll)
+    func = libcsound.csoundCreate
+    assert func.restype is ct.c_void_p
+    assert func.argtypes == [ct.py_object]
+    assert libcsound.csoundCreate is func
+    assert dll.lookups == ['csoundCreate']
+    assert sorted(libcsound.declared()) == ['NewCsoundPT', 'csoundCreate', 'csoundGetSr']
+
+
+def test_undeclared_function():
+    dll = FakeLibrary()
+    libcsound, = lazyDeclare(lambda lib: None, dll)
+    func = libcsound.csoundGetVersion
+    assert not hasattr(func, 'restype')
+    assert dll.lookups == ['csoundGetVersion']
+
+
+def test_same_library_twice():
+    dll = FakeLibrary()
+    libcsound, libcspt = lazyDeclare(declareAPI, dll, dll)
+    assert libcsound is libcspt
+    assert isinstance(libcsound, LazyLibrary)
+    assert libcspt.NewCsoundPT.restype is ct.c_void_p
+    assert libcsound.csoundGetSr.restype is ct.c_double
+
+
+def test_separate_libraries():
+    dll1, dll2 = FakeLibrary(), FakeLibrary()
+    libcsound, libcspt = lazyDeclare(declareAPI, dll1, dll2)
+    assert libcsound is not libcspt
+    assert libcspt.declared() == ['NewCsoundPT']
+    libcspt.NewCsoundPT
+    assert (dll1.lookups, dll2.lookups) == ([], ['NewCsoundPT'])
+
+
+class EmptyLibrary:
+    def __getattr__(self, name):
+        raise AttributeError(name)
+
+
+def test_missing_symbol():
+    lib = LazyLibrary(EmptyLibrary(), {'csoundThisDoesNotExist': {'restype': None}})
+    with pytest.raises(AttributeError):
+        lib.csoundThisDoesNotExist
+    with pytest.raises(AttributeError):
+        lib.__wrapped__
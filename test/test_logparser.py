@@ -0,0 +1,100 @@
+from ctcsound7.logparser import LogParser
+from ctcsound7.messages import MESSAGE_TYPES
+
+
+def kinds(records):
+    return [record.kind for record in records]
+
+
+def test_compile_error_with_line():
+    parser = LogParser()
+    records = parser.feed("error: syntax error, unexpected T_IDENT  (token \"oscil\") line 12:\n")
+    assert kinds(records) == ['compile-error']
+    assert records[0].line == 12
+    assert parser.counters.compileErrors == 1
+
+
+def test_compile_error_line_reported_later():
+    parser = LogParser()
+    records = parser.feedMessages([
+        ("error: Unable to find opcode entry for 'foo' with matching argument types:\n", 0),
+        ("Found: (null) foo k\n", 0),
+        ("Line: 7\n", 0),
+        ("Parsing failed due to 2 syntax errors\n", 0)])
+    assert kinds(records) == ['compile-error', 'compile-failed']
+    assert records[0].line == 7
+    assert records[1].values == [2.]
+
+
+def test_compile_error_lookahead_is_limited():
+    parser = LogParser()
+    lines = ["error: Unable to find opcode entry for 'foo'\n"] + ["something else\n"] * 3
+    records = parser.feedMessages([(line, 0) for line in lines + ["Line: 7\n"]])
+    assert kinds(records) == ['compile-error']
+    assert records[0].line is None
+
+
+def test_init_and_perf_errors():
+    parser = LogParser()
+    records = parser.feed("INIT ERROR in instr 1 (opcode diskin2) line 5: diskin2: foo.wav: failed to open\n"
+                          "PERF ERROR in instr 2 (opcode oscili): table not found\n")
+    assert kinds(records) == ['init-error', 'perf-error']
+    init, perf = records
+    assert (init.instr, init.opcode, init.line) == ('1', 'diskin2', 5)
+    assert init.message == 'diskin2: foo.wav: failed to open'
+    assert (perf.instr, perf.opcode, perf.line) == ('2', 'oscili', None)
+    assert parser.counters.initErrors == 1
+    assert parser.counters.perfErrors == 1
+
+
+def test_warnings_and_attributes():
+    parser = LogParser()
+    records = parser.feed("WARNING: could not open library\n")
+    records += parser.feed("something went wrong\n", MESSAGE_TYPES['error'])
+    records += parser.feed("careful\n", MESSAGE_TYPES['warning'])
+    records += parser.feed("just a message\n", MESSAGE_TYPES['orch'])
+    assert kinds(records) == ['warning', 'error', 'warning']
+    assert records[0].message == 'could not open library'
+    assert parser.counters.warnings == 2
+    assert parser.counters.errors == 1
+
+
+def test_lines_split_in_fragments():
+    parser = LogParser()
+    records = []
+    for fragment in ["B  0.000 ..  1.000 T  1.000 TT  1.000 M:", "  0.50000", "  1.20000\n"]:
+        records += parser.feed(fragment)
+    assert kinds(records) == ['section-amps']
+    assert records[0].values == [0.5, 1.2]
+    records = parser.feed("B  1.000 ..  2.000 T  2.000 TT  2.000 M:  -0.80000  0.30000\n")
+    assert parser.counters.maxAmps == [0.8, 1.2]
+    records = parser.feed("rtevent:\t   T  2.500 TT  2.500 M:  1.50000  0.00000\n")
+    assert kinds(records) == ['section-amps']
+    assert parser.counters.maxAmps == [1.5, 1.2]
+    # Only lines starting with the known prefixes are section amplitudes
+    assert parser.feed("instr 1: T  1.000 TT  1.000 M:  3.0\n") == []
+
+
+def test_amplitudes_and_ranges():
+    parser = LogParser()
+    records = parser.feed("number of samples out of range:        5       10\n"
+                          "end of score.\t\t   overall amps:  0.50000  1.20000\n"
+                          "\t   overall samples out of range:        5       10\n"
+                          "0 errors in performance\n")
+    assert kinds(records) == ['out-of-range', 'overall-amps', 'overall-out-of-range', 'perf-stats']
+    counters = parser.counters
+    assert counters.samplesOutOfRange == 15
+    assert counters.overallAmps == [0.5, 1.2]
+    assert counters.errorsInPerformance == 0
+
+
+def test_flush_and_callback():
+    seen = []
+    parser = LogParser(keep=2, onRecord=seen.append)
+    assert parser.feed("WARNING: one") == []
+    assert kinds(parser.flush()) == ['warning']
+    assert parser.flush() == []
+    parser.feed("WARNING: two\nWARNING: three\n")
+    assert len(seen) == 3
+    assert [record.message for record in parser.records] == ['two', 'three']
+    assert parser.counters.lines == 3
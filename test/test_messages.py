@@ -0,0 +1,27 @@
+from ctcsound7.messages import MessageDispatcher
+
+
+def test_dispatcher_drops_when_full():
+    dispatcher = MessageDispatcher(capacity=4)
+    batches = []
+    dispatcher.addHandler(batches.append)
+    for i in range(6):
+        dispatcher.callback(None, 0, f"msg {i}".encode())
+    stats = dispatcher.stats()
+    assert (stats.received, stats.dropped, stats.pending) == (6, 2, 4)
+    assert dispatcher.dispatch() == 4
+    assert batches == [[(f"msg {i}", 0) for i in range(4)]]
+    assert dispatcher.stats().pending == 0
+
+
+def test_dispatcher_ring_wraps_around():
+    dispatcher = MessageDispatcher(capacity=3)
+    batches = []
+    dispatcher.addHandler(batches.append)
+    for start in range(0, 9, 2):
+        for i in range(start, start + 2):
+            dispatcher.callback(None, 0, f"msg {i}".encode())
+        dispatcher.dispatch()
+    assert [msg for batch in batches for msg, _ in batch] == [f"msg {i}" for i in range(10)]
+    stats = dispatcher.stats()
+    assert (stats.dispatched, stats.dropped, stats.batches) == (10, 0, 5)
@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+
+import pytest
+
+from ctcsound7 import opcodecache, _util
+from ctcsound7.common import OpcodeDef
+
+
+@pytest.fixture
+def cachedir(tmp_path, monkeypatch):
+    def userCacheDir(*subfolders):
+        path = os.path.join(str(tmp_path), *subfolders)
+        os.makedirs(path, exist_ok=True)
+        return path
+    monkeypatch.setattr(_util, 'userCacheDir', userCacheDir)
+    monkeypatch.setattr(opcodecache, '_memo', {})
+    return tmp_path
+
+
+@pytest.fixture
+def libpath(tmp_path):
+    path = tmp_path / 'libcsound64.so'
+    path.write_bytes(b'\0' * 16)
+    return str(path)
+
+
+OPCODES = [OpcodeDef(name='oscili', outtypes='a', intypes='kkjo', flags=0),
+           OpcodeDef(name='oscili', outtypes='k', intypes='kkjo', flags=0)]
+
+
+class Loader:
+    def __init__(self, opcodes=OPCODES):
+        self.opcodes = opcodes
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return list(self.opcodes)
+
+
+def test_key(libpath, tmp_path, monkeypatch):
+    key = opcodecache._cacheKey(libpath, 6180)
+    assert key == opcodecache._cacheKey(libpath, 6180)
+    assert key != opcodecache._cacheKey(libpath, 6190)
+    plugins = tmp_path / 'plugins'
+    plugins.mkdir()
+    assert key != opcodecache._cacheKey(libpath, 6180, opcodeDir=str(plugins))
+    monkeypatch.setenv('OPCODE6DIR64', str(plugins))
+    assert key != opcodecache._cacheKey(libpath, 6180)
+
+
+def test_key_changes_with_library(libpath):
+    key = opcodecache._cacheKey(libpath, 6180)
+    with open(libpath, 'ab') as f:
+        f.write(b'\0')
+    assert key != opcodecache._cacheKey(libpath, 6180)
+
+
+def test_memoized(cachedir, libpath):
+    loader = Loader()
+    assert opcodecache.cachedOpcodes(loader, libpath, 6180) == OPCODES
+    assert opcodecache.cachedOpcodes(loader, libpath, 6180) == OPCODES
+    assert loader.calls == 1
+    # A copy is returned each time
+    opcodecache.cachedOpcodes(loader, libpath, 6180).clear()
+    assert opcodecache.cachedOpcodes(loader, libpath, 6180) == OPCODES
+
+
+def test_persisted(cachedir, libpath, monkeypatch):
+    loader = Loader()
+    opcodecache.cachedOpcodes(loader, libpath, 6180)
+    monkeypatch.setattr(opcodecache, '_memo', {})
+    assert opcodecache.cachedOpcodes(loader, libpath, 6180) == OPCODES
+    assert loader.calls == 1
+    opcodecache.clearCache()
+    assert opcodecache.cachedOpcodes(loader, libpath, 6180) == OPCODES
+    assert loader.calls == 2
+
+
+def test_empty_list_not_cached(cachedir, libpath):
+    loader = Loader(opcodes=[])
+    assert opcodecache.cachedOpcodes(loader, libpath, 6180) == []
+    assert opcodecache.cachedOpcodes(loader, libpath, 6180) == []
+    assert loader.calls == 2
+
+
+def test_opcode_index():
+    index = opcodecache.OpcodeIndex(OPCODES)
+    assert 'oscili' in index
+    assert len(index.find('oscili')) == 2
+    assert index.find('oscili', outtypes='k') == [OPCODES[1]]
+
+
+def test_loading_does_not_block_other_keys(cachedir, libpath):
+    started = threading.Event()
+    release = threading.Event()
+
+    def slowLoader():
+        started.set()
+        release.wait(5)
+        return list(OPCODES)
+
+    thread = threading.Thread(target=opcodecache.cachedOpcodes, args=(slowLoader, libpath, 6180))
+    thread.start()
+    started.wait(5)
+    # A different key is loaded while the first one is still loading
+    loader = Loader()
+    t0 = time.monotonic()
+    assert opcodecache.cachedOpcodes(loader, libpath, 7000) == OPCODES
+    assert time.monotonic() - t0 < 1
+    assert loader.calls == 1
+    release.set()
+    thread.join()
+    assert opcodecache.cachedOpcodes(Loader(opcodes=[]), libpath, 6180) == OPCODES
@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+import ctcsound7
+from ctcsound7.pool import CsoundPool
+
+
+class FakeCsound:
+    resetDelay = 0.
+    created = 0
+
+    def __init__(self, opcodeDir=''):
+        FakeCsound.created += 1
+        self._perfthread = None
+        self.options = []
+
+    def setOption(self, option):
+        self.options.append(option)
+
+    def reset(self):
+        time.sleep(self.resetDelay)
+        self.options.clear()
+
+
+@pytest.fixture(autouse=True)
+def fakeCsound(monkeypatch):
+    monkeypatch.setattr(ctcsound7, 'Csound', FakeCsound, raising=False)
+    FakeCsound.resetDelay = 0.
+    FakeCsound.created = 0
+
+
+def test_reuse_and_configure():
+    pool = CsoundPool(options=['-m0'], maxSize=2)
+    cs = pool.acquire()
+    assert cs.options == ['-m0']
+    pool.release(cs)
+    assert cs.options == ['-m0']
+    assert pool.acquire() is cs
+    stats = pool.stats()
+    assert (stats.created, stats.reused, stats.inUse, stats.idle) == (1, 1, 1, 0)
+
+
+def test_max_size():
+    pool = CsoundPool(maxSize=1)
+    cs = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+    pool.release(cs)
+    assert pool.acquire(timeout=0.05) is cs
+
+
+def test_reset_outside_of_lock():
+    pool = CsoundPool(maxSize=2, minSize=2)
+    cs1 = pool.acquire()
+    FakeCsound.resetDelay = 0.5
+    releaser = threading.Thread(target=pool.release, args=(cs1,))
+    releaser.start()
+    time.sleep(0.05)
+    # The idle instance is handed out while the other one is being reset
+    t0 = time.monotonic()
+    cs2 = pool.acquire(timeout=0.2)
+    assert time.monotonic() - t0 < 0.2
+    assert cs2 is not cs1
+    # The instance being reset keeps its slot
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+    releaser.join()
+    assert pool.acquire(timeout=1) is cs1
+    assert FakeCsound.created == 2
+
+
+def test_closed():
+    pool = CsoundPool(maxSize=1)
+    cs = pool.acquire()
+    pool.close()
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+    pool.release(cs)
+    assert pool.stats().discarded == 1
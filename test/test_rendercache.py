@@ -0,0 +1,119 @@
+import os
+
+import numpy as np
+import pytest
+
+from ctcsound7.batch import RenderJob
+from ctcsound7.rendercache import RenderCache
+
+
+class FakeCsound:
+    """Records what is compiled and renders a constant signal"""
+    def __init__(self, options=()):
+        self._started = False
+        self._options = list(options)
+        self.code = []
+
+    def setOption(self, option):
+        self._options.append(option)
+
+    def compileOrc(self, code):
+        self.code.append(code)
+        return 0
+
+    def compileCsdText(self, code):
+        self.code.append(code)
+        return 0
+
+    def inputMessage(self, sco):
+        pass
+
+    def render(self, dur):
+        return np.full((int(dur * 100), 2), 0.5)
+
+
+ORC = 'instr 1\nendin\n'
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return RenderCache(path=str(tmp_path), maxBytes=2**20)
+
+
+def test_key(cache):
+    job = RenderJob(orc=ORC, sco='i 1 0 1', dur=1, options=['-m0'])
+    key = cache.key(job)
+    assert key == cache.key(RenderJob(orc=ORC, sco='i 1 0 1', dur=1, options=['-m0']))
+    assert key != cache.key(job, seed=1)
+    assert cache.key(job, seed=1) != cache.key(job, seed=2)
+    assert key != cache.key(RenderJob(orc=ORC, sco='i 1 0 2', dur=1, options=['-m0']))
+    assert key != cache.key(RenderJob(orc=ORC, sco='i 1 0 1', dur=2, options=['-m0']))
+    assert key != cache.key(job, options=['--sample-rate=96000'])
+    # The name does not affect the result
+    assert key == cache.key(RenderJob(orc=ORC, sco='i 1 0 1', dur=1, options=['-m0'], name='x'))
+
+
+def test_hit_is_memory_mapped(cache):
+    job = RenderJob(orc=ORC, dur=1)
+    cs = FakeCsound()
+    samples = cache.render(job, csound=cs)
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert isinstance(samples, np.memmap)
+    again = cache.render(job)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert isinstance(again, np.memmap)
+    assert not again.flags.writeable
+    assert np.array_equal(samples, again)
+    assert again.shape == (100, 2)
+
+
+def test_seed_prepended(cache):
+    cs = FakeCsound()
+    cache.render(RenderJob(orc=ORC, dur=1), seed=42, csound=cs)
+    assert cs.code == ['seed 42\n' + ORC]
+    cs = FakeCsound()
+    csd = '<CsoundSynthesizer>\n<CsInstruments>\n' + ORC + '</CsInstruments>\n</CsoundSynthesizer>\n'
+    cache.render(RenderJob(csd=csd, dur=1), seed=42, csound=cs)
+    assert cs.code == [csd.replace('<CsInstruments>\n', '<CsInstruments>\nseed 42\n')]
+
+
+def test_instance_options_in_key(cache):
+    job = RenderJob(orc=ORC, dur=1)
+    cache.render(job, csound=FakeCsound())
+    cache.render(job, csound=FakeCsound(options=['--ksmps=1']))
+    assert cache.misses == 2
+    cache.render(job, csound=FakeCsound(options=['--ksmps=1']))
+    assert cache.hits == 1
+
+
+def test_started_instance_rejected(cache):
+    cs = FakeCsound()
+    cs._started = True
+    with pytest.raises(ValueError):
+        cache.render(RenderJob(orc=ORC, dur=1), csound=cs)
+
+
+def test_lru_eviction(cache):
+    jobs = [RenderJob(orc=ORC, dur=i + 1) for i in range(3)]
+    for i, job in enumerate(jobs):
+        cache.put(job, np.zeros((1000, 2)))
+        path = os.path.join(cache.path, cache.key(job) + '.npy')
+        os.utime(path, (1000 + i, 1000 + i))
+    entrysize = cache.size() // 3
+    # Using the oldest entry makes it the most recent
+    assert cache.get(jobs[0]) is not None
+    cache.maxBytes = entrysize * 2
+    assert cache.evict() == 1
+    assert cache.get(jobs[1]) is None
+    assert cache.get(jobs[0]) is not None
+    assert cache.get(jobs[2]) is not None
+
+
+def test_put_keeps_new_entry(cache):
+    cache.maxBytes = 1
+    job = RenderJob(orc=ORC, dur=1)
+    cache.put(job, np.zeros((1000, 2)))
+    assert cache.get(job) is not None
+    cache.clear()
+    assert cache.get(job) is None
+    assert cache.size() == 0
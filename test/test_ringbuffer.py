@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from ctcsound7._util import ChannelIndex
+from ctcsound7.ringbuffer import CommandRing
+
+
+class FakeHandle:
+    valid = True
+
+    def __init__(self):
+        self.value = np.zeros((1,), dtype=float)
+
+    def array(self):
+        return self.value
+
+
+def makeRing(capacity=4, maxfields=4, channels=('a', 'b')):
+    handles = [FakeHandle() for _ in channels]
+    ring = CommandRing(capacity=capacity, maxfields=maxfields, channels=list(channels),
+                       channelIndex=ChannelIndex(handles))
+    return ring, handles
+
+
+class Recorder:
+    def __init__(self, handles):
+        self.handles = handles
+        self.events = []
+
+    def __call__(self, kind, pfields, numfields):
+        # Record the channel values seen by each event, to check the order
+        channels = [float(h.value[0]) for h in self.handles]
+        self.events.append((chr(kind), list(pfields[:numfields]), channels))
+
+
+def test_capacity_rounded_to_power_of_two():
+    ring, _ = makeRing(capacity=5)
+    assert ring.capacity == 8
+    with pytest.raises(ValueError):
+        makeRing(capacity=0)
+
+
+def test_push_order():
+    ring, handles = makeRing()
+    rec = Recorder(handles)
+    assert ring.setChannel('a', 1)
+    assert ring.event('i', [1, 0, 1])
+    assert ring.setChannel('a', 2)
+    assert ring.event('i', [2])
+    assert len(ring) == 4
+    assert ring.drain(rec) == 4
+    assert len(ring) == 0
+    assert rec.events == [('i', [1., 0., 1.], [1., 0.]),
+                          ('i', [2.], [2., 0.])]
+
+
+def test_full_ring_drops():
+    ring, handles = makeRing(capacity=2)
+    assert ring.event('i', [1])
+    assert ring.setChannel('b', 3)
+    assert not ring.event('i', [2])
+    assert ring.dropped == 1
+    assert ring.drain(Recorder(handles)) == 2
+    assert handles[1].value[0] == 3
+
+
+def test_wraparound():
+    ring, handles = makeRing(capacity=4)
+    rec = Recorder(handles)
+    for i in range(10):
+        # Three commands per round, so the indices wrap at different positions
+        assert ring.event('i', [i, 0, 1])
+        assert ring.setChannel('b', i)
+        assert ring.event('e', [i])
+        assert ring.drain(rec) == 3
+    assert ring.dropped == 0
+    assert len(rec.events) == 20
+    for i in range(10):
+        assert rec.events[2 * i] == ('i', [i, 0., 1.], [0., max(i - 1, 0)])
+        assert rec.events[2 * i + 1] == ('e', [i], [0., i])
+    assert int(ring._indices[0]) == 30
+
+
+def test_undeclared_channel():
+    ring, _ = makeRing()
+    assert ring.channels() == ['a', 'b']
+    assert ring.channelSlot('b') == 1
+    with pytest.raises(KeyError):
+        ring.setChannel('c', 1)
+    assert len(ring) == 0
+
+
+def test_too_many_pfields():
+    ring, _ = makeRing(maxfields=2)
+    with pytest.raises(ValueError):
+        ring.event('i', [1, 2, 3])
+
+
+def test_invalidated_channels():
+    ring, handles = makeRing()
+    ring.setChannel('a', 1)
+    handles[0].valid = False
+    with pytest.raises(RuntimeError):
+        ring.drain(Recorder(handles))
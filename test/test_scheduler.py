@@ -0,0 +1,110 @@
+import pytest
+
+from ctcsound7 import scheduler
+from ctcsound7.scheduler import TaskScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+    def task(self, name, log, micros):
+        def run():
+            log.append(name)
+            self.now += micros * 1000
+        return run
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler.time, 'perf_counter_ns', clock)
+    return clock
+
+
+def test_invalid_priority():
+    with pytest.raises(ValueError):
+        TaskScheduler().put(lambda: None, priority='urgent')
+
+
+def test_control_before_heavy(clock):
+    sched = TaskScheduler(budget=1000)
+    log = []
+    sched.put(clock.task('h', log, 10), 'heavy')
+    sched.put(clock.task('c1', log, 10))
+    sched.put(clock.task('c2', log, 10))
+    assert sched.run() == 3
+    assert log == ['c1', 'c2', 'h']
+    assert len(sched) == 0
+
+
+def test_budget_defers(clock):
+    sched = TaskScheduler(budget=100)
+    log = []
+    for i in range(5):
+        sched.put(clock.task(i, log, 40))
+    assert sched.run() == 3
+    assert log == [0, 1, 2]
+    assert sched.stats.deferred == 2
+    assert sched.stats.overruns == 1
+    assert sched.run() == 2
+    assert log == [0, 1, 2, 3, 4]
+    assert sched.stats.executed == 5
+    assert sched.stats.cycles == 2
+
+
+def test_at_least_one_task_per_cycle(clock):
+    sched = TaskScheduler(budget=10)
+    log = []
+    sched.put(clock.task('slow', log, 1000), 'heavy')
+    sched.put(clock.task('slow2', log, 1000), 'heavy')
+    assert sched.run() == 1
+    # The expected duration of a heavy task does not fit in the budget
+    assert sched.run() == 1
+    assert log == ['slow', 'slow2']
+
+
+def test_heavy_waits_for_budget(clock):
+    sched = TaskScheduler(budget=100)
+    log = []
+    sched.put(clock.task('h1', log, 80), 'heavy')
+    assert sched.run() == 1
+    sched.put(clock.task('c', log, 50))
+    sched.put(clock.task('h2', log, 80), 'heavy')
+    # 50 + 80 does not fit in the budget, the heavy task is deferred
+    assert sched.run() == 1
+    assert log == ['h1', 'c']
+    assert sched.run() == 1
+    assert log == ['h1', 'c', 'h2']
+
+
+def test_heavy_promoted_under_control_stream(clock):
+    sched = TaskScheduler(budget=100, maxHeavyDeferrals=3)
+    log = []
+    sched.put(clock.task('h', log, 10), 'heavy')
+    cycles = 0
+    while 'h' not in log:
+        for i in range(5):
+            sched.put(clock.task('c', log, 30))
+        start = len(log)
+        sched.run()
+        cycles += 1
+        assert cycles <= 4
+    assert cycles == 4
+    # The promoted task runs first in its cycle
+    assert log[start] == 'h'
+    assert sched.stats.promoted == 1
+
+
+def test_no_promotion_without_deferral(clock):
+    sched = TaskScheduler(budget=1000, maxHeavyDeferrals=1)
+    log = []
+    for i in range(3):
+        sched.put(clock.task('c', log, 10))
+        sched.put(clock.task('h', log, 10), 'heavy')
+        sched.run()
+    assert log == ['c', 'h'] * 3
+    assert sched.stats.promoted == 0
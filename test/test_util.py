@@ -0,0 +1,154 @@
+import ctypes
+
+import numpy as np
+import pytest
+
+from ctcsound7 import _util
+from ctcsound7.common import MYFLT
+
+
+def test_event_rows_padding():
+    nan = np.nan
+    pfields = np.array([[1, 0, 1, 0.5],
+                        [2, 0, 1, nan],
+                        [3, nan, 1, nan],
+                        [nan, nan, nan, nan]], dtype=MYFLT)
+    rows, counts, arr = _util.eventRows(pfields)
+    assert counts == [4, 3, 3, 0]
+    assert len(rows) == 4
+    assert list(rows[0]) == [1, 0, 1, 0.5]
+    # Rows share memory with the returned array
+    assert ctypes.addressof(rows[1]) == arr[1].ctypes.data
+    assert arr is pfields
+
+
+def test_event_rows_without_nans():
+    pfields = np.arange(6, dtype=MYFLT).reshape(2, 3)
+    rows, counts, arr = _util.eventRows(pfields)
+    assert counts == [3, 3]
+    assert list(rows[1]) == [3, 4, 5]
+
+
+def test_event_rows_conversion():
+    rows, counts, arr = _util.eventRows([1, 0, 2])
+    assert arr.shape == (1, 3)
+    assert arr.dtype == np.dtype(MYFLT)
+    assert counts == [3]
+    # A non contiguous array is copied
+    pfields = np.zeros((4, 6), dtype=MYFLT)[:, ::2]
+    rows, counts, arr = _util.eventRows(pfields)
+    assert arr.flags.c_contiguous
+    assert counts == [3] * 4
+    with pytest.raises(ValueError):
+        _util.eventRows(np.zeros((2, 2, 2)))
+
+
+class FakeHandle:
+    def __init__(self):
+        self.valid = True
+        self.value = np.zeros((1,), dtype=MYFLT)
+
+    def array(self):
+        return self.value
+
+
+def test_channel_index():
+    handles = [FakeHandle() for _ in range(3)]
+    index = _util.ChannelIndex(handles)
+    index.scatter(np.array([1, 2, 3], dtype=MYFLT))
+    assert [h.value[0] for h in handles] == [1, 2, 3]
+    handles[1].value[0] = 10
+    assert list(index.gather()) == [1, 10, 3]
+    out = np.zeros(3, dtype=MYFLT)
+    assert index.gather(out) is out
+    with pytest.raises(ValueError):
+        index.scatter([1, 2])
+
+
+def test_channel_index_validates_every_handle():
+    handles = [FakeHandle() for _ in range(3)]
+    index = _util.ChannelIndex(handles)
+    handles[2].valid = False
+    with pytest.raises(RuntimeError):
+        index.gather()
+    assert not index.valid
+    handles[2].valid = True
+    with pytest.raises(RuntimeError):
+        index.scatter([1, 2, 3])
+
+
+class SharedHandle(FakeHandle):
+    def __init__(self, buffer, i):
+        self.valid = True
+        self.value = buffer[i:i + 1]
+
+
+def test_channel_index_contiguous():
+    buffer = np.zeros(4, dtype=MYFLT)
+    # Channels cover the buffer exactly, in any order
+    handles = [SharedHandle(buffer, i) for i in (2, 0, 3, 1)]
+    index = _util.ChannelIndex(handles)
+    assert index.vectorized
+    index.scatter([1, 2, 3, 4])
+    assert list(buffer) == [2, 4, 1, 3]
+    buffer[0] = 10
+    assert list(index.gather()) == [1, 10, 3, 4]
+
+
+def test_channel_index_gaps_not_vectorized():
+    buffer = np.zeros(4, dtype=MYFLT)
+    handles = [SharedHandle(buffer, i) for i in (0, 3)]
+    index = _util.ChannelIndex(handles)
+    assert not index.vectorized
+    index.scatter([1, 2])
+    assert list(buffer) == [1, 0, 0, 2]
+    assert list(index.gather()) == [1, 2]
+
+
+class EchoPerformance:
+    """Copies the input buffer to the output buffer at each block"""
+    def __init__(self, blockframes, nchnls, maxblocks=1000):
+        self.input = np.zeros(blockframes * nchnls, dtype=MYFLT)
+        self.output = np.zeros(blockframes * nchnls, dtype=MYFLT)
+        self.blocks = 0
+        self.maxblocks = maxblocks
+
+    def __call__(self):
+        if self.blocks >= self.maxblocks:
+            return 1
+        self.blocks += 1
+        self.output[:] = self.input
+        return 0
+
+
+def stream(perf, chunks, chunkframes=8):
+    return [chunk.copy() for chunk in _util.streamLoop(
+        perform=perf, source=perf.output.ctypes.data, blockframes=4, nchnls=1,
+        chunkframes=chunkframes, inputs=iter(chunks), sink=perf.input.ctypes.data, inchnls=1)]
+
+
+def test_stream_input():
+    perf = EchoPerformance(4, 1)
+    inputs = [np.arange(8, dtype=MYFLT).reshape(8, 1), np.arange(8, 16, dtype=MYFLT).reshape(8, 1)]
+    out = stream(perf, inputs)
+    assert [len(chunk) for chunk in out] == [8, 8]
+    assert np.array_equal(np.concatenate(out).ravel(), np.arange(16))
+
+
+def test_stream_short_final_input():
+    perf = EchoPerformance(4, 1)
+    inputs = [np.arange(8, dtype=MYFLT).reshape(8, 1),
+              np.arange(8, 13, dtype=MYFLT).reshape(5, 1),
+              np.zeros((8, 1), dtype=MYFLT)]
+    out = stream(perf, inputs)
+    # The short chunk is the last one, with its real number of frames
+    assert [len(chunk) for chunk in out] == [8, 5]
+    assert np.array_equal(np.concatenate(out).ravel(), np.arange(13))
+    # Padded to whole blocks
+    assert perf.blocks == 4
+
+
+def test_stream_performance_ends():
+    perf = EchoPerformance(4, 1, maxblocks=3)
+    out = stream(perf, [np.ones((8, 1), dtype=MYFLT)] * 3)
+    assert [len(chunk) for chunk in out] == [8, 4]